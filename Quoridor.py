@@ -1,25 +1,577 @@
 # Name: Jonathan Ramm- Gramenz
 # Date: 8/12/21
 # Description: Defines a QuoridorGame class for playing the Quoridor game. Also defines Player, Board, and GameState
-# classes to work with QuoridorGame to implement game elements.
+# classes to work with QuoridorGame to implement game elements, and a BoardTables class holding the tables they
+# precompute for each board size and player count.
+#
+# Startup is kept cheap for short lived processes. Importing this module takes about 11 ms, of which building the
+# standard tables is about 4 ms and the rest the random and threading modules. The first game on a set of tables
+# stores its opening hashes there, so every later QuoridorGame copies them rather than hashing the board:
+# construction takes about 3.5 us and reset about 1.7 us. Run python -X importtime -c "import Quoridor" to
+# check the import after changing anything at module level.
+
+import random
+import threading
+from collections import namedtuple
+
+import QuoridorStats
+from QuoridorStats import timed
+
+# The standard playing field is 9 x 9 squares, but QuoridorGame(size=N, players=4) plays on any size from 3 up, with
+# two or four players. A square (x, y) is stored as the bit index y * size + x. Fences here are one square long, so
+# there are (size - 1) x size vertical fence slots and size x (size - 1) horizontal fence slots, each a bit in its
+# own mask. Python integers have no width limit, so the same bit tricks work for a 19 x 19 board's 361 squares.
+BOARD_SIZE = 9
+LEFT, UP, RIGHT, DOWN = 0, 1, 2, 3
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))     # (x change, y change) for left, up, right and down
+_DIRECTION_OF = {change: direction for direction, change in enumerate(DIRECTIONS)}
+PLAYER_NAMES = ("P1", "P2", "P3", "P4")             # also the order of play
+DISTANCE_CACHE_SIZE = 4096
+_STATS = QuoridorStats.ENABLED          # read once at import, so the counters cost nothing when instrumentation is off
+_distance_cache_lock = threading.Lock()
+
+# One shared (x, y) tuple per point, whatever the board size. Positions and move lists hand these out instead of
+# building new tuples, so idle games and long move lists do not each carry their own copies.
+_POINTS = {}
+
+# The board looks the same mirrored left to right, and turned upside down with the players' colours swapped, so
+# every two player position has four symmetric forms that play out alike. Each transform is its own inverse.
+IDENTITY, MIRROR, SWAP, ROTATE = 0, 1, 2, 3     # ROTATE is MIRROR and SWAP together, a half turn of the board
+SYMMETRIES = (IDENTITY, MIRROR, SWAP, ROTATE)
+
+# Events a QuoridorGame hands to its listeners (see add_listener) for every move accepted by move_pawn or
+# place_fence. Players are numbers, 1 to 4, and places are coordinates tuples, so a spectator can follow a game from
+# these alone: a pawn move is followed by TurnChanged, or by GameWon if it won, and a fence by TurnChanged.
+PawnMoved = namedtuple("PawnMoved", ("player", "start", "end"))
+FencePlaced = namedtuple("FencePlaced", ("player", "direction", "position", "fences_remaining"))
+TurnChanged = namedtuple("TurnChanged", ("player",))
+GameWon = namedtuple("GameWon", ("player",))
+
+
+def set_bits(mask):
+    """Takes a mask and yields the index of each set bit, lowest first, in one step per set bit."""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class BoardTables:
+    """Holds everything precomputed for one board size and player count: the wall adjacency table, square steps and
+    coordinates, the players' starting squares, goals and fence allotment, the Zobrist keys, the symmetry tables and
+    the distance map cache shared by every board of that kind. Building them walks every square and fence slot, so
+    board_tables builds each kind once, on first use, and every game of that kind shares the one object.
+
+    Players start in the middle of their own side and race to the opposite one: P1 from the top row (y = 0) to the
+    bottom, P2 the other way, and with four players P3 from the left column to the right and P4 the other way. A
+    goal is stored as a row number, or as ~column for P3 and P4's goal columns. The 20 fences of the standard game
+    are shared out evenly, 10 each for two players and 5 each for four, and scale with the board size. """
+
+    __slots__ = ("size", "players", "names", "player_index", "squares", "v_slots", "h_slots", "mask_bytes", "walls",
+                 "step", "neighbours", "jumps", "diagonals", "edge_blocked", "v_blocks", "h_blocks", "coordinates",
+                 "starts", "start_occupied", "goals", "goal_masks", "fences_per_player", "zobrist_pawn",
+                 "zobrist_fence", "zobrist_fences_left", "zobrist_turn", "symmetries", "square_symmetry",
+                 "fence_symmetry", "mask_symmetry", "zobrist_symmetry", "turn_changes", "distance_cache",
+                 "opening_hashes")
+
+    def __init__(self, size, players):
+        """Takes the board size and number of players and builds every table. Raises ValueError for a board smaller
+        than 3 x 3 or a player count other than 2 or 4."""
+        if size < 3:
+            raise ValueError("the board must be at least 3 squares wide, got %d" % size)
+        if players not in (2, 4):
+            raise ValueError("Quoridor is played by 2 or 4 players, not %d" % players)
+        last = size - 1
+        middle = size // 2
+        self.size = size
+        self.players = players
+        self.names = PLAYER_NAMES[:players]
+        self.player_index = {name: index for index, name in enumerate(self.names)}
+        self.squares = size * size
+        self.v_slots = last * size
+        self.h_slots = size * last
+        self.mask_bytes = (self.v_slots + 7) // 8
+        self.walls = self.build_walls()
+        self.step = tuple(x_change + y_change * size for x_change, y_change in DIRECTIONS)   # square index change
+        self.build_moves()
+        self.coordinates = tuple(_POINTS.setdefault((square % size, square // size), (square % size, square // size))
+                                 for square in range(self.squares))
+        self.starts = (middle, last * size + middle, middle * size, middle * size + last)[:players]
+        self.start_occupied = sum(1 << square for square in self.starts)
+        self.goals = dict(zip(self.names, (last, 0, ~last, ~0)))
+        self.goal_masks = tuple(sum(1 << square for square in self.goal_squares(self.goals[name]))
+                                for name in self.names)                         # square bitmask of each goal side
+        self.fences_per_player = 2 * (size + 1) // players
+        self.build_zobrist()
+        self.build_symmetry()
+        self.distance_cache = {}
+        self.opening_hashes = None      # filled in by the first QuoridorGame, which every later one copies
+
+    def build_walls(self):
+        """Builds the wall adjacency table. For each direction and square it holds a (vertical mask bit, horizontal
+        mask bit) pair naming the fence slot between that square and its neighbour in that direction, or None if
+        the neighbour would be off the board (the board edge always blocks). """
+        size = self.size
+        table = [[None] * self.squares for _ in DIRECTIONS]
+        for y_coord in range(size):
+            for x_coord in range(size):
+                square = y_coord * size + x_coord
+                if x_coord > 0:
+                    table[LEFT][square] = (1 << (y_coord * (size - 1) + x_coord - 1), 0)
+                if x_coord < size - 1:
+                    table[RIGHT][square] = (1 << (y_coord * (size - 1) + x_coord), 0)
+                if y_coord > 0:
+                    table[UP][square] = (0, 1 << ((y_coord - 1) * size + x_coord))
+                if y_coord < size - 1:
+                    table[DOWN][square] = (0, 1 << (y_coord * size + x_coord))
+        return table
+
+    def build_moves(self):
+        """Builds the move generator tables, which depend on nothing but the board size. For each direction and
+        square: the neighbouring square, the square a jump lands on, and the (side step direction, target) pairs for
+        a diagonal move around a pawn standing on the neighbour, with -1 (or no pairs) where that would leave the
+        board. A board's edge-blocked bitset has bit square * 4 + direction set when a fence or the edge closes that
+        side of the square; edge_blocked holds the edge bits alone, and v_blocks and h_blocks the two bits each
+        fence slot sets. Other engines can read these directly to generate moves with a few bit tests. """
+        size = self.size
+        self.neighbours = []
+        self.jumps = []
+        self.diagonals = []
+        self.edge_blocked = 0
+        for direction, (x_change, y_change) in enumerate(DIRECTIONS):
+            asides = ((direction + 1) % 4, (direction + 3) % 4)
+            neighbours = []
+            jumps = []
+            diagonals = []
+            for square in range(self.squares):
+                x_coord = square % size + x_change
+                y_coord = square // size + y_change
+                if not (0 <= x_coord < size and 0 <= y_coord < size):
+                    self.edge_blocked |= 1 << (square << 2 | direction)
+                    neighbours.append(-1)
+                    jumps.append(-1)
+                    diagonals.append(())
+                    continue
+                neighbours.append(y_coord * size + x_coord)
+                if 0 <= x_coord + x_change < size and 0 <= y_coord + y_change < size:
+                    jumps.append((y_coord + y_change) * size + x_coord + x_change)
+                else:
+                    jumps.append(-1)
+                sides = []
+                for aside in asides:
+                    side_x = x_coord + DIRECTIONS[aside][0]
+                    side_y = y_coord + DIRECTIONS[aside][1]
+                    if 0 <= side_x < size and 0 <= side_y < size:
+                        sides.append((aside, side_y * size + side_x))
+                diagonals.append(tuple(sides))
+            self.neighbours.append(tuple(neighbours))
+            self.jumps.append(tuple(jumps))
+            self.diagonals.append(tuple(diagonals))
+        v_blocks = []                                       # vertical fence (x, y) is left of square (x, y)
+        for y_coord in range(size):
+            for x_coord in range(1, size):
+                square = y_coord * size + x_coord
+                v_blocks.append(1 << ((square - 1) << 2 | RIGHT) | 1 << (square << 2 | LEFT))
+        h_blocks = []                                       # horizontal fence (x, y) is above square (x, y)
+        for y_coord in range(1, size):
+            for x_coord in range(size):
+                square = y_coord * size + x_coord
+                h_blocks.append(1 << ((square - size) << 2 | DOWN) | 1 << (square << 2 | UP))
+        self.v_blocks = tuple(v_blocks)
+        self.h_blocks = tuple(h_blocks)
+
+    def blocked_bits(self, v_fences, h_fences):
+        """Takes the two fence masks and returns the edge-blocked bitset for a board holding those fences."""
+        blocked = self.edge_blocked
+        for index in set_bits(v_fences):
+            blocked |= self.v_blocks[index]
+        for index in set_bits(h_fences):
+            blocked |= self.h_blocks[index]
+        return blocked
+
+    def fence_slot(self, direction, coord_tuple):
+        """Takes a fence direction and coordinates tuple and returns the bit index of that fence slot in its mask,
+        or -1 if the fence would be off the board. A vertical fence at (x, y) runs along the left side of that
+        square and a horizontal fence along its top."""
+        x_coord = coord_tuple[0]
+        y_coord = coord_tuple[1]
+        size = self.size
+        if direction == "v" and 1 <= x_coord < size and 0 <= y_coord < size:
+            return y_coord * (size - 1) + x_coord - 1
+        if direction == "h" and 0 <= x_coord < size and 1 <= y_coord < size:
+            return (y_coord - 1) * size + x_coord
+        return -1
+
+    def pawn_targets(self, square, occupied, blocked):
+        """Takes a pawn's square, the occupancy mask and the edge-blocked bitset and returns a list of the squares
+        that pawn may move to, found in one pass over the four directions with the neighbour, jump and diagonal
+        tables. Nothing is read but the arguments, so Board and Position share it."""
+        neighbours = self.neighbours
+        targets = []
+        for direction in range(4):
+            if blocked >> (square << 2 | direction) & 1:
+                continue
+            neighbour = neighbours[direction][square]
+            if not occupied >> neighbour & 1:                                   # single space move
+                targets.append(neighbour)
+                continue
+            jump = self.jumps[direction][square]
+            if not blocked >> (neighbour << 2 | direction) & 1 and not occupied >> jump & 1:
+                targets.append(jump)                                            # jump over the other pawn
+                continue
+            for aside, target in self.diagonals[direction][square]:            # jump blocked, so side step
+                if not blocked >> (neighbour << 2 | aside) & 1 and not occupied >> target & 1 and target not in targets:
+                    targets.append(target)
+        return targets
+
+    def open_fences(self, taken_v, taken_h):
+        """Takes vertical and horizontal masks of fence slots that are taken or ruled out and returns a list of
+        (direction, coordinates tuple) pairs for every other slot."""
+        size = self.size
+        fences = []
+        for index in range(self.v_slots):
+            if not taken_v >> index & 1:
+                fences.append(("v", (index % (size - 1) + 1, index // (size - 1))))
+        for index in range(self.h_slots):
+            if not taken_h >> index & 1:
+                fences.append(("h", (index % size, index // size + 1)))
+        return fences
+
+    def distance_map(self, goal, v_fences, h_fences, blocked):
+        """Takes a goal (a row number, or ~column), the fence masks and the edge-blocked bitset they make, and
+        returns a tuple holding, for every square, the number of single space moves needed to reach it, or -1 if it
+        cannot be reached. The map is looked up in the distance cache shared by every board of this kind, and
+        otherwise built by a breadth first search out from the goal and added to it. Only the cache is written,
+        under its lock, so any thread may call this. """
+        key, transform = self.canonical_distance_key(goal, v_fences, h_fences)
+        distance_cache = self.distance_cache
+        distances = distance_cache.get(key)
+        if distances is not None:
+            if _STATS:
+                QuoridorStats.count("distance_map_shared_hits")
+            if transform != IDENTITY:
+                distances = tuple(distances[square] for square in self.square_symmetry[transform])
+            return distances
+        step = self.step
+        distances = [-1] * self.squares
+        frontier = list(self.goal_squares(goal))
+        for square in frontier:
+            distances[square] = 0
+        for square in frontier:                 # frontier grows as we go, so this visits squares in distance order
+            next_distance = distances[square] + 1
+            for direction in range(4):
+                if not blocked >> (square << 2 | direction) & 1:
+                    neighbour = square + step[direction]
+                    if distances[neighbour] < 0:
+                        distances[neighbour] = next_distance
+                        frontier.append(neighbour)
+        distances = tuple(distances)
+        if _STATS:
+            QuoridorStats.count("distance_map_builds")
+            QuoridorStats.count("distance_map_squares", len(frontier))
+        with _distance_cache_lock:
+            if len(distance_cache) >= DISTANCE_CACHE_SIZE:
+                del distance_cache[next(iter(distance_cache))]
+            if transform == IDENTITY:
+                distance_cache[key] = distances
+            else:
+                distance_cache[key] = tuple(distances[square] for square in self.square_symmetry[transform])
+        return distances
+
+    def cut_fences(self, root, goal_side, v_fences, h_fences):
+        """Takes a pawn's square, its goal (a row number, or ~column) and the fence masks and returns the
+        (vertical, horizontal) masks of open fence slots that would cut that pawn off from its goal side. Only a
+        bridge of the open square graph can do that, so a single depth first search finds them all (Tarjan's bridge
+        finding). The goal side is joined to an extra node so that a bridge only counts if the goal lies beyond
+        it. """
+        goal = self.squares                                                     # extra node joined to the goal side
+        order = [-1] * (goal + 1)
+        low = [0] * (goal + 1)
+        reaches_goal = [False] * (goal + 1)
+        reaches_goal[goal] = True
+        cut_v = 0
+        cut_h = 0
+        counter = 0
+        order[root] = low[root] = counter
+        stack = [(root, -1, None, self.open_neighbours(root, goal_side, v_fences, h_fences))]
+        while stack:
+            node, parent, wall, neighbours = stack[-1]
+            if neighbours:
+                neighbour, neighbour_wall = neighbours.pop()
+                if neighbour == parent:
+                    continue
+                if order[neighbour] < 0:
+                    counter += 1
+                    order[neighbour] = low[neighbour] = counter
+                    if neighbour == goal:
+                        next_neighbours = [(square, None) for square in self.goal_squares(goal_side)]
+                    else:
+                        next_neighbours = self.open_neighbours(neighbour, goal_side, v_fences, h_fences)
+                    stack.append((neighbour, node, neighbour_wall, next_neighbours))
+                elif order[neighbour] < low[node]:
+                    low[node] = order[neighbour]
+                continue
+            stack.pop()
+            if parent < 0:
+                continue
+            if low[node] < low[parent]:
+                low[parent] = low[node]
+            if reaches_goal[node]:
+                reaches_goal[parent] = True
+                if low[node] > order[parent] and wall is not None:             # bridge with the goal beyond it
+                    cut_v |= wall[0]
+                    cut_h |= wall[1]
+        return cut_v, cut_h
+
+    def open_neighbours(self, square, goal, v_fences, h_fences):
+        """Helper method for cut_fences that lists (neighbour, wall) pairs for every open side of a square, plus the
+        extra goal node if the square is on the goal side (a row, or ~column). """
+        walls = self.walls
+        step = self.step
+        neighbours = []
+        for direction in range(4):
+            wall = walls[direction][square]
+            if wall is not None and not (v_fences & wall[0] or h_fences & wall[1]):
+                neighbours.append((square + step[direction], wall))
+        if square // self.size == goal if goal >= 0 else square % self.size == ~goal:
+            neighbours.append((self.squares, None))
+        return neighbours
+
+    def build_zobrist(self):
+        """Builds the Zobrist hashing keys: a random 64 bit number for each pawn on each square, each fence slot,
+        each count of fences remaining per player and each player but P1 being the side to move. A fixed seed keeps
+        the keys, and so every position hash, the same across processes. """
+        generator = random.Random(20210812)
+        self.zobrist_pawn = [[generator.getrandbits(64) for _ in range(self.squares)] for _ in self.names]
+        self.zobrist_fence = {"v": [generator.getrandbits(64) for _ in range(self.v_slots)],
+                              "h": [generator.getrandbits(64) for _ in range(self.h_slots)]}
+        self.zobrist_fences_left = [[generator.getrandbits(64) for _ in range(self.fences_per_player + 1)]
+                                    for _ in self.names]
+        self.zobrist_turn = (0,) + tuple(generator.getrandbits(64) for _ in self.names[1:])
+
+    def build_symmetry(self):
+        """Builds the symmetry tables. For each transform: where each square and each fence slot goes, a byte lookup
+        table per fence mask so a whole mask can be moved a byte at a time, and the Zobrist keys rearranged so that
+        hashing a position with them gives the hash of its transformed form. With four players every transform
+        swaps some players but not the order of play, so their positions only count as symmetric to themselves
+        (though fence layouts, and so distance maps, are still shared). """
+        size = self.size
+        last = size - 1
+        self.square_symmetry = []
+        self.fence_symmetry = []
+        self.mask_symmetry = []
+        self.zobrist_symmetry = []
+        for transform in SYMMETRIES:
+            mirror = transform in (MIRROR, ROTATE)
+            swap = transform in (SWAP, ROTATE)
+            square_map = []
+            for y_coord in range(size):
+                for x_coord in range(size):
+                    square_map.append((last - y_coord if swap else y_coord) * size +
+                                      (last - x_coord if mirror else x_coord))
+            v_map = []
+            for y_coord in range(size):                     # vertical fence (x, y) is left of square (x, y)
+                for x_coord in range(1, size):
+                    v_map.append((last - y_coord if swap else y_coord) * last +
+                                 (size - x_coord if mirror else x_coord) - 1)
+            h_map = []
+            for y_coord in range(1, size):                  # horizontal fence (x, y) is above square (x, y)
+                for x_coord in range(size):
+                    h_map.append((size - y_coord if swap else y_coord) * size - size +
+                                 (last - x_coord if mirror else x_coord))
+            fence_maps = {"v": tuple(v_map), "h": tuple(h_map)}
+            byte_tables = {}
+            for direction, fence_map in fence_maps.items():
+                byte_tables[direction] = []
+                for byte in range(self.mask_bytes):
+                    moved_bits = [1 << fence_map[index] if index < len(fence_map) else 0
+                                  for index in range(byte * 8, byte * 8 + 8)]
+                    table = [0]
+                    for moved in moved_bits:            # entries for the next bit are the ones so far plus its mask
+                        table += [entry | moved for entry in table]
+                    byte_tables[direction].append(table)
+            if self.players == 2:
+                players = (1, 0) if swap else (0, 1)        # P1 to move is P2 to move once colours swap
+                self.zobrist_symmetry.append((
+                    [[self.zobrist_pawn[players[index]][square_map[square]] for square in range(self.squares)]
+                     for index in (0, 1)],
+                    {direction: [self.zobrist_fence[direction][fence_map[index]] for index in range(len(fence_map))]
+                     for direction, fence_map in fence_maps.items()},
+                    [self.zobrist_fences_left[players[index]] for index in (0, 1)],
+                    tuple(self.zobrist_turn[players[index]] for index in (0, 1))))
+            else:
+                self.zobrist_symmetry.append((self.zobrist_pawn, self.zobrist_fence, self.zobrist_fences_left,
+                                              self.zobrist_turn))
+            self.square_symmetry.append(tuple(square_map))
+            self.fence_symmetry.append(fence_maps)
+            self.mask_symmetry.append(byte_tables)
+        self.symmetries = SYMMETRIES if self.players == 2 else (IDENTITY,)
+        # What each hash changes by when the turn passes on from the player with that index (or back to them).
+        self.turn_changes = tuple(tuple(zobrist[3][index] ^ zobrist[3][(index + 1) % self.players]
+                                        for zobrist in self.zobrist_symmetry) for index in range(self.players))
+
+    def goal_squares(self, goal):
+        """Takes a goal, a row number or ~column, and returns the range of square indexes on it."""
+        if goal >= 0:
+            return range(goal * self.size, (goal + 1) * self.size)
+        return range(~goal, self.squares, self.size)
+
+    def transform_mask(self, mask, direction, transform):
+        """Takes a fence mask, its direction ("v" or "h") and a transform and returns the mask of the moved
+        fences."""
+        tables = self.mask_symmetry[transform][direction]
+        moved = 0
+        for byte in range(self.mask_bytes):
+            moved |= tables[byte][mask >> (byte * 8) & 0xFF]
+        return moved
+
+    def transform_move(self, move, transform):
+        """Takes a (kind, coordinates tuple) move and a transform and returns the same move in the transformed
+        position. Since every transform is its own inverse, this also maps a move found in the transformed position
+        back. """
+        kind, coord_tuple = move
+        size = self.size
+        if kind == "p":
+            return kind, self.coordinates[self.square_symmetry[transform][coord_tuple[1] * size + coord_tuple[0]]]
+        if kind == "v":
+            index = self.fence_symmetry[transform]["v"][coord_tuple[1] * (size - 1) + coord_tuple[0] - 1]
+            return kind, (index % (size - 1) + 1, index // (size - 1))
+        index = self.fence_symmetry[transform]["h"][(coord_tuple[1] - 1) * size + coord_tuple[0]]
+        return kind, (index % size, index // size + 1)
+
+    def transform_state(self, state, transform):
+        """Takes a two player state tuple as made by QuoridorGame.get_state and a transform and returns the
+        transformed state. The SWAP and ROTATE transforms swap the players, so P1's pawn and fences become P2's and
+        the turn and winner change sides too. """
+        if transform == IDENTITY:
+            return state
+        p1_square, p2_square, v_fences, h_fences, p1_fences, p2_fences, turn, winner = state
+        square_map = self.square_symmetry[transform]
+        v_fences = self.transform_mask(v_fences, "v", transform)
+        h_fences = self.transform_mask(h_fences, "h", transform)
+        if transform in (SWAP, ROTATE):
+            return (square_map[p2_square], square_map[p1_square], v_fences, h_fences, p2_fences, p1_fences, 3 - turn,
+                    (3 - winner) % 3)
+        return square_map[p1_square], square_map[p2_square], v_fences, h_fences, p1_fences, p2_fences, turn, winner
+
+    def canonical_state(self, state):
+        """Takes a state tuple and returns (canonical state, transform): the lexicographically smallest of its
+        symmetric forms and the transform that produces it from state. Symmetric positions share one canonical
+        state, and transform_move with the same transform maps moves between the two. """
+        return min((self.transform_state(state, transform), transform) for transform in self.symmetries)
+
+    def canonical_distance_key(self, goal, v_fences, h_fences):
+        """Takes a goal and fence masks and returns (key, transform) for the shared distance cache: the smallest
+        (goal, vertical fences, horizontal fences) of the four symmetric forms, and the transform to it. A distance
+        map only depends on the fences and the goal, so this holds whatever the number of players. """
+        last = self.size - 1
+        if goal >= 0:
+            goals = (goal, goal, last - goal, last - goal)
+        else:
+            goals = (goal, ~(last - ~goal), goal, ~(last - ~goal))
+        best = ((goal, v_fences, h_fences), IDENTITY)
+        for transform in (MIRROR, SWAP, ROTATE):
+            key = (goals[transform], self.transform_mask(v_fences, "v", transform),
+                   self.transform_mask(h_fences, "h", transform))
+            if key < best[0]:
+                best = (key, transform)
+        return best
+
+
+_board_tables = {}                      # BoardTables by (size, players)
+_board_tables_lock = threading.Lock()
+
+
+def board_tables(size=BOARD_SIZE, players=2):
+    """Takes a board size and number of players and returns their BoardTables, building them the first time."""
+    tables = _board_tables.get((size, players))
+    if tables is None:
+        with _board_tables_lock:
+            tables = _board_tables.get((size, players))
+            if tables is None:
+                tables = _board_tables[(size, players)] = BoardTables(size, players)
+    return tables
+
+
+# The standard game's tables are built at import, and the names below are kept for code written for it alone.
+_STANDARD = board_tables()
+COORDINATES = _STANDARD.coordinates
+GOAL_ROWS = _STANDARD.goals
+PLAYER_INDEX = _STANDARD.player_index
+FENCES_PER_PLAYER = _STANDARD.fences_per_player
+FENCE_MASK_BYTES = _STANDARD.mask_bytes
+STATE_BYTES = 2 + 2 * FENCE_MASK_BYTES + 1                  # 21 bytes, see QuoridorGame.to_bytes
+SQUARE_SYMMETRY = _STANDARD.square_symmetry
+NEIGHBOURS = _STANDARD.neighbours       # move generator tables [direction][square], see BoardTables.build_moves
+JUMPS = _STANDARD.jumps
+DIAGONALS = _STANDARD.diagonals
+_NEXT_TURN = {count: {name: PLAYER_NAMES[(index + 1) % count] for index, name in enumerate(PLAYER_NAMES[:count])}
+              for count in (2, 4)}
+_PREVIOUS_TURN = {count: {after: before for before, after in turns.items()} for count, turns in _NEXT_TURN.items()}
+
+
+def transform_mask(mask, direction, transform):
+    """Takes a standard board fence mask, its direction ("v" or "h") and a transform and returns the mask of the
+    moved fences."""
+    return _STANDARD.transform_mask(mask, direction, transform)
+
+
+def transform_move(move, transform):
+    """Takes a (kind, coordinates tuple) move on the standard board and a transform and returns the same move in the
+    transformed position. Since every transform is its own inverse, this also maps a move found in the transformed
+    position back. """
+    return _STANDARD.transform_move(move, transform)
+
+
+def transform_state(state, transform):
+    """Takes a standard game state tuple as made by QuoridorGame.get_state and a transform and returns the
+    transformed state."""
+    return _STANDARD.transform_state(state, transform)
+
+
+def canonical_state(state):
+    """Takes a standard game state tuple and returns (canonical state, transform): the lexicographically smallest of
+    its four symmetric forms and the transform that produces it from state."""
+    return _STANDARD.canonical_state(state)
+
+
+def canonical_distance_key(goal_row, v_fences, h_fences):
+    """Takes a goal row and standard board fence masks and returns (key, transform) for the shared distance
+    cache."""
+    return _STANDARD.canonical_distance_key(goal_row, v_fences, h_fences)
 
 
 class QuoridorGame:
     """Creates a game object for Quoridor. Handles all pertinent game functionality by communicating with the Board,
     Player, and GameState classes by instantiating them and calling heir own class methods. Includes get methods for
     all private data members plus methods for moving a pawn, changing whose turn it is, placing a fence,
-    and determining if a player has won. There are also helper methods for moving pawns and placing fences. """
-
-    def __init__(self):
-        """Initializes the elements of the game, the two players as Player class objects with their name (P1 or P2)
-        and position, a fair player Player object for use in the fair play method,  the game board as a Board class
-        object which holds a representation of the board and a dictionary of space locations, and the game state as a
-        GameState class object which holds whose turn it is and if there's a winner. """
-        self._board = Board()
-        self._p1 = Player((4, 0), "P1")
-        self._p2 = Player((4, 8), "P2")
-        self.fair_player = Player((0, 0), "")
-        self._game_state = GameState()
+    and determining if a player has won. There are also helper methods for moving pawns and placing fences, and an
+    unvalidated push / pop pair that keeps a Zobrist hash of the position up to date for search. All four classes use
+    __slots__ so a game costs well under a kilobyte, which matters when a server holds many idle games. """
+
+    __slots__ = ("_tables", "_board", "_players", "_game_state", "_hashes", "_history", "_listeners")
+
+    def __init__(self, size=BOARD_SIZE, players=2):
+        """Initializes the elements of the game for a board of size x size squares and 2 or 4 players: the players
+        as Player class objects with their name (P1 to P4) and position, the game board as a Board class object
+        which holds the pawn and fence bitboards, and the game state as a GameState class object which holds whose
+        turn it is and if there's a winner. The tables for that size and player count are shared by every such game
+        (see board_tables). Raises ValueError for an unsupported size or player count. """
+        tables = board_tables(size, players)
+        self._tables = tables
+        self._board = Board(tables)
+        self._players = tuple(Player(tables.coordinates[square], name, tables.fences_per_player)
+                              for name, square in zip(tables.names, tables.starts))
+        self._game_state = GameState(players)
+        if tables.opening_hashes is None:
+            tables.opening_hashes = tuple(self.compute_hashes())
+        self._hashes = list(tables.opening_hashes)
+        self._history = []
+        self._listeners = None
+
+    def get_tables(self):
+        """Get method for the BoardTables of this game's board size and player count."""
+        return self._tables
 
     def get_board(self):
         """Get method for game board object."""
@@ -27,30 +579,292 @@ class QuoridorGame:
 
     def get_p1(self):
         """Get method for P1 object."""
-        return self._p1
+        return self._players[0]
 
     def get_p2(self):
         """Get method for P2 object."""
-        return self._p2
+        return self._players[1]
+
+    def get_player(self, player_num):
+        """Takes a player number (1 up to the number of players) and returns that Player object, or None if there is
+        no such player in this game."""
+        if 1 <= player_num <= len(self._players):
+            return self._players[player_num - 1]
+        return None
+
+    def get_players(self):
+        """Returns a list of the Player objects in order of play."""
+        return list(self._players)
 
     def get_game_state(self):
         """Get method for game state object."""
         return self._game_state
 
+    def clear_caches(self):
+        """Drops the board's path caches so an idle game only holds its position."""
+        self._board.clear_caches()
+
+    def add_listener(self, listener):
+        """Takes a callable and calls it with a PawnMoved, FencePlaced, TurnChanged or GameWon event for each change
+        made by move_pawn and place_fence, in order, on the thread that made the move. Moves made with push and pop
+        are search and are not reported. A game without listeners pays one test per move. """
+        if self._listeners is None:
+            self._listeners = []
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Takes a callable given to add_listener and stops calling it."""
+        if self._listeners is not None and listener in self._listeners:
+            self._listeners.remove(listener)
+            if not self._listeners:
+                self._listeners = None
+
+    def emit(self, *events):
+        """Hands each event to every listener in turn."""
+        for event in events:
+            for listener in list(self._listeners):
+                listener(event)
+
+    def get_hash(self):
+        """Get method for the 64 bit Zobrist hash of the current position."""
+        return self._hashes[IDENTITY]
+
+    def get_canonical_hash(self):
+        """Returns (key, transform): the smallest of the hashes of the position's four symmetric forms, which all
+        four share, and the transform that leads to the form it belongs to. Caches keyed on it hold one entry for
+        the four forms; a move stored with it should be put through transform_move on the way in and out. The
+        hashes of all four forms are kept up to date by every move, so this costs no more than get_hash. Four
+        player positions have no symmetric forms, so for them this is (get_hash(), IDENTITY). """
+        hashes = self._hashes
+        key = min(hashes)
+        return key, hashes.index(key)
+
+    def snapshot(self):
+        """Returns the current position as an immutable Position, which any number of threads can analyse and play
+        moves on while this game goes on. Taking one copies a handful of integers and no board."""
+        tables = self._tables
+        board = self._board
+        winner = self._game_state.get_game_state()
+        return Position(tables, board.get_pawn_squares(), board.get_v_fences(), board.get_h_fences(),
+                        board.get_blocked(), tuple(player.get_fences_remaining() for player in self._players),
+                        tables.player_index[self._game_state.get_turn()],
+                        0 if winner is None else tables.player_index[winner] + 1, tuple(self._hashes))
+
+    def get_state(self):
+        """Returns the whole position as a flat tuple of small integers: each player's square, the vertical and
+        horizontal fence masks, each player's fences remaining, whose turn it is (1 for P1 and so on) and the winner
+        (0 for none). Squares are numbered y * size + x, so a standard game's state is (P1's square, P2's square,
+        vertical, horizontal, P1's fences, P2's fences, turn, winner). The tuple is cheap to pickle and send to
+        another process."""
+        tables = self._tables
+        size = tables.size
+        squares = []
+        fences = []
+        for player in self._players:
+            position = player.get_position()
+            squares.append(position[1] * size + position[0])
+            fences.append(player.get_fences_remaining())
+        winner = self._game_state.get_game_state()
+        return (tuple(squares) + (self._board.get_v_fences(), self._board.get_h_fences()) + tuple(fences) +
+                (tables.player_index[self._game_state.get_turn()] + 1,
+                 0 if winner is None else tables.player_index[winner] + 1))
+
+    def to_bytes(self):
+        """Packs the position into STATE_BYTES bytes: one byte per pawn square, whose top bits say whether P2 is to
+        move and whether the game has been won (always by the player who just moved), then nine bytes for each
+        fence mask and one byte holding both fence counts. Only the standard 9 x 9 two player game packs this way,
+        so other games raise ValueError; use get_state for them. """
+        if self._tables is not _STANDARD:
+            raise ValueError("only a standard 9 x 9 two player game can be packed into bytes")
+        p1_square, p2_square, v_fences, h_fences, p1_fences, p2_fences, turn, winner = self.get_state()
+        return (bytes((p1_square | (turn - 1) << 7, p2_square | (winner != 0) << 7)) +
+                v_fences.to_bytes(FENCE_MASK_BYTES, "little") + h_fences.to_bytes(FENCE_MASK_BYTES, "little") +
+                bytes((p1_fences | p2_fences << 4,)))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Takes bytes made by to_bytes and returns a new game in that position. Raises ValueError if the data is
+        the wrong length or could not have come from a game: a pawn off the board or on the other's square, a fence
+        bit past the last slot, more fences left than a player starts with or a count that does not match the
+        fences on the board, or a won flag that does not match the pawns on their goal rows. """
+        if len(data) != STATE_BYTES:
+            raise ValueError("expected %d bytes of game state, got %d" % (STATE_BYTES, len(data)))
+        tables = _STANDARD
+        turn = (data[0] >> 7) + 1
+        winner = 0
+        if data[1] >> 7:
+            winner = 2 if turn == 1 else 1
+        squares = (data[0] & 0x7F, data[1] & 0x7F)
+        v_fences = int.from_bytes(data[2:2 + FENCE_MASK_BYTES], "little")
+        h_fences = int.from_bytes(data[2 + FENCE_MASK_BYTES:2 + 2 * FENCE_MASK_BYTES], "little")
+        fences = (data[-1] & 0x0F, data[-1] >> 4)
+        if squares[0] >= tables.squares or squares[1] >= tables.squares or squares[0] == squares[1]:
+            raise ValueError("corrupt game state: pawn squares %d and %d" % squares)
+        if v_fences >> tables.v_slots or h_fences >> tables.h_slots:
+            raise ValueError("corrupt game state: fence bits past the last slot")
+        placed = bin(v_fences).count("1") + bin(h_fences).count("1")
+        if max(fences) > tables.fences_per_player or placed != 2 * tables.fences_per_player - sum(fences):
+            raise ValueError("corrupt game state: %d fences placed but %d and %d left" % ((placed,) + fences))
+        for index in range(2):
+            if (tables.goal_masks[index] >> squares[index] & 1) != (winner == index + 1):
+                raise ValueError("corrupt game state: winner %d does not match the pawns" % winner)
+        game = cls()
+        game.set_state(squares + (v_fences, h_fences) + fences + (turn, winner))
+        return game
+
+    def reset(self):
+        """Puts this game back to the opening position so the same objects can be reused for another game. The
+        opening is copied from what the tables keep for it, hashes included, so nothing is recomputed."""
+        tables = self._tables
+        for player, square in zip(self._players, tables.starts):
+            player.set_position(tables.coordinates[square])
+            player.set_fences_remaining(tables.fences_per_player)
+            player.set_winning(False)
+        self._board.reset()
+        self._game_state.set_turn("P1")
+        self._game_state.set_game_state(None)
+        self._hashes = list(tables.opening_hashes)
+        self._history = []
+
+    def set_state(self, state):
+        """Takes a tuple made by get_state and puts this game into that position, recomputing the hash and
+        clearing the push / pop stack."""
+        tables = self._tables
+        count = tables.players
+        squares = state[:count]
+        v_fences, h_fences = state[count:count + 2]
+        fences = state[count + 2:2 * count + 2]
+        turn, winner = state[2 * count + 2:]
+        for index, player in enumerate(self._players):
+            player.set_position(tables.coordinates[squares[index]])
+            player.set_fences_remaining(fences[index])
+            player.set_winning(winner == index + 1)
+        self._board.load(squares, v_fences, h_fences)
+        self._game_state.set_turn(tables.names[turn - 1])
+        self._game_state.set_game_state(None if winner == 0 else tables.names[winner - 1])
+        self._hashes = self.compute_hashes()
+        self._history = []
+
     def change_turn(self):
         """Sets turn to next player."""
+        changes = self._tables.turn_changes[self._tables.player_index[self._game_state.get_turn()]]
         self._game_state.change_turn()
+        hashes = self._hashes
+        hashes[0] ^= changes[0]
+        hashes[1] ^= changes[1]
+        hashes[2] ^= changes[2]
+        hashes[3] ^= changes[3]
+
+    def compute_hash(self):
+        """Computes the Zobrist hash of the current position from scratch."""
+        return self.compute_hashes()[IDENTITY]
+
+    def compute_hashes(self):
+        """Computes the Zobrist hashes of the current position and its symmetric forms from scratch, as a list
+        indexed by transform: pawn squares, fences, fences remaining and side to move. Moves keep them up to date
+        incrementally, so this is only needed when a position is set up. """
+        tables = self._tables
+        size = tables.size
+        turn = tables.player_index[self._game_state.get_turn()]
+        hashes = []
+        for pawn_keys, fence_keys, fences_left_keys, turn_keys in tables.zobrist_symmetry:
+            key = turn_keys[turn]
+            for index, player in enumerate(self._players):
+                position = player.get_position()
+                key ^= pawn_keys[index][position[1] * size + position[0]]
+                key ^= fences_left_keys[index][player.get_fences_remaining()]
+            for direction, fences in (("v", self._board.get_v_fences()), ("h", self._board.get_h_fences())):
+                direction_keys = fence_keys[direction]
+                for index in set_bits(fences):
+                    key ^= direction_keys[index]
+            hashes.append(key)
+        return hashes
+
+    def hash_pawn_move(self, player, coord_tuple):
+        """Takes a Player object and the coordinates tuple it is about to move to and updates the hashes for the
+        pawn leaving its square and landing on the new one. Moving it back updates them the same way. """
+        tables = self._tables
+        index = tables.player_index[player.get_player_name()]
+        position = player.get_position()
+        start = position[1] * tables.size + position[0]
+        end = coord_tuple[1] * tables.size + coord_tuple[0]
+        hashes = self._hashes
+        for transform, zobrist in enumerate(tables.zobrist_symmetry):
+            keys = zobrist[0][index]
+            hashes[transform] ^= keys[start] ^ keys[end]
+
+    def hash_fence(self, player, direction, coord_tuple):
+        """Takes a Player object about to spend a fence, plus the fence direction and coordinates tuple, and updates
+        the hashes for the new fence and the player's fence count dropping by one. Called again with the fence
+        back in hand, it undoes that. """
+        tables = self._tables
+        index = tables.player_index[player.get_player_name()]
+        slot = self._board.fence_index(direction, coord_tuple)
+        fences_remaining = player.get_fences_remaining()
+        hashes = self._hashes
+        for transform, zobrist in enumerate(tables.zobrist_symmetry):
+            keys = zobrist[2][index]
+            hashes[transform] ^= zobrist[1][direction][slot] ^ keys[fences_remaining] ^ keys[fences_remaining - 1]
+
+    def push(self, move):
+        """Takes a move as a (kind, coordinates tuple) pair, where kind is "p" for a pawn move or "v" / "h" for a
+        fence, and plays it for the side to move without any validation. Meant for search over moves that are
+        already known to be legal, such as those from legal_pawn_moves and legal_fences. Keeps what pop needs to
+        undo the move on a stack, so both are O(1). Do not mix with move_pawn / place_fence between a push and its
+        pop. """
+        kind, coord_tuple = move
+        tables = self._tables
+        index = tables.player_index[self._game_state.get_turn()]
+        player = self._players[index]
+        self._history.append((move, player.get_position()))
+        if kind == "p":
+            self.hash_pawn_move(player, coord_tuple)
+            self._board.move_pawn(player, coord_tuple)
+            square = coord_tuple[1] * tables.size + coord_tuple[0]
+            if tables.goal_masks[index] >> square & 1:                              # pawn reached its goal side
+                self._game_state.set_game_state(player.get_player_name())
+                player.set_winning()
+        else:
+            self.hash_fence(player, kind, coord_tuple)
+            self._board.place_fence(kind, coord_tuple)
+            player.dec_fences_remaining()
+        self.change_turn()
+
+    def pop(self):
+        """Undoes the last move made with push and returns it."""
+        move, position = self._history.pop()
+        tables = self._tables
+        self._game_state.undo_turn()
+        index = tables.player_index[self._game_state.get_turn()]
+        player = self._players[index]
+        changes = tables.turn_changes[index]
+        hashes = self._hashes
+        hashes[0] ^= changes[0]
+        hashes[1] ^= changes[1]
+        hashes[2] ^= changes[2]
+        hashes[3] ^= changes[3]
+        if move[0] == "p":
+            self.hash_pawn_move(player, position)
+            self._board.move_pawn(player, position)
+            if player.get_winning():
+                self._game_state.set_game_state(None)
+                player.set_winning(False)
+        else:
+            self._board.remove_fence(move[0], move[1])
+            player.inc_fences_remaining()
+            self.hash_fence(player, move[0], move[1])
+        return move
 
+    @timed("move_pawn")
     def move_pawn(self, player_num, coord_tuple):
         """player_num parameter is an integer that indicates who is moving, and coord_tuple is where they will move.
         If the move is forbidden or blocked by a fence, returns False. If the move is successful or the player wins,
         returns True. If the game has already been won, return False. Uses helper method to get the appropriate
         player object. Uses the GameState class object to determine if the game has been won or not, and the Board
         class object to validate and move the pawn. """
-        if player_num == 1:
-            return self.help_move_pawn(self._p1, coord_tuple)
-        if player_num == 2:
-            return self.help_move_pawn(self._p2, coord_tuple)
+        player = self.get_player(player_num)
+        if player is not None:
+            return self.help_move_pawn(player, coord_tuple)
 
     def help_move_pawn(self, player, coord_tuple):
         """Helper method for move_pawn that takes a new coordinates tuple plus the player object in order to use
@@ -61,14 +875,19 @@ class QuoridorGame:
         if self._game_state.get_game_state() is None:                           # if the game hasn't been won
             if player.get_player_name() == self.get_game_state().get_turn():    # if it's the correct player's turn
                 if self._board.validate_pawn(player, coord_tuple) is True:      # if the move is valid
+                    start = player.get_position()
+                    self.hash_pawn_move(player, coord_tuple)
                     self._board.move_pawn(player, coord_tuple)
-                    self._game_state.change_turn()
+                    self.change_turn()
                     self._game_state.determine_game_state(self._board, player)
+                    if self._listeners:
+                        self.emit_pawn_move(player, start)
                     return True
         return False
 
+    @timed("place_fence")
     def place_fence(self, player_num, direction, coord_tuple):
-        """Takes an integer that represents the player number (1 or 2), whether the fence is to be placed vertically
+        """Takes an integer that represents the player number (1 to 4), whether the fence is to be placed vertically
         or horizontally (v or h), and a tuple containing the coordinates where the fence will be placed. If player
         has no fence left, or if the fence is out of the boundaries of the board, or if there is already a fence
         there and the new fence will overlap or intersect with the existing fence, returns False. If the fence can be
@@ -76,17 +895,16 @@ class QuoridorGame:
         Player object and ascertain how many fences they have remaining and decrement their total if fence is placed.
         Helper method also Uses GameState object to determine if there's been a winner and Board class object to
         validate and place fence. """
-        if player_num == 1:
-            return self.help_place_fence(self._p1, self._p2, direction, coord_tuple)
-        if player_num == 2:
-            return self.help_place_fence(self._p2, self._p1, direction, coord_tuple)
+        player = self.get_player(player_num)
+        if player is not None:
+            return self.help_place_fence(player, direction, coord_tuple)
 
-    def help_place_fence(self, player, other_player, direction, coord_tuple):
+    def help_place_fence(self, player, direction, coord_tuple):
         """Helper method for place_fence which takes direction and new coordinates tuple, plus the correct player
         object to more easily access Player class data and methods. Checks to see if the game has been won already,
         if it's the correct player's turn, if the player has any remaining fences, then calls the validate_fence
         method to make sure the fence placement is legal. If so, it calls place_fence to change the board
-        representation and then fair_play to make sure the other player has a valid path to their goal line. If
+        representation and then fair_play to make sure every player still has a path to their goal side. If
         the fair play rule has been violated it returns "breaks the fair play rule" then calls remove_fence to update
         the game board. If fair play has not been violated it changes whose turn it is and decrements the player's
         remaining fences."""
@@ -95,518 +913,670 @@ class QuoridorGame:
                 if player.get_fences_remaining() > 0:                           # if the player still has fences
                     if self._board.validate_fence(direction, coord_tuple) is True:      # if fence placement is valid
                         self._board.place_fence(direction, coord_tuple)
-                        if self._board.fair_play(other_player, self.fair_player) is True:    # fair play validation
-                            self._game_state.change_turn()
-                            player.dec_fences_remaining()
-                            return True
-                        else:
-                            self._board.remove_fence(direction, coord_tuple)
-                            return "breaks the fair play rule"
+                        for other_player in self._players:                              # fair play validation
+                            if self._board.fair_play(other_player) is not True:
+                                self._board.remove_fence(direction, coord_tuple)
+                                return "breaks the fair play rule"
+                        self.hash_fence(player, direction, coord_tuple)
+                        self.change_turn()
+                        player.dec_fences_remaining()
+                        if self._listeners:
+                            self.emit(FencePlaced(int(player.get_player_name()[1]), direction, coord_tuple,
+                                                  player.get_fences_remaining()),
+                                      TurnChanged(int(self._game_state.get_turn()[1])))
+                        return True
         return False
 
+    def emit_pawn_move(self, player, start):
+        """Helper method for help_move_pawn that tells the listeners a Player object has moved from the start
+        coordinates tuple, and then that the turn has passed on or that the move won the game."""
+        player_num = int(player.get_player_name()[1])
+        if player.get_winning():
+            self.emit(PawnMoved(player_num, start, player.get_position()), GameWon(player_num))
+        else:
+            self.emit(PawnMoved(player_num, start, player.get_position()),
+                      TurnChanged(int(self._game_state.get_turn()[1])))
+
+    def legal_pawn_moves(self, player_num):
+        """Takes an integer that represents the player number (1 to 4) and returns a list of every coordinates tuple
+        move_pawn would accept for that player right now. The list is empty if the game has been won or it isn't
+        that player's turn. """
+        player = self.get_player(player_num)
+        if player is None:
+            return []
+        if self._game_state.get_game_state() is not None or player.get_player_name() != self._game_state.get_turn():
+            return []
+        return self._board.pawn_moves(player)
+
+    def legal_fences(self, player_num):
+        """Takes an integer that represents the player number (1 to 4) and returns a list of every (direction,
+        coordinates tuple) pair place_fence would accept for that player right now. Fair play is settled for all
+        open fence slots at once by Board.legal_fences rather than by placing and removing each fence in turn. The
+        list is empty if the game has been won, it isn't that player's turn or they have no fences left. """
+        player = self.get_player(player_num)
+        if player is None:
+            return []
+        if self._game_state.get_game_state() is not None or player.get_player_name() != self._game_state.get_turn():
+            return []
+        if player.get_fences_remaining() <= 0:
+            return []
+        return self._board.legal_fences(self._players)
+
     def is_winner(self, player_num):
-        """Takes an integer that represents the player number (1 or 2) to access the appropriate Player class object
+        """Takes an integer that represents the player number (1 to 4) to access the appropriate Player class object
         then calls the Player class method get_winning() to see if they've won. Returns True if they have,
         False if they haven't. """
-        if player_num == 1:
-            return self._p1.get_winning()
-        elif player_num == 2:
-            return self._p2.get_winning()
-        else:
+        player = self.get_player(player_num)
+        if player is None:
             return False
+        return player.get_winning()
 
 
-class Board:
-    """Creates, stores, and displays board data. The board holds all fence and pawn positions. Since the board data
-    contains more rows than the actual game board in order to represent horizontal fences, I've included a dictionary
-    with coordinates for the game board as keys that correspond to the coordinates in my board representation. I've
-    also included find_space and set_space methods that translates between the two to handle placement of objects on
-    the board. """
-
-    def __init__(self):
-        """Initializes game board. There are extra rows between the rows where you can place the pawns for placement
-        of horizontal fences. The whole board is surrounded by fences and each space in the rows where horizontal
-        fences can be placed contains a '+' to visually represent the top left corner of a valid space. """
-        self._board = [["+==", "+==", "+==", "+==", "+==", "+==", "+==", "+==", "+==+"],
-                       ["|  ", "   ", "   ", "   ", " P1", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", "   ", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", "   ", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", "   ", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", "   ", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", "   ", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", "   ", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", "   ", "   ", "   ", "   ", "   |"],
-                       ["+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  ", "+  +"],
-                       ["|  ", "   ", "   ", "   ", " P2", "   ", "   ", "   ", "   |"],
-                       ["+==", "+==", "+==", "+==", "+==", "+==", "+==", "+==", "+==+"]]
-
-        self._spaces = {"(0, 0)": (1, 0),           # keys are the game board set of coordinates, corresponding data
-                        "(1, 0)": (1, 1),           # are the coordinates in my board data array
-                        "(2, 0)": (1, 2),
-                        "(3, 0)": (1, 3),
-                        "(4, 0)": (1, 4),
-                        "(5, 0)": (1, 5),
-                        "(6, 0)": (1, 6),
-                        "(7, 0)": (1, 7),
-                        "(8, 0)": (1, 8),
-                        "(0, 1)": (3, 0),
-                        "(1, 1)": (3, 1),
-                        "(2, 1)": (3, 2),
-                        "(3, 1)": (3, 3),
-                        "(4, 1)": (3, 4),
-                        "(5, 1)": (3, 5),
-                        "(6, 1)": (3, 6),
-                        "(7, 1)": (3, 7),
-                        "(8, 1)": (3, 8),
-                        "(0, 2)": (5, 0),
-                        "(1, 2)": (5, 1),
-                        "(2, 2)": (5, 2),
-                        "(3, 2)": (5, 3),
-                        "(4, 2)": (5, 4),
-                        "(5, 2)": (5, 5),
-                        "(6, 2)": (5, 6),
-                        "(7, 2)": (5, 7),
-                        "(8, 2)": (5, 8),
-                        "(0, 3)": (7, 0),
-                        "(1, 3)": (7, 1),
-                        "(2, 3)": (7, 2),
-                        "(3, 3)": (7, 3),
-                        "(4, 3)": (7, 4),
-                        "(5, 3)": (7, 5),
-                        "(6, 3)": (7, 6),
-                        "(7, 3)": (7, 7),
-                        "(8, 3)": (7, 8),
-                        "(0, 4)": (9, 0),
-                        "(1, 4)": (9, 1),
-                        "(2, 4)": (9, 2),
-                        "(3, 4)": (9, 3),
-                        "(4, 4)": (9, 4),
-                        "(5, 4)": (9, 5),
-                        "(6, 4)": (9, 6),
-                        "(7, 4)": (9, 7),
-                        "(8, 4)": (9, 8),
-                        "(0, 5)": (11, 0),
-                        "(1, 5)": (11, 1),
-                        "(2, 5)": (11, 2),
-                        "(3, 5)": (11, 3),
-                        "(4, 5)": (11, 4),
-                        "(5, 5)": (11, 5),
-                        "(6, 5)": (11, 6),
-                        "(7, 5)": (11, 7),
-                        "(8, 5)": (11, 8),
-                        "(0, 6)": (13, 0),
-                        "(1, 6)": (13, 1),
-                        "(2, 6)": (13, 2),
-                        "(3, 6)": (13, 3),
-                        "(4, 6)": (13, 4),
-                        "(5, 6)": (13, 5),
-                        "(6, 6)": (13, 6),
-                        "(7, 6)": (13, 7),
-                        "(8, 6)": (13, 8),
-                        "(0, 7)": (15, 0),
-                        "(1, 7)": (15, 1),
-                        "(2, 7)": (15, 2),
-                        "(3, 7)": (15, 3),
-                        "(4, 7)": (15, 4),
-                        "(5, 7)": (15, 5),
-                        "(6, 7)": (15, 6),
-                        "(7, 7)": (15, 7),
-                        "(8, 7)": (15, 8),
-                        "(0, 8)": (17, 0),
-                        "(1, 8)": (17, 1),
-                        "(2, 8)": (17, 2),
-                        "(3, 8)": (17, 3),
-                        "(4, 8)": (17, 4),
-                        "(5, 8)": (17, 5),
-                        "(6, 8)": (17, 6),
-                        "(7, 8)": (17, 7),
-                        "(8, 8)": (17, 8)
-                        }
+class Position:
+    """An immutable, hashable snapshot of a game's position, made by QuoridorGame.snapshot. It holds only integers
+    and tuples of them: the pawn squares, the fence masks and the edge-blocked bitset they make, each player's
+    fences remaining, the side to move, the winner and the hashes of the symmetric forms. apply returns the Position
+    after a move, sharing every value the move leaves alone with this one, so nothing is copied but a tuple or two.
+    No method writes anything but the locked distance cache shared through the tables, and fair play for a fence is
+    checked on the masks it would make, so threads need no locks to analyse the same positions at once. Two
+    Positions are equal when their positions are, and hash by their Zobrist hash, so they can key a dict. """
 
-    def get_board(self):
-        """Get method for game board."""
-        return self._board
+    __slots__ = ("_tables", "_squares", "_v_fences", "_h_fences", "_blocked", "_fences", "_turn", "_winner",
+                 "_hashes")
 
-    def display_board(self):
-        """Displays game board in it's current state to the console."""
-        for row in self._board:
-            line = ""
-            for space in row:
-                line += space
-            print(line)
-
-    def find_space(self, coord_tuple, horizontal=False):
-        """Takes a new coordinates tuple and returns that space as it is represented in my board data. Extracts x and
-        y coordinates from my _spaces dictionary and sets them to variables for cleaner code. Default horizontal
-        value is False for all operations except horizontal fence placement. """
-        x_coord = self._spaces[str(coord_tuple)][0]
-        y_coord = self._spaces[str(coord_tuple)][1]
-        if horizontal is False:
-            return self._board[x_coord][y_coord]
-        else:
-            return self._board[x_coord-1][y_coord]      # accessing fence row above pawn placement row
-
-    def set_space(self, coord_tuple, space_object):
-        """Takes a new coordinates tuple and the string to be added to that space. Uses my_spaces dictionary to
-        translate the coord_tuple to the proper representation. If the string is a representation of a horizontal
-        fence it analyzes that condition and acts accordingly. """
-        x_coord = self._spaces[str(coord_tuple)][0]
-        y_coord = self._spaces[str(coord_tuple)][1]
-        if "+" in space_object:
-            self._board[x_coord-1][y_coord] = space_object      # If horizontal fence, accesses row above
-        else:
-            self._board[x_coord][y_coord] = space_object
+    def __init__(self, tables, squares, v_fences, h_fences, blocked, fences, turn, winner, hashes):
+        """Takes the BoardTables and the values of the position: a tuple of the pawn squares in player order, the
+        two fence masks and their edge-blocked bitset, a tuple of fences remaining in player order, the index of
+        the player to move, the winner's player number (0 for none) and a tuple of the hashes by transform. Use
+        QuoridorGame.snapshot or apply to make one rather than calling this directly."""
+        set_slot = object.__setattr__
+        set_slot(self, "_tables", tables)
+        set_slot(self, "_squares", squares)
+        set_slot(self, "_v_fences", v_fences)
+        set_slot(self, "_h_fences", h_fences)
+        set_slot(self, "_blocked", blocked)
+        set_slot(self, "_fences", fences)
+        set_slot(self, "_turn", turn)
+        set_slot(self, "_winner", winner)
+        set_slot(self, "_hashes", hashes)
 
-    def validate_pawn(self, player, coord_tuple):
-        """Validates pawn movement by first checking if the new coordinates are off the board. If not, it proceeds to
-        check to see if the move is only attempting to move the allotted single space. If so, checks to see if
-        there's a fence or pawn blocking it's path. It then checks to see if a pawn is attempting to move two spaces.
-        If so it will check to see if the other pawn is adjacent and there is no fence on the other side for a jump.
-        It then checks to see if a diagonal move is attempted. If so, it will check to see if the other pawn is
-        adjacent, a fence is behind it, and if the diagonal move is not blocked by a fence. All directional
-        validation will be handled by sub methods. """
-        x_coord = coord_tuple[0]
-        y_coord = coord_tuple[1]
-        x_change = x_coord - player.get_position()[0]
-        y_change = y_coord - player.get_position()[1]
-        if 0 <= x_coord <= 8 and 0 <= y_coord <= 8:                        # are new coordinates within boundaries
-            if (x_change == -1 or x_change == -2) and y_change == 0:       # attempting to move left one or two spaces
-                return self.check_move_left(player, coord_tuple, x_change)
-            if (x_change == 1 or x_change == 2) and y_change == 0:         # attempting to move right one or two spaces
-                return self.check_move_right(coord_tuple, x_change)
-            if (y_change == -1 or y_change == -2) and x_change == 0:       # attempting to move up one or two spaces
-                return self.check_move_up(player, coord_tuple, y_change)
-            if (y_change == 1 or y_change == 2) and x_change == 0:         # attempting to move down one or two spaces
-                return self.check_move_down(player, coord_tuple, y_change)
-            if abs(x_change) == 1 and abs(y_change) == 1:                  # attempting to move diagonally one space
-                return self.check_diagonal(player, coord_tuple, x_change, y_change)
-        return False
+    def __setattr__(self, name, value):
+        """Refuses every assignment, since a Position never changes."""
+        raise AttributeError("Position is immutable")
 
-    def check_move_left(self, player, coord_tuple, x_change):
-        """Takes a player object, new coordinate tuple, and checks to see if a left move is valid. Returns True if
-        valid and False if not. """
-        if abs(x_change) == 2:              # are we jumping
-            if "P" in self.find_space((coord_tuple[0] + 1, coord_tuple[1])):            # is the other player adjacent
-                if "|" not in self.find_space((coord_tuple[0] + 1, coord_tuple[1])):
-                    if self.find_space(player.get_position())[0] != "|":
-                        return True
-        else:
-            if self.find_space(player.get_position())[0] == " ":            # is a fence in the way?
-                if self.find_space(coord_tuple) == "   " or "|  ":          # is the target space clear?
-                    return True
-        return False
+    def __delattr__(self, name):
+        """Refuses every deletion, since a Position never changes."""
+        raise AttributeError("Position is immutable")
 
-    def check_move_right(self, coord_tuple, x_change):
-        """Takes a player object, new coordinate tuple, and checks to see if a right move is valid. Returns True if
-        valid and False if not. """
-        if abs(x_change) == 2:      # are we jumping
-            if "P" in self.find_space((coord_tuple[0] - 1, coord_tuple[1])):        # is the other player adjacent
-                if "|" not in self.find_space((coord_tuple[0] - 1, coord_tuple[1])):
-                    if self.find_space(coord_tuple)[0] != "|":
-                        return True
-        else:
-            if (self.find_space(coord_tuple) == "   " or
-                    self.find_space(coord_tuple) == "   |"):         # is a fence in the way?
-                return True
-        return False
+    def __eq__(self, other):
+        """Returns True if other is a Position of the same kind of game with the same pieces, fences, fence counts,
+        side to move and winner."""
+        if not isinstance(other, Position):
+            return NotImplemented
+        return (self._hashes[IDENTITY] == other._hashes[IDENTITY] and self._tables is other._tables and
+                self._squares == other._squares and self._v_fences == other._v_fences and
+                self._h_fences == other._h_fences and self._fences == other._fences and
+                self._turn == other._turn and self._winner == other._winner)
 
-    def check_move_up(self, player, coord_tuple, y_change):
-        """Takes a player object, new coordinate tuple, and checks to see if an up move is valid. Returns True if
-        valid and False if not. """
-        if abs(y_change) == 2:          # are we jumping
-            if "P" in self.find_space((coord_tuple[0], coord_tuple[1] + 1)):        # is the other player adjacent
-                if "=" not in self.find_space((coord_tuple[0], coord_tuple[1] + 1), True):
-                    if "=" not in self.find_space(player.get_position(), True):
-                        return True
+    def __hash__(self):
+        """Returns the Zobrist hash of the position."""
+        return self._hashes[IDENTITY]
+
+    def __repr__(self):
+        """Returns the position as its get_state tuple."""
+        return "Position(%r)" % (self.get_state(),)
+
+    def get_tables(self):
+        """Get method for the BoardTables of this position's board size and player count."""
+        return self._tables
+
+    def get_state(self):
+        """Returns the position as a flat tuple laid out like QuoridorGame.get_state, which set_state takes."""
+        return (self._squares + (self._v_fences, self._h_fences) + self._fences +
+                (self._turn + 1, self._winner))
+
+    def get_turn(self):
+        """Returns the number of the player to move, 1 up to the number of players."""
+        return self._turn + 1
+
+    def get_winner(self):
+        """Returns the number of the player who has won, or 0 if nobody has."""
+        return self._winner
+
+    def get_position(self, player_num):
+        """Takes a player number and returns the coordinates tuple of that player's pawn."""
+        return self._tables.coordinates[self._squares[player_num - 1]]
+
+    def get_fences_remaining(self, player_num):
+        """Takes a player number and returns how many fences that player has left."""
+        return self._fences[player_num - 1]
+
+    def get_v_fences(self):
+        """Get method for the vertical fence mask."""
+        return self._v_fences
+
+    def get_h_fences(self):
+        """Get method for the horizontal fence mask."""
+        return self._h_fences
+
+    def get_hash(self):
+        """Get method for the 64 bit Zobrist hash, the same as QuoridorGame.get_hash in this position."""
+        return self._hashes[IDENTITY]
+
+    def get_canonical_hash(self):
+        """Returns (key, transform) as QuoridorGame.get_canonical_hash does for this position."""
+        hashes = self._hashes
+        key = min(hashes)
+        return key, hashes.index(key)
+
+    def distance(self, player_num):
+        """Takes a player number and returns the number of single space moves that pawn needs to reach its goal
+        side, ignoring pawns, or -1 if it is cut off."""
+        tables = self._tables
+        index = player_num - 1
+        distances = tables.distance_map(tables.goals[tables.names[index]], self._v_fences, self._h_fences,
+                                        self._blocked)
+        return distances[self._squares[index]]
+
+    def legal_pawn_moves(self):
+        """Returns a list of every coordinates tuple the player to move may move their pawn to, or an empty list if
+        the game has been won."""
+        if self._winner:
+            return []
+        tables = self._tables
+        occupied = 0
+        for square in self._squares:
+            occupied |= 1 << square
+        coordinates = tables.coordinates
+        return [coordinates[target] for target in tables.pawn_targets(self._squares[self._turn], occupied,
+                                                                       self._blocked)]
+
+    def legal_fences(self):
+        """Returns a list of every (direction, coordinates tuple) fence the player to move may place, or an empty
+        list if the game has been won or they have no fences left. Fair play is settled for every slot at once, as
+        by Board.legal_fences."""
+        if self._winner or self._fences[self._turn] <= 0:
+            return []
+        tables = self._tables
+        taken_v = self._v_fences
+        taken_h = self._h_fences
+        for index, square in enumerate(self._squares):
+            cut_v, cut_h = tables.cut_fences(square, tables.goals[tables.names[index]], self._v_fences,
+                                             self._h_fences)
+            taken_v |= cut_v
+            taken_h |= cut_h
+        return tables.open_fences(taken_v, taken_h)
+
+    def legal_moves(self):
+        """Returns a list of every legal move for the player to move as (kind, coordinates tuple) pairs, pawn moves
+        first."""
+        return [("p", coord_tuple) for coord_tuple in self.legal_pawn_moves()] + self.legal_fences()
+
+    def is_legal(self, move):
+        """Takes a (kind, coordinates tuple) move and returns True if the player to move may play it, with the same
+        rules as QuoridorGame.move_pawn and place_fence. A fence is checked for fair play by searching the masks it
+        would make, so nothing is placed and removed again. """
+        if self._winner:
+            return False
+        kind, coord_tuple = move
+        tables = self._tables
+        if kind == "p":
+            return coord_tuple in self.legal_pawn_moves()
+        if self._fences[self._turn] <= 0:
+            return False
+        index = tables.fence_slot(kind, coord_tuple)
+        if index < 0:
+            return False
+        if kind == "v":
+            if self._v_fences >> index & 1:
+                return False
+            v_fences = self._v_fences | 1 << index
+            h_fences = self._h_fences
+            blocked = self._blocked | tables.v_blocks[index]
         else:
-            if self.find_space(coord_tuple) == "   " or "|  ":                  # is the target space clear?
-                if "=" not in self.find_space(player.get_position(), True):     # is there no fence in the way?
-                    return True
-        return False
+            if self._h_fences >> index & 1:
+                return False
+            v_fences = self._v_fences
+            h_fences = self._h_fences | 1 << index
+            blocked = self._blocked | tables.h_blocks[index]
+        for player_index, square in enumerate(self._squares):                   # fair play validation
+            if tables.distance_map(tables.goals[tables.names[player_index]], v_fences, h_fences,
+                                   blocked)[square] < 0:
+                return False
+        return True
 
-    def check_move_down(self, player, coord_tuple, y_change):
-        """Takes a player object, new coordinate tuple, and checks to see if a down move is valid. Returns True if
-        valid and False if not. """
-        if abs(y_change) == 2:          # are we jumping
-            if "P" in self.find_space((coord_tuple[0], coord_tuple[1] - 1)):        # is other player adjacent
-                if "=" not in self.find_space((player.get_position()[0], player.get_position()[1] + 1), True):
-                    if "=" not in self.find_space(coord_tuple, True):
-                        return True
+    def apply(self, move, validate=True):
+        """Takes a (kind, coordinates tuple) move and returns the Position after the player to move plays it,
+        leaving this one as it is. Raises ValueError if the move is not legal. Pass validate=False to skip the
+        check for moves already known to be legal, such as those from legal_moves, as QuoridorGame.push does. """
+        if validate and not self.is_legal(move):
+            raise ValueError("%r is not a legal move in this position" % (move,))
+        kind, coord_tuple = move
+        tables = self._tables
+        turn = self._turn
+        squares = self._squares
+        v_fences = self._v_fences
+        h_fences = self._h_fences
+        blocked = self._blocked
+        fences = self._fences
+        winner = self._winner
+        changes = tables.turn_changes[turn]
+        hashes = []
+        if kind == "p":
+            start = squares[turn]
+            end = coord_tuple[1] * tables.size + coord_tuple[0]
+            squares = squares[:turn] + (end,) + squares[turn + 1:]
+            for transform, zobrist in enumerate(tables.zobrist_symmetry):
+                keys = zobrist[0][turn]
+                hashes.append(self._hashes[transform] ^ keys[start] ^ keys[end] ^ changes[transform])
+            if tables.goal_masks[turn] >> end & 1:                                  # pawn reached its goal side
+                winner = turn + 1
         else:
-            if self.find_space(coord_tuple) == "   " or "|  " or "   |":           # is the target space clear?
-                if "=" not in self.find_space(coord_tuple, True):
-                    return True
-        return False
+            index = tables.fence_slot(kind, coord_tuple)
+            if kind == "v":
+                v_fences |= 1 << index
+                blocked |= tables.v_blocks[index]
+            else:
+                h_fences |= 1 << index
+                blocked |= tables.h_blocks[index]
+            left = fences[turn]
+            fences = fences[:turn] + (left - 1,) + fences[turn + 1:]
+            for transform, zobrist in enumerate(tables.zobrist_symmetry):
+                keys = zobrist[2][turn]
+                hashes.append(self._hashes[transform] ^ zobrist[1][kind][index] ^ keys[left] ^ keys[left - 1] ^
+                              changes[transform])
+        return Position(tables, squares, v_fences, h_fences, blocked, fences, (turn + 1) % tables.players, winner,
+                        tuple(hashes))
 
-    def check_diagonal(self, player, coord_tuple, x_change, y_change):
-        """Helper method that takes a player object, new coordinates tuple, the change in x axis value,
-        and the change in y axis value and routes the data to the proper sub sub method for diagonal move validation.
-        """
-        if y_change == -1:
-            if x_change == 1:
-                return self.check_up_right_diagonal(player, coord_tuple)
-            if x_change == -1:
-                return self.check_up_left_diagonal(player, coord_tuple)
-        if y_change == 1:
-            if x_change == 1:
-                return self.check_down_right_diagonal(player, coord_tuple)
-            if x_change == -1:
-                return self.check_down_left_diagonal(player, coord_tuple)
-
-    def check_up_right_diagonal(self, player, coord_tuple):
-        """Takes a player object, new coordinates tuple, and checks to see if an up right diagonal move is valid.
-        Only valid if player is blocked directly by other player's pawn. """
-        if "P" in self.find_space((player.get_position()[0], player.get_position()[1] - 1)):
-            if "+==" in self.find_space((player.get_position()[0], player.get_position()[1] - 1), True):
-                if self.find_space(player.get_position(), True) != "+==":
-                    if "|" not in self.find_space(coord_tuple):
-                        if "P" not in self.find_space(coord_tuple):
-                            return True
-        if "P" in self.find_space((player.get_position()[0] + 1, player.get_position()[1])):
-            if "|" not in self.find_space(coord_tuple):
-                if "=" not in self.find_space((player.get_position()[0] + 1, player.get_position()[1]), True):
-                    if "P" not in self.find_space(coord_tuple):
-                        return True
-        return False
+    def to_game(self):
+        """Returns a new QuoridorGame set up in this position."""
+        game = QuoridorGame(self._tables.size, self._tables.players)
+        game.set_state(self.get_state())
+        return game
 
-    def check_up_left_diagonal(self, player, coord_tuple):
-        """Takes a player object, new coordinates tuple, and checks to see if an up left diagonal move is valid. Only
-        valid if player is blocked directly by other player's pawn. """
-        if "P" in self.find_space((player.get_position()[0], player.get_position()[1] - 1)):
-            if "=" not in self.find_space(player.get_position(), True):
-                if self.find_space((player.get_position()[0], player.get_position()[1] - 1))[0] != "|":
-                    if "P" not in self.find_space(coord_tuple):
-                        return True
-        if "P" in self.find_space((player.get_position()[0] - 1, player.get_position()[1])):
-            if "|" not in self.find_space(player.get_position()):
-                if "=" not in self.find_space((player.get_position()[0] - 1, player.get_position()[1]), True):
-                    if "P" not in self.find_space(coord_tuple):
-                        return True
-        return False
 
-    def check_down_right_diagonal(self, player, coord_tuple):
-        """Takes a player object, new coordinates tuple, and checks to see if a down right diagonal move is valid.
-        Only valid if player is blocked directly by other player's pawn. """
-        if "P" in self.find_space((player.get_position()[0], player.get_position()[1] + 1)):
-            if "+==" not in self.find_space((player.get_position()[0], player.get_position()[1] + 1), True):
-                if self.find_space(coord_tuple, True) != "+==":
-                    if "|" not in self.find_space(coord_tuple):
-                        if "P" not in self.find_space(coord_tuple):
-                            return True
-        if "P" in self.find_space((player.get_position()[0] + 1, player.get_position()[1])):
-            if "|" not in self.find_space(coord_tuple):
-                if "=" not in self.find_space(coord_tuple, True):
-                    if "P" not in self.find_space(coord_tuple):
-                        return True
-        return False
+class Board:
+    """Creates, stores, and displays board data. The board holds all fence and pawn positions as integer bitboards:
+    one bit per square for pawn occupancy, and one mask each for vertical and horizontal fences. Pawn move and fence
+    validation are a handful of bit tests against the wall adjacency table built at import. The printable grid is
+    only generated on demand by get_board and display_board. """
 
-    def check_down_left_diagonal(self, player, coord_tuple):
-        """Takes a player object, new coordinates tuple, and checks to see if a down left diagonal move is valid.
-        Only valid if player is blocked directly by other player's pawn. """
-        if "P" in self.find_space((player.get_position()[0], player.get_position()[1] + 1)):
-            if "=" not in self.find_space((player.get_position()[0], player.get_position()[1] + 1), True):
-                if self.find_space((player.get_position()[0], player.get_position()[1] + 1))[0] != "|":
-                    if "P" not in self.find_space(coord_tuple):
-                        return True
-        if "P" in self.find_space((player.get_position()[0] - 1, player.get_position()[1])):
-            if "|" not in self.find_space(player.get_position()):
-                if "=" not in self.find_space(coord_tuple, True):
-                    if "P" not in self.find_space(coord_tuple):
-                        return True
-        return False
+    __slots__ = ("_tables", "_pawn_squares", "_occupied", "_v_fences", "_h_fences", "_blocked", "_distance_maps",
+                 "_paths", "_shortest_paths")
 
-    def validate_fence(self, direction, coord_tuple):
-        """Takes a fence direction, new coordinate tuple, and validates fence placement by using find_space method to
-        ascertain a particular space on the board and checking it for other fences. Returns True if valid,
-        false if not. """
+    def __init__(self, tables=None):
+        """Initializes game board with every pawn on its starting square and no fences placed, for the board size
+        and player count of the given BoardTables (the standard game's if None). The pawn squares are kept in
+        player order so the board can be drawn, while the occupancy mask is what validation reads. The path caches
+        are only created once a game first needs them."""
+        if tables is None:
+            tables = _STANDARD
+        self._tables = tables
+        self._pawn_squares = list(tables.starts)
+        self._occupied = tables.start_occupied
+        self._v_fences = 0
+        self._h_fences = 0
+        self._blocked = tables.edge_blocked
+        self._distance_maps = None
+        self._paths = None
+        self._shortest_paths = None
+
+    def get_tables(self):
+        """Get method for the BoardTables of this board's size and player count."""
+        return self._tables
+
+    def get_occupied(self):
+        """Get method for the pawn occupancy bitboard."""
+        return self._occupied
+
+    def get_pawn_squares(self):
+        """Returns a tuple of the pawns' square indexes in player order."""
+        return tuple(self._pawn_squares)
+
+    def get_goal(self, player):
+        """Takes a Player object and returns its goal as distance_map takes it: a row number, or ~column for P3 and
+        P4."""
+        return self._tables.goals[player.get_player_name()]
+
+    def at_goal(self, player):
+        """Takes a Player object and returns True if its pawn stands on its goal side, with one test of its square
+        against the goal side's bitmask."""
+        index = self._tables.player_index[player.get_player_name()]
+        return self._tables.goal_masks[index] >> self._pawn_squares[index] & 1 == 1
+
+    def load(self, pawn_squares, v_fences, h_fences):
+        """Takes a sequence of square indexes in player order and the two fence masks and replaces the board's
+        contents with them. Cached distance maps are kept since they are keyed by the fence masks."""
+        self._pawn_squares = list(pawn_squares)
+        self._occupied = 0
+        for square in self._pawn_squares:
+            self._occupied |= 1 << square
+        self._v_fences = v_fences
+        self._h_fences = h_fences
+        self._blocked = self._tables.blocked_bits(v_fences, h_fences)
+        self._paths = None
+
+    def reset(self):
+        """Takes every pawn back to its starting square and removes every fence. Cached distance maps are kept since
+        they are keyed by the fence masks."""
+        tables = self._tables
+        self._pawn_squares = list(tables.starts)
+        self._occupied = tables.start_occupied
+        self._v_fences = 0
+        self._h_fences = 0
+        self._blocked = tables.edge_blocked
+        self._paths = None
+
+    def clear_caches(self):
+        """Drops the per-board distance map and path caches. They are rebuilt on demand (distance maps from the
+        shared module cache), so an idle game can give their memory back."""
+        self._distance_maps = None
+        self._paths = None
+        self._shortest_paths = None
+
+    def get_v_fences(self):
+        """Get method for the vertical fence mask."""
+        return self._v_fences
+
+    def get_h_fences(self):
+        """Get method for the horizontal fence mask."""
+        return self._h_fences
+
+    def get_blocked(self):
+        """Get method for the edge-blocked bitset: bit square * 4 + direction is set when a fence or the board edge
+        closes that side of the square. Only place_fence, remove_fence and load change it."""
+        return self._blocked
+
+    def get_board(self):
+        """Generates the printable board as a list of rows of strings. There are extra rows between the rows where
+        pawns stand to show horizontal fences. The whole board is surrounded by fences and each space in the fence
+        rows begins with a '+' to mark the top left corner of a square. """
+        size = self._tables.size
+        names = dict(zip(self._pawn_squares, self._tables.names))
+        board = []
+        for y_coord in range(size + 1):
+            row = []
+            for x_coord in range(size):
+                if y_coord in (0, size) or self._h_fences >> ((y_coord - 1) * size + x_coord) & 1:
+                    row.append("+==")
+                else:
+                    row.append("+  ")
+            row[-1] += "+"
+            board.append(row)
+            if y_coord == size:
+                break
+            row = []
+            for x_coord in range(size):
+                if x_coord == 0 or self._v_fences >> (y_coord * (size - 1) + x_coord - 1) & 1:
+                    space = "|"
+                else:
+                    space = " "
+                row.append(space + names.get(y_coord * size + x_coord, "  "))
+            row[-1] += "|"
+            board.append(row)
+        return board
+
+    def display_board(self):
+        """Displays game board in it's current state to the console."""
+        for row in self.get_board():
+            print("".join(row))
+
+    def is_blocked(self, square, direction):
+        """Takes a square index and a direction and returns True if a fence or the board edge stands between that
+        square and its neighbour in that direction, one bit test against the edge-blocked bitset."""
+        return self._blocked >> (square << 2 | direction) & 1 == 1
+
+    @timed("validate_pawn")
+    def validate_pawn(self, player, coord_tuple):
+        """Validates pawn movement by first checking if the new coordinates are off the board. A single space move
+        is valid if no fence is in the way and the target is empty. A two space move is a jump, valid if the other
+        pawn is adjacent, no fence is on either side of it and the target is empty. A diagonal move is valid if the
+        other pawn is adjacent, the straight jump over it is blocked by a fence or the board edge, and no fence
+        stands between the other pawn and the target. Each check is a bit test against the occupancy mask or the
+        edge-blocked bitset. """
         x_coord = coord_tuple[0]
         y_coord = coord_tuple[1]
-        if direction == "v":                                            # vertical validation
-            if 1 <= x_coord <= 8 and 0 <= y_coord <= 8:                 # are new coordinates within boundaries
-                return self.check_vertical_placement(coord_tuple)
-        if direction == "h":
-            if 0 <= x_coord <= 8 and 1 <= y_coord <= 8:                 # are new coordinates within boundaries
-                return self.check_horizontal_placement(coord_tuple)
-
-    def check_vertical_placement(self, coord_tuple):
-        """Takes the new coordinate tuple and checks if a vertical fence placement is valid. Returns True if valid,
-        false if not. """
-        if len(self.find_space(coord_tuple)) == 3:
-            if "|" not in self.find_space(coord_tuple):
-                return True
-        if len(self.find_space(coord_tuple)) == 4:          # right edge spaces
-            if self.find_space(coord_tuple)[0] == " ":
-                return True
+        size = self._tables.size
+        if not (0 <= x_coord < size and 0 <= y_coord < size):              # are new coordinates within boundaries
+            return False
+        position = player.get_position()
+        x_change = x_coord - position[0]
+        y_change = y_coord - position[1]
+        square = position[1] * size + position[0]
+        target = y_coord * size + x_coord
+        if self._occupied >> target & 1:                                    # is the target space taken?
+            return False
+        blocked = self._blocked
+        if abs(x_change) + abs(y_change) == 1:                              # attempting to move one space
+            return not blocked >> (square << 2 | _DIRECTION_OF[(x_change, y_change)]) & 1
+        if (abs(x_change) == 2 and y_change == 0) or (x_change == 0 and abs(y_change) == 2):    # attempting a jump
+            direction = _DIRECTION_OF[(x_change // 2, y_change // 2)]
+            middle = self._tables.neighbours[direction][square]
+            return (self._occupied >> middle & 1 == 1 and not blocked >> (square << 2 | direction) & 1 and
+                    not blocked >> (middle << 2 | direction) & 1)
+        if abs(x_change) == 1 and abs(y_change) == 1:                      # attempting to move diagonally
+            return (self.check_diagonal(square, _DIRECTION_OF[(x_change, 0)], _DIRECTION_OF[(0, y_change)]) or
+                    self.check_diagonal(square, _DIRECTION_OF[(0, y_change)], _DIRECTION_OF[(x_change, 0)]))
         return False
 
-    def check_horizontal_placement(self, coord_tuple):
-        """Takes the new coordinate tuple and checks if a horizontal fence placement is valid. Returns True if valid,
-        false if not. """
-        if "=" not in self.find_space(coord_tuple, True):
+    def check_diagonal(self, square, toward, aside):
+        """Takes the moving pawn's square, the direction of the pawn it is facing and the direction it side steps
+        in. Returns True if the other pawn is adjacent and reachable, its far side is blocked by a fence, the board
+        edge or another pawn, and no fence stands between it and the target. """
+        blocked = self._blocked
+        if blocked >> (square << 2 | toward) & 1:                           # edge or fence before the other pawn
+            return False
+        middle = self._tables.neighbours[toward][square]
+        if not self._occupied >> middle & 1 or blocked >> (middle << 2 | aside) & 1:
+            return False
+        if blocked >> (middle << 2 | toward) & 1:                           # jump blocked by a fence or the edge
             return True
-        return False
+        return self._occupied >> self._tables.jumps[toward][square] & 1 == 1
+
+    def fence_index(self, direction, coord_tuple):
+        """Takes a fence direction and coordinates tuple and returns the bit index of that fence slot in its mask.
+        A vertical fence at (x, y) runs along the left side of that square and a horizontal fence along its top."""
+        size = self._tables.size
+        if direction == "v":
+            return coord_tuple[1] * (size - 1) + coord_tuple[0] - 1
+        return (coord_tuple[1] - 1) * size + coord_tuple[0]
+
+    @timed("validate_fence")
+    def validate_fence(self, direction, coord_tuple):
+        """Takes a fence direction and new coordinate tuple and validates fence placement by checking the fence slot
+        is on the board and not already taken. Returns True if valid, False if not. """
+        index = self._tables.fence_slot(direction, coord_tuple)
+        if index < 0:                                                   # are new coordinates within boundaries
+            return False
+        fences = self._v_fences if direction == "v" else self._h_fences
+        return not fences >> index & 1
 
     def move_pawn(self, player, coord_tuple):
-        """Takes a Player object and new coordinates tuple and changes pawn's location on the board while clearing
-        the pawn's previous space. Uses find_space() to locate the real position on the board and set_space() to
-        change the space we're moving to. Validation occurs elsewhere so there's no need to crunch those numbers
-        here. """
-        if "|" in self.find_space(player.get_position()):
-            self.move_with_fence_in_space(player, coord_tuple)         # if player is vacating a space with a fence
-        else:
-            self.set_space(player.get_position(), "   ")
-            if self.find_space(coord_tuple) == "   ":
-                self.set_space(coord_tuple, " " + player.get_player_name())
-            if self.find_space(coord_tuple) == "   |":
-                self.set_space(coord_tuple, " " + player.get_player_name() + "|")
-            if self.find_space(coord_tuple)[0] == "|":
-                self.set_space(coord_tuple, "|" + player.get_player_name())
-        player.set_position(coord_tuple)
-
-    def move_with_fence_in_space(self, player, coord_tuple):
-        """Used in move_pawn() to clear previously occupied spaces and inhabit new spaces. Takes a player object and
-        new coordinates tuple. Takes player name data from player object for use in reprinting spaces."""
-        if len(self.find_space(player.get_position())) == 3:
-            self.set_space(player.get_position(), "|  ")                                # clear
-            if self.find_space(coord_tuple) == "   ":
-                self.set_space(coord_tuple, " " + player.get_player_name())             # reprint
-            elif self.find_space(coord_tuple)[-1] == "|":
-                self.set_space(coord_tuple, " " + player.get_player_name() + "|")       # reprint
-            else:
-                self.set_space(coord_tuple, "|" + player.get_player_name())             # reprint
-        else:
-            if len(self.find_space(player.get_position())) == 4:          # if player is in a right edge space
-                if self.find_space(player.get_position())[0] == " ":
-                    self.set_space(player.get_position(), "   |")                       # clear
-                if self.find_space(player.get_position())[0] == "|":
-                    self.set_space(player.get_position(), "|  |")
-            if self.find_space(coord_tuple) == "   ":
-                self.set_space(coord_tuple, " " + player.get_player_name())             # reprint
-            else:
-                if self.find_space(coord_tuple) == "|  ":
-                    self.set_space(coord_tuple, "|" + player.get_player_name())         # reprint
-                else:
-                    self.set_space(coord_tuple, " " + player.get_player_name() + "|")   # reprint
+        """Takes a Player object and new coordinates tuple and moves the pawn's bit in the occupancy mask.
+        Validation occurs elsewhere so there's no need to crunch those numbers here. """
+        tables = self._tables
+        position = player.get_position()
+        target = coord_tuple[1] * tables.size + coord_tuple[0]
+        self._occupied ^= (1 << (position[1] * tables.size + position[0])) | (1 << target)
+        self._pawn_squares[tables.player_index[player.get_player_name()]] = target
+        player.set_position(tables.coordinates[target])
 
     def place_fence(self, direction, coord_tuple):
-        """Takes direction and a new coordinates tuple and places a fence on the game board using the set_space
-        method. """
+        """Takes direction and a new coordinates tuple and sets that fence's bit in its mask, and the two sides it
+        closes in the edge-blocked bitset."""
+        index = self.fence_index(direction, coord_tuple)
         if direction == "v":
-            self.set_space(coord_tuple, "|" + self.find_space(coord_tuple)[1:])
+            self._v_fences |= 1 << index
+            self._blocked |= self._tables.v_blocks[index]
         if direction == "h":
-            if len(self.find_space(coord_tuple)) == 3:
-                self.set_space(coord_tuple, "+==")
-            else:                                           # if it's a right edge
-                self.set_space(coord_tuple, "+==+")
+            self._h_fences |= 1 << index
+            self._blocked |= self._tables.h_blocks[index]
 
     def remove_fence(self, direction, coord_tuple):
         """Takes a fence direction and new coordinates tuple and removes a fence if that fence violated the fair play
-        rule. """
+        rule or a pushed move is being undone. No two fence slots close the same side, so this reopens exactly the
+        sides the fence closed. """
+        index = self.fence_index(direction, coord_tuple)
         if direction == "v":
-            self.set_space(coord_tuple, " " + self.find_space(coord_tuple)[1:])
+            self._v_fences &= ~(1 << index)
+            self._blocked &= ~self._tables.v_blocks[index]
         if direction == "h":
-            if self.find_space(coord_tuple, True) == "+==":
-                self.set_space(coord_tuple, "+  ")
-            else:
-                self.set_space(coord_tuple, "+  +")
-
-    def fair_play_iterate(self, player, memo=None):
-        """Takes the fair_player object and moves it around the board to see if a path to the goal line is open.
-        Returns True if so and False if not. Keeps iterating through memo list and checking those coordinates against
-        the fair_player position to see if moves are valid and if so it adds those coordinates to memo. If it has
-        iterated through all coordinates without adding any more it will return False because there are no more legal
-        moves to achieve a win. """
-        if memo is None:
-            memo = [player.get_position()]
-        for coords in memo:
-            player.set_position(coords)
-            x_coord = coords[0]
-            y_coord = coords[1]
-            if player.get_player_name() == "P1":
-                if coords[1] == 8:
-                    return True
-            if player.get_player_name() == "P2":
-                if coords[1] == 0:
-                    return True
-            self.append_memo(player, x_coord, y_coord, memo)
-        return False
+            self._h_fences &= ~(1 << index)
+            self._blocked &= ~self._tables.h_blocks[index]
+
+    def pawn_moves(self, player):
+        """Takes a Player object and returns a list of every coordinates tuple validate_pawn would accept for it,
+        found in one pass over the four directions by BoardTables.pawn_targets instead of testing each candidate
+        space. """
+        tables = self._tables
+        position = player.get_position()
+        coordinates = tables.coordinates
+        return [coordinates[target] for target in
+                tables.pawn_targets(position[1] * tables.size + position[0], self._occupied, self._blocked)]
+
+    def cut_fences(self, player):
+        """Takes a Player object and returns the (vertical, horizontal) masks of open fence slots that would cut
+        that pawn off from its goal side, as found by BoardTables.cut_fences."""
+        tables = self._tables
+        position = player.get_position()
+        return tables.cut_fences(position[1] * tables.size + position[0], tables.goals[player.get_player_name()],
+                                 self._v_fences, self._h_fences)
+
+    def legal_fences(self, players):
+        """Takes the Player objects that must keep a path to their goal and returns a list of every (direction,
+        coordinates tuple) pair that validate_fence accepts and that passes fair play, without placing any fence."""
+        cut_v = 0
+        cut_h = 0
+        for player in players:
+            player_v, player_h = self.cut_fences(player)
+            cut_v |= player_v
+            cut_h |= player_h
+        return self._tables.open_fences(self._v_fences | cut_v, self._h_fences | cut_h)
+
+    def distance_map(self, goal):
+        """Takes a goal, a row number (or ~column for the goal columns of P3 and P4, see get_goal), and returns a
+        tuple holding, for every square, the number of single space moves needed to reach it with the current
+        fences, or -1 if it cannot be reached. Pawns are ignored since they never block a path for good. The map is
+        kept on the board until the fences change, and comes from BoardTables.distance_map, which builds it by a
+        breadth first search out from the goal and keeps it in the cache shared by boards of this size. """
+        if self._distance_maps is None:
+            self._distance_maps = {}
+        cached = self._distance_maps.get(goal)
+        if cached is not None and cached[0] == self._v_fences and cached[1] == self._h_fences:
+            return cached[2]
+        distances = self._tables.distance_map(goal, self._v_fences, self._h_fences, self._blocked)
+        self._distance_maps[goal] = (self._v_fences, self._h_fences, distances)
+        return distances
 
-    def append_memo(self, player, x_coord, y_coord, memo):
-        """Takes a player object, x and y coordinates, the memo list, and calls methods for testing spaces that are
-        one space orthogonally, two spaces orthogonally, or diagonal. """
-        self.append_single_space_move(player, x_coord, y_coord, memo)
-        self.append_diagonal_move(player, x_coord, y_coord, memo)
-        self.append_jump_move(player, x_coord, y_coord, memo)
-
-    def append_single_space_move(self, player, x_coord, y_coord, memo):
-        """Checks the validity of moving to each neighboring space and adds it to memo if valid."""
-        if (x_coord - 1, y_coord) not in memo:
-            if self.validate_pawn(player, (x_coord - 1, y_coord)) is True:
-                memo.append((x_coord - 1, y_coord))
-        if (x_coord, y_coord - 1) not in memo:
-            if self.validate_pawn(player, (x_coord, y_coord - 1)) is True:
-                memo.append((x_coord, y_coord - 1))
-        if (x_coord + 1, y_coord) not in memo:
-            if self.validate_pawn(player, (x_coord + 1, y_coord)) is True:
-                memo.append((x_coord + 1, y_coord))
-        if (x_coord, y_coord + 1) not in memo:
-            if self.validate_pawn(player, (x_coord, y_coord + 1)) is True:
-                memo.append((x_coord, y_coord + 1))
-
-    def append_diagonal_move(self, player, x_coord, y_coord, memo):
-        """Checks the validity of moving diagonally and adds to memo if valid."""
-        if (x_coord - 1, y_coord - 1) not in memo:
-            if self.validate_pawn(player, (x_coord - 1, y_coord - 1)) is True:
-                memo.append((x_coord - 1, y_coord - 1))
-        if (x_coord - 1, y_coord + 1) not in memo:
-            if self.validate_pawn(player, (x_coord - 1, y_coord + 1)) is True:
-                memo.append((x_coord - 1, y_coord + 1))
-        if (x_coord + 1, y_coord + 1) not in memo:
-            if self.validate_pawn(player, (x_coord + 1, y_coord + 1)) is True:
-                memo.append((x_coord + 1, y_coord + 1))
-        if (x_coord + 1, y_coord - 1) not in memo:
-            if self.validate_pawn(player, (x_coord + 1, y_coord - 1)) is True:
-                memo.append((x_coord + 1, y_coord - 1))
-
-    def append_jump_move(self, player, x_coord, y_coord, memo):
-        """Checks the validity of potential two space moves (jumps) and adds those to memo if valid."""
-        if (x_coord - 2, y_coord) not in memo:
-            if self.validate_pawn(player, (x_coord - 2, y_coord)) is True:
-                memo.append((x_coord - 2, y_coord))
-        if (x_coord, y_coord - 2) not in memo:
-            if self.validate_pawn(player, (x_coord, y_coord - 2)) is True:
-                memo.append((x_coord, y_coord - 2))
-        if (x_coord + 2, y_coord) not in memo:
-            if self.validate_pawn(player, (x_coord + 2, y_coord)) is True:
-                memo.append((x_coord + 2, y_coord))
-        if (x_coord, y_coord + 2) not in memo:
-            if self.validate_pawn(player, (x_coord, y_coord + 2)) is True:
-                memo.append((x_coord, y_coord + 2))
-
-    def fair_play(self, player, fair_player):
-        """Fair play helper method that copies the player object to be tested into the fair_player object for
-        movement around the board. """
-        fair_player.set_player_name(player.get_player_name())
-        fair_player.set_position(player.get_position())
-        return self.fair_play_iterate(fair_player)
+    def distance_field(self, player):
+        """Takes a Player object and returns its distance map as a size x size grid, a tuple of rows indexed [y][x],
+        holding the number of single space moves from each square to that player's goal side (-1 if cut off)."""
+        size = self._tables.size
+        distances = self.distance_map(self.get_goal(player))
+        return tuple(distances[row * size:(row + 1) * size] for row in range(size))
+
+    def shortest_path(self, player):
+        """Takes a Player object and returns a shortest path from its pawn to its goal side as a list of coordinates
+        tuples, not counting the square it stands on, so the first entry is its next step and the length is its
+        distance. Returns None if the pawn is cut off. The path ignores pawns and jumps, like distance_map. It is
+        cached per player until the pawn moves or a fence is placed. """
+        tables = self._tables
+        position = player.get_position()
+        square = position[1] * tables.size + position[0]
+        name = player.get_player_name()
+        key = (square, self._v_fences, self._h_fences)
+        if self._shortest_paths is None:
+            self._shortest_paths = {}
+        cached = self._shortest_paths.get(name)
+        if cached is not None and cached[0] == key:
+            return list(cached[1])
+        distances = self.distance_map(tables.goals[name])
+        if distances[square] < 0:
+            path = None
+        else:
+            squares = []
+            self.trace_path(distances, square, self._v_fences, self._h_fences, squares)
+            path = tuple(tables.coordinates[step] for step in squares)
+        self._shortest_paths[name] = (key, path)
+        return None if path is None else list(path)
+
+    def trace_path(self, distances, square, v_fences, h_fences, squares=None):
+        """Takes a distance map, a starting square and the fence masks the map was built with, and walks downhill
+        to the goal. Returns the fence slots crossed by that shortest path as a (vertical, horizontal) mask pair,
+        since a new fence can only cut the path by landing in one of them. If a squares list is given, each square
+        stepped onto is appended to it. """
+        walls = self._tables.walls
+        step = self._tables.step
+        path_v = 0
+        path_h = 0
+        if _STATS:
+            QuoridorStats.count("trace_path_squares", max(distances[square], 0))
+        while distances[square] > 0:
+            for direction in range(4):
+                wall = walls[direction][square]
+                if wall is not None and not (v_fences & wall[0] or h_fences & wall[1]):
+                    neighbour = square + step[direction]
+                    if distances[neighbour] == distances[square] - 1:
+                        path_v |= wall[0]
+                        path_h |= wall[1]
+                        square = neighbour
+                        if squares is not None:
+                            squares.append(square)
+                        break
+        return path_v, path_h
+
+    @timed("fair_play")
+    def fair_play(self, player):
+        """Takes a Player object and returns True if that pawn still has an open path to its goal side, False if
+        not. The last shortest path found for each player is kept, so a fence that does not land on it is accepted
+        with one mask test. Otherwise a path is traced from the cached distance map, and the map is only rebuilt if
+        the new fences cut that path too. """
+        position = player.get_position()
+        square = position[1] * self._tables.size + position[0]
+        name = player.get_player_name()
+        if self._paths is None:
+            self._paths = {}
+        path = self._paths.get(name)
+        if path is not None and path[0] == square:
+            if not (self._v_fences & path[1] or self._h_fences & path[2]):     # fence is off the shortest path
+                if _STATS:
+                    QuoridorStats.count("fair_play_path_hits")
+                return True
+        goal = self._tables.goals[name]
+        cached = self._distance_maps.get(goal) if self._distance_maps is not None else None
+        if cached is not None and cached[2][square] >= 0:
+            path_v, path_h = self.trace_path(cached[2], square, cached[0], cached[1])
+            if not (self._v_fences & path_v or self._h_fences & path_h):       # old path is still open
+                if _STATS:
+                    QuoridorStats.count("fair_play_retraces")
+                self._paths[name] = (square, path_v, path_h)
+                return True
+        if _STATS:
+            QuoridorStats.count("fair_play_searches")
+        distances = self.distance_map(goal)
+        if distances[square] < 0:
+            if _STATS:
+                QuoridorStats.count("fair_play_refusals")
+            self._paths.pop(name, None)
+            return False
+        path_v, path_h = self.trace_path(distances, square, self._v_fences, self._h_fences)
+        self._paths[name] = (square, path_v, path_h)
+        return True
 
 
 class GameState:
     """Keeps track of the current state of the game, who's turn it is and if a player has won. The
-    determine_game_state method uses the Board class object to obtain board data, and analyzes it for winning
-    conditions. """
+    determine_game_state method uses the Board class object to check the player who just moved against their goal
+    side. Play passes from P1 to P2, and with four players on to P3 and P4. """
+
+    __slots__ = ("_game_state", "_turn", "_next_turn", "_previous_turn")
 
-    def __init__(self):
-        """Initializes game state and turn private data members."""
+    def __init__(self, players=2):
+        """Initializes game state and turn private data members for 2 or 4 players."""
         self._game_state = None
         self._turn = "P1"
+        self._next_turn = _NEXT_TURN[players]
+        self._previous_turn = _PREVIOUS_TURN[players]
 
     def get_turn(self):
         """Get method for player turn."""
@@ -616,35 +1586,44 @@ class GameState:
         """Get method for game_state."""
         return self._game_state
 
-    def determine_game_state(self, board, player):
-        """Takes the game board and determines if there's a winner, changing the game state data member."""
-        for space in board.get_board()[1]:
-            if "P2" in space:
-                self._game_state = "P2"
-                player.set_winning()
+    def set_turn(self, turn):
+        """Set method for player turn."""
+        self._turn = turn
 
-        for space in board.get_board()[17]:
-            if "P1" in space:
-                self._game_state = "P1"
-                player.set_winning()
+    def set_game_state(self, game_state):
+        """Set method for game_state, the name of the winning player or None."""
+        self._game_state = game_state
+
+    @timed("determine_game_state")
+    def determine_game_state(self, board, player):
+        """Takes the game board and the player who just moved and determines if they have won, changing the game
+        state data member. Only that pawn has moved, so only it needs checking, with one comparison against its
+        goal side."""
+        if board.at_goal(player):
+            self._game_state = player.get_player_name()
+            player.set_winning()
 
     def change_turn(self):
         """Changes whose turn it is."""
-        if self._turn == "P1":
-            self._turn = "P2"
-        else:
-            self._turn = "P1"
+        self._turn = self._next_turn[self._turn]
+
+    def undo_turn(self):
+        """Gives the turn back to the player before, undoing change_turn."""
+        self._turn = self._previous_turn[self._turn]
 
 
 class Player:
     """Creates a player object that contains private data members for position, name, fences remaining, and winning.
     Contains methods for getting and setting data members and one for decrementing a player's number of fences
     remaining. """
-    def __init__(self, position, player_name):
-        """Initializes player position, name ("P1" or "P2), number of fences remaining, and if they've won. """
+
+    __slots__ = ("_position", "_player_name", "_fences_remaining", "_winning")
+
+    def __init__(self, position, player_name, fences_remaining=FENCES_PER_PLAYER):
+        """Initializes player position, name ("P1" to "P4"), number of fences remaining, and if they've won. """
         self._position = position
         self._player_name = player_name
-        self._fences_remaining = 10
+        self._fences_remaining = fences_remaining
         self._winning = False
 
     def get_position(self):
@@ -652,8 +1631,9 @@ class Player:
         return self._position
 
     def set_position(self, new_position):
-        """Takes new position coordinates and sets the Player object's current position to those coordinates. """
-        self._position = new_position
+        """Takes new position coordinates and sets the Player object's current position to those coordinates. The
+        shared tuple for that point is stored rather than the one passed in."""
+        self._position = _POINTS[new_position[0], new_position[1]]
 
     def get_player_name(self):
         """Get method for player name."""
@@ -667,16 +1647,24 @@ class Player:
         """Get method for number of fences remaining."""
         return self._fences_remaining
 
+    def set_fences_remaining(self, fences_remaining):
+        """Set method for number of fences remaining."""
+        self._fences_remaining = fences_remaining
+
     def dec_fences_remaining(self):
         """Reduces number of fences remaining by 1."""
         self._fences_remaining -= 1
 
+    def inc_fences_remaining(self):
+        """Gives a fence back by increasing number of fences remaining by 1."""
+        self._fences_remaining += 1
+
     def get_winning(self):
         """Get method for whether a player has won."""
         return self._winning
 
-    def set_winning(self):
-        """Changes a player's _winning variable to True."""
-        self._winning = True
+    def set_winning(self, winning=True):
+        """Changes a player's _winning variable to True, or to False when a winning move is undone."""
+        self._winning = winning
 
 # changing things for git practice
\ No newline at end of file
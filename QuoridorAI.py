@@ -0,0 +1,332 @@
+# Description: Defines a QuoridorAI class that picks moves for a QuoridorGame. It runs an iterative deepening
+# negamax search with alpha-beta pruning over the game's push / pop move stack, keeps a size bounded transposition
+# table keyed by the game's canonical Zobrist hash (symmetric positions share an entry), and always answers within
+# a fixed time budget per move. Opening books and endgame tables from QuoridorBook are consulted first, when given.
+# With pondering on, the AI goes on searching the opponent's expected reply on a background thread while they think.
+
+import threading
+import time
+
+from Quoridor import BOARD_SIZE, GOAL_ROWS, transform_move
+
+WIN_SCORE = 100000
+PATH_WEIGHT = 10            # score for each step of shortest path difference
+FENCE_WEIGHT = 2            # score for each fence more in hand than the opponent
+TIME_MARGIN = 0.1           # share of the time budget kept back for unwinding the search and returning the move
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget for the current move runs out."""
+    pass
+
+
+class QuoridorAI:
+    """Creates a computer player for Quoridor. The evaluation is the difference between the two players' shortest
+    paths to their goal rows, taken from Board.distance_map, plus a small bonus for fences in hand. Moves are
+    searched shortest path pawn moves first, then fences that lengthen the opponent's path. Only fences that land on
+    the opponent's current shortest path are searched, since no other fence can make it longer. """
+
+    def __init__(self, time_limit=0.2, max_depth=32, table_size=1 << 16, books=(), ponder=False, ponder_limit=30.0):
+        """Initializes the time budget per move in seconds, the deepest iteration to try, the transposition table
+        as a fixed list of table_size slots (rounded up to a power of two) so memory use is bounded, and the open
+        QuoridorBook files to look positions up in before searching. If ponder is True, play starts pondering after
+        each move, for at most ponder_limit seconds (see start_pondering)."""
+        self._time_limit = time_limit
+        self._books = tuple(books)
+        self._max_depth = max_depth
+        size = 1
+        while size < table_size:
+            size <<= 1
+        self._table = [None] * size
+        self._table_mask = size - 1
+        self._generation = 0
+        self._deadline = 0.0
+        self._nodes = 0
+        self._move_nodes = 0
+        self._depth_reached = 0
+        self._ponder = ponder
+        self._ponder_limit = ponder_limit
+        self._ponder_game = None
+        self._ponder_thread = None
+        self._ponder_hits = 0
+        self._ponder_misses = 0
+
+    def get_nodes(self):
+        """Get method for the number of positions searched for the last move."""
+        return self._move_nodes
+
+    def get_depth_reached(self):
+        """Get method for the deepest iteration completed for the last move."""
+        return self._depth_reached
+
+    def get_ponder_hits(self):
+        """Get method for the number of moves whose position had been pondered on, because the opponent played the
+        predicted reply."""
+        return self._ponder_hits
+
+    def get_ponder_misses(self):
+        """Get method for the number of moves whose pondering was cancelled because the opponent played something
+        else."""
+        return self._ponder_misses
+
+    def play(self, game):
+        """Takes a QuoridorGame, chooses a move for the side to move and plays it through move_pawn or place_fence.
+        Returns the move played, or None if there was nothing to play."""
+        move = self.choose_move(game)
+        if move is None:
+            return None
+        player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+        if move[0] == "p":
+            game.move_pawn(player_num, move[1])
+        else:
+            game.place_fence(player_num, move[0], move[1])
+        if self._ponder:
+            self.start_pondering(game)
+        return move
+
+    def choose_move(self, game):
+        """Takes a QuoridorGame and returns the best (kind, coordinates tuple) move found for the side to move
+        within the time budget, or None if the game is over. Each iteration searches one ply deeper, and the best
+        move of the last finished iteration is returned when time runs out. The game is left as it was found. Any
+        pondering is stopped first. If it was on this very position its transposition entries are kept as current,
+        so the search starts out warm; otherwise they are left for later searches to overwrite. """
+        pondered = self.stop_pondering()
+        if game.get_game_state().get_game_state() is not None:
+            return None
+        if pondered is not None and pondered.get_hash() == game.get_hash() and \
+                pondered.get_state() == game.get_state():
+            self._ponder_hits += 1
+        else:
+            if pondered is not None:
+                self._ponder_misses += 1
+            self._generation = (self._generation + 1) & 0xFF
+        self._deadline = time.perf_counter() + self._time_limit * (1 - TIME_MARGIN)
+        self._nodes = 0
+        book_move = self.probe_books(game)
+        if book_move is not None:
+            self._move_nodes = 0
+            self._depth_reached = 0
+            return book_move
+        best_move, self._depth_reached = self.deepen(game)
+        self._move_nodes = self._nodes
+        return best_move
+
+    def deepen(self, game):
+        """Searches the position one ply deeper at a time until the deadline or max_depth, and returns the best
+        move of the last finished iteration (None if there are no moves) and the depth it was found at."""
+        moves = self.order_moves(game, self.table_move(game))
+        if not moves:
+            return None, 0
+        best_move = moves[0]
+        depth_reached = 0
+        for depth in range(1, self._max_depth + 1):
+            try:
+                score, move = self.search_root(game, moves, depth)
+            except SearchTimeout:
+                break
+            best_move = move
+            depth_reached = depth
+            moves.remove(move)
+            moves.insert(0, move)                       # search the best move first in the next iteration
+            if abs(score) >= WIN_SCORE - 1000:           # a forced win or loss has been found
+                break
+        return best_move, depth_reached
+
+    def table_move(self, game):
+        """Returns the move the transposition table holds for the game's position, or None."""
+        key, transform = game.get_canonical_hash()
+        entry = self._table[key & self._table_mask]
+        if entry is not None and entry[0] == key:
+            return transform_move(entry[4], transform)
+        return None
+
+    def start_pondering(self, game):
+        """Takes the QuoridorGame the AI has just moved in and, while the opponent thinks, searches the position
+        after the reply it expects (the best reply its own search found, or failing that the first in move order)
+        on a background thread. The search runs on a private copy of the game, so the opponent may move in the
+        real one meanwhile, and it fills the same bounded transposition table, stopping after ponder_limit seconds
+        or max_depth plies at most. Returns the predicted reply, or None if there is nothing to ponder. """
+        self.stop_pondering()
+        if game.get_game_state().get_game_state() is not None:
+            return None
+        moves = self.order_moves(game, self.table_move(game))     # the table move comes first if it is legal
+        if not moves:
+            return None
+        prediction = moves[0]
+        ponder_game = game.snapshot().to_game()
+        ponder_game.push(prediction)
+        self._generation = (self._generation + 1) & 0xFF
+        self._deadline = time.perf_counter() + self._ponder_limit
+        self._ponder_game = ponder_game
+        if ponder_game.get_game_state().get_game_state() is None:
+            self._ponder_thread = threading.Thread(target=self.deepen, args=(ponder_game,), daemon=True)
+            self._ponder_thread.start()
+        return prediction
+
+    def stop_pondering(self):
+        """Cancels any pondering, waiting for the background search to unwind, and returns the game it was
+        pondering on (None if there was none). The search notices within a few positions since it is stopped by
+        moving its deadline to the past."""
+        ponder_game = self._ponder_game
+        if self._ponder_thread is not None:
+            self._deadline = 0.0
+            self._ponder_thread.join()
+            self._ponder_thread = None
+        self._ponder_game = None
+        return ponder_game
+
+    def probe_books(self, game):
+        """Returns the move the first book holding this position gives for it, or None. A book move is checked
+        against the legal moves first, since a key collision or a stale book must never produce an illegal move."""
+        for book in self._books:
+            entry = book.probe(game)
+            if entry is None:
+                continue
+            move = entry[0]
+            player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+            if move[0] == "p":
+                legal = move[1] in game.legal_pawn_moves(player_num)
+            else:
+                legal = move in game.legal_fences(player_num)
+            if legal:
+                return move
+        return None
+
+    def search_root(self, game, moves, depth):
+        """Searches every root move to the given depth and returns the best (score, move) pair."""
+        alpha = -WIN_SCORE - 1
+        best_score = -WIN_SCORE - 1
+        best_move = moves[0]
+        for move in moves:
+            game.push(move)
+            try:
+                score = -self.negamax(game, depth - 1, -WIN_SCORE - 1, -alpha, 1)
+            finally:
+                game.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+        key, transform = game.get_canonical_hash()
+        self.store(key, depth, best_score, EXACT, transform_move(best_move, transform))
+        return best_score, best_move
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        """Returns the score of the position for the side to move, searched depth plies deep within the (alpha,
+        beta) window. Raises SearchTimeout once the deadline has passed."""
+        self._nodes += 1
+        if self._nodes & 15 == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        if game.get_game_state().get_game_state() is not None:     # the player who just moved has won
+            return -WIN_SCORE + ply
+        if depth <= 0:
+            return self.evaluate(game)
+        key, transform = game.get_canonical_hash()
+        entry = self._table[key & self._table_mask]
+        table_move = None
+        if entry is not None and entry[0] == key:
+            table_move = transform_move(entry[4], transform)
+            if entry[1] >= depth:
+                if entry[3] == EXACT:
+                    return entry[2]
+                if entry[3] == LOWER and entry[2] >= beta:
+                    return entry[2]
+                if entry[3] == UPPER and entry[2] <= alpha:
+                    return entry[2]
+        if time.perf_counter() > self._deadline:                   # move ordering is the costliest part of a node
+            raise SearchTimeout()
+        original_alpha = alpha
+        best_score = -WIN_SCORE - 1
+        best_move = None
+        for move in self.order_moves(game, table_move):
+            game.push(move)
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        if best_move is None:
+            return self.evaluate(game)
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.store(key, depth, best_score, flag, transform_move(best_move, transform))
+        return best_score
+
+    def store(self, key, depth, score, flag, move):
+        """Stores a search result in the transposition table, the move given as it is played in the canonical form
+        of the position. A slot is replaced if it holds the same position, an entry from an earlier move's search,
+        or a shallower search than the new one."""
+        index = key & self._table_mask
+        entry = self._table[index]
+        if entry is None or entry[0] == key or entry[5] != self._generation or entry[1] <= depth:
+            self._table[index] = (key, depth, score, flag, move, self._generation)
+
+    def distances(self, game):
+        """Takes a QuoridorGame and returns the shortest path lengths to goal of the side to move and of the
+        opponent, followed by both Player objects in the same order."""
+        board = game.get_board()
+        if game.get_game_state().get_turn() == "P1":
+            player, opponent = game.get_p1(), game.get_p2()
+        else:
+            player, opponent = game.get_p2(), game.get_p1()
+        position = player.get_position()
+        player_distance = board.distance_map(GOAL_ROWS[player.get_player_name()])[
+            position[1] * BOARD_SIZE + position[0]]
+        position = opponent.get_position()
+        opponent_distance = board.distance_map(GOAL_ROWS[opponent.get_player_name()])[
+            position[1] * BOARD_SIZE + position[0]]
+        return player_distance, opponent_distance, player, opponent
+
+    def evaluate(self, game):
+        """Returns the static score of the position for the side to move: how much shorter its path to goal is
+        than the opponent's, plus a little for each extra fence in hand. Moving next is worth about half a step."""
+        player_distance, opponent_distance, player, opponent = self.distances(game)
+        return (PATH_WEIGHT * (opponent_distance - player_distance) + PATH_WEIGHT // 2 +
+                FENCE_WEIGHT * (player.get_fences_remaining() - opponent.get_fences_remaining()))
+
+    def order_moves(self, game, first_move):
+        """Takes a QuoridorGame and returns the moves to search for the side to move, best guesses first: the
+        transposition table move, pawn moves by the length of path left from the target square, then fences on the
+        opponent's shortest path by how much longer they make it. """
+        board = game.get_board()
+        player_distance, opponent_distance, player, opponent = self.distances(game)
+        player_num = 1 if player.get_player_name() == "P1" else 2
+        distances = board.distance_map(GOAL_ROWS[player.get_player_name()])
+        scored = []
+        for coord_tuple in game.legal_pawn_moves(player_num):
+            scored.append((PATH_WEIGHT * (distances[coord_tuple[1] * BOARD_SIZE + coord_tuple[0]] -
+                                          player_distance), ("p", coord_tuple)))
+        if player.get_fences_remaining() > 0:
+            position = opponent.get_position()
+            opponent_goal = GOAL_ROWS[opponent.get_player_name()]
+            opponent_distances = board.distance_map(opponent_goal)
+            path_v, path_h = board.trace_path(opponent_distances, position[1] * BOARD_SIZE + position[0],
+                                              board.get_v_fences(), board.get_h_fences())
+            for direction, coord_tuple in game.legal_fences(player_num):
+                index = board.fence_index(direction, coord_tuple)
+                if not (path_v if direction == "v" else path_h) >> index & 1:
+                    continue
+                game.push((direction, coord_tuple))
+                gain = (board.distance_map(opponent_goal)[position[1] * BOARD_SIZE + position[0]] -
+                        opponent_distance)
+                game.pop()
+                if gain > 0:
+                    scored.append((-PATH_WEIGHT * gain + FENCE_WEIGHT, (direction, coord_tuple)))
+        scored.sort(key=lambda pair: pair[0])
+        moves = [move for score, move in scored]
+        if first_move is not None and first_move in moves:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
@@ -0,0 +1,238 @@
+# Description: Defines BatchQuoridorEnv, a NumPy batch environment that holds many Quoridor games as arrays and
+# steps all of them at once, for reinforcement learning. The rules are the same as QuoridorGame's, including jumps
+# and diagonal side steps, one square long fences and fair play for both players. Needs NumPy.
+#
+# Actions are integers: 0-80 move the pawn to square y * 9 + x, 81-152 place the vertical fence with bit index
+# action - 81 and 153-224 place the horizontal fence with bit index action - 153 (see Board.fence_index).
+
+import numpy as np
+
+from Quoridor import BOARD_SIZE, FENCES_PER_PLAYER, QuoridorGame
+
+SQUARES = BOARD_SIZE * BOARD_SIZE
+V_SLOTS = (BOARD_SIZE - 1) * BOARD_SIZE
+H_SLOTS = BOARD_SIZE * (BOARD_SIZE - 1)
+V_OFFSET = SQUARES
+H_OFFSET = SQUARES + V_SLOTS
+ACTIONS = SQUARES + V_SLOTS + H_SLOTS
+START_SQUARES = (4, (BOARD_SIZE - 1) * BOARD_SIZE + 4)
+GOAL_ROWS = (BOARD_SIZE - 1, 0)                         # by player index, 0 for P1 and 1 for P2
+X_CHANGE = np.array([-1, 0, 1, 0])                      # left, up, right, down as in Quoridor.DIRECTIONS
+Y_CHANGE = np.array([0, -1, 0, 1])
+
+
+def blocked_sides(v_fences, h_fences):
+    """Takes vertical fence planes shaped (N, 9, 8) and horizontal fence planes shaped (N, 8, 9) and returns a
+    (N, 4, 9, 9) boolean array telling, for each square and each direction (left, up, right, down), if a fence or
+    the board edge stands on that side."""
+    count = v_fences.shape[0]
+    blocked = np.ones((count, 4, BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    blocked[:, 0, :, 1:] = v_fences
+    blocked[:, 2, :, :-1] = v_fences
+    blocked[:, 1, 1:, :] = h_fences
+    blocked[:, 3, :-1, :] = h_fences
+    return blocked
+
+
+def reaches_goal(blocked, squares, goal_rows):
+    """Takes the (N, 4, 9, 9) blocked sides of N boards, one square index per board and one goal row per board,
+    and returns a boolean array saying which of those squares still have a path to their goal row. Floods all N
+    boards at once outward from the goal rows, stopping when every square is reached or nothing changes."""
+    count = blocked.shape[0]
+    rows = np.arange(count)
+    open_sides = ~blocked
+    reach = np.zeros((count, BOARD_SIZE, BOARD_SIZE), dtype=bool)
+    reach[rows, goal_rows, :] = True
+    y_coords = squares // BOARD_SIZE
+    x_coords = squares % BOARD_SIZE
+    for _ in range(SQUARES):
+        if reach[rows, y_coords, x_coords].all():
+            break
+        grown = reach.copy()
+        grown[:, :, 1:] |= reach[:, :, :-1] & open_sides[:, 0, :, 1:]
+        grown[:, :, :-1] |= reach[:, :, 1:] & open_sides[:, 2, :, :-1]
+        grown[:, 1:, :] |= reach[:, :-1, :] & open_sides[:, 1, 1:, :]
+        grown[:, :-1, :] |= reach[:, 1:, :] & open_sides[:, 3, :-1, :]
+        if np.array_equal(grown, reach):
+            break
+        reach = grown
+    return reach[rows, y_coords, x_coords]
+
+
+class BatchQuoridorEnv:
+    """Holds B games of Quoridor as NumPy arrays: each player's pawn square, the vertical and horizontal fence
+    planes, fences remaining, the player to move (0 for P1, 1 for P2) and the winner (0 for none, 1 or 2). The
+    step method applies one action per game to every game at once. Illegal actions leave their game unchanged and
+    are reported back instead of raising. """
+
+    def __init__(self, batch_size):
+        """Initializes batch_size games in the opening position."""
+        self.batch_size = batch_size
+        self.pawns = np.zeros((batch_size, 2), dtype=np.int64)
+        self.v_fences = np.zeros((batch_size, BOARD_SIZE, BOARD_SIZE - 1), dtype=bool)
+        self.h_fences = np.zeros((batch_size, BOARD_SIZE - 1, BOARD_SIZE), dtype=bool)
+        self.fences_left = np.zeros((batch_size, 2), dtype=np.int64)
+        self.turn = np.zeros(batch_size, dtype=np.int64)
+        self.winner = np.zeros(batch_size, dtype=np.int64)
+        self._rows = np.arange(batch_size)
+        self.reset()
+
+    def reset(self, games=None):
+        """Puts the given games (an index array or boolean mask, all games if None) back to the opening
+        position."""
+        if games is None:
+            games = slice(None)
+        self.pawns[games] = START_SQUARES
+        self.v_fences[games] = False
+        self.h_fences[games] = False
+        self.fences_left[games] = FENCES_PER_PLAYER
+        self.turn[games] = 0
+        self.winner[games] = 0
+
+    def set_state(self, game, state):
+        """Takes a game index and a QuoridorGame.get_state() tuple and puts that game into the position."""
+        p1_square, p2_square, v_fences, h_fences, p1_fences, p2_fences, turn, winner = state
+        self.pawns[game] = (p1_square, p2_square)
+        self.v_fences[game] = np.array([v_fences >> index & 1 for index in range(V_SLOTS)],
+                                       dtype=bool).reshape(BOARD_SIZE, BOARD_SIZE - 1)
+        self.h_fences[game] = np.array([h_fences >> index & 1 for index in range(H_SLOTS)],
+                                       dtype=bool).reshape(BOARD_SIZE - 1, BOARD_SIZE)
+        self.fences_left[game] = (p1_fences, p2_fences)
+        self.turn[game] = turn - 1
+        self.winner[game] = winner
+
+    def get_state(self, game):
+        """Takes a game index and returns that game's position as a QuoridorGame.get_state() tuple."""
+        v_fences = 0
+        for index in np.flatnonzero(self.v_fences[game]):
+            v_fences |= 1 << int(index)
+        h_fences = 0
+        for index in np.flatnonzero(self.h_fences[game]):
+            h_fences |= 1 << int(index)
+        return (int(self.pawns[game, 0]), int(self.pawns[game, 1]), v_fences, h_fences,
+                int(self.fences_left[game, 0]), int(self.fences_left[game, 1]), int(self.turn[game]) + 1,
+                int(self.winner[game]))
+
+    def to_game(self, game):
+        """Takes a game index and returns a QuoridorGame in the same position."""
+        quoridor_game = QuoridorGame()
+        quoridor_game.set_state(self.get_state(game))
+        return quoridor_game
+
+    def pawn_mask(self, blocked=None):
+        """Returns a (B, 81) boolean array of the squares the side to move may move its pawn to in each game:
+        single steps, straight jumps over the other pawn, and diagonal side steps when the jump is blocked by a
+        fence or the board edge. Finished games have no legal moves."""
+        if blocked is None:
+            blocked = blocked_sides(self.v_fences, self.h_fences)
+        rows = self._rows
+        own = self.pawns[rows, self.turn]
+        other = self.pawns[rows, 1 - self.turn]
+        x_coords = own % BOARD_SIZE
+        y_coords = own // BOARD_SIZE
+        live = self.winner == 0
+        mask = np.zeros((self.batch_size, SQUARES), dtype=bool)
+        for direction in range(4):
+            is_open = live & ~blocked[rows, direction, y_coords, x_coords]
+            near_x = np.clip(x_coords + X_CHANGE[direction], 0, BOARD_SIZE - 1)
+            near_y = np.clip(y_coords + Y_CHANGE[direction], 0, BOARD_SIZE - 1)
+            near = near_y * BOARD_SIZE + near_x
+            facing = is_open & (near == other)
+            step = is_open & ~facing
+            mask[rows[step], near[step]] = True
+            behind_blocked = blocked[rows, direction, near_y, near_x]
+            jump = facing & ~behind_blocked
+            far = (np.clip(near_y + Y_CHANGE[direction], 0, BOARD_SIZE - 1) * BOARD_SIZE +
+                   np.clip(near_x + X_CHANGE[direction], 0, BOARD_SIZE - 1))
+            mask[rows[jump], far[jump]] = True
+            side_step = facing & behind_blocked
+            for aside in ((direction + 1) % 4, (direction + 3) % 4):
+                allowed = side_step & ~blocked[rows, aside, near_y, near_x]
+                side = (np.clip(near_y + Y_CHANGE[aside], 0, BOARD_SIZE - 1) * BOARD_SIZE +
+                        np.clip(near_x + X_CHANGE[aside], 0, BOARD_SIZE - 1))
+                mask[rows[allowed], side[allowed]] = True
+        return mask
+
+    def fence_slots_mask(self):
+        """Returns a (B, 144) boolean array of fence slots that are free in games where the side to move has a
+        fence left. This skips the fair play rule, which step checks for the fences actually played."""
+        can_place = (self.winner == 0) & (self.fences_left[self._rows, self.turn] > 0)
+        free = np.concatenate((~self.v_fences.reshape(self.batch_size, V_SLOTS),
+                               ~self.h_fences.reshape(self.batch_size, H_SLOTS)), axis=1)
+        return free & can_place[:, None]
+
+    def legal_mask(self, chunk_size=4096):
+        """Returns the exact (B, 225) boolean mask of legal actions, fair play included. Every free fence slot is
+        tried on its own board and all of them are flooded together, chunk_size boards at a time, so this costs
+        far more than step. """
+        mask = np.zeros((self.batch_size, ACTIONS), dtype=bool)
+        mask[:, :SQUARES] = self.pawn_mask()
+        games, slots = np.nonzero(self.fence_slots_mask())
+        for start in range(0, len(games), chunk_size):
+            chunk_games = games[start:start + chunk_size]
+            chunk_slots = slots[start:start + chunk_size]
+            mask[chunk_games, chunk_slots + SQUARES] = self.fair_play(chunk_games, chunk_slots)
+        return mask
+
+    def fair_play(self, games, slots):
+        """Takes matching arrays of game indexes and fence slots (0-71 vertical, 72-143 horizontal) and returns a
+        boolean array saying if both pawns in that game would still reach their goal rows with that fence added."""
+        count = len(games)
+        v_fences = self.v_fences[games].reshape(count, V_SLOTS)
+        h_fences = self.h_fences[games].reshape(count, H_SLOTS)
+        rows = np.arange(count)
+        vertical = slots < V_SLOTS
+        v_fences[rows[vertical], slots[vertical]] = True
+        h_fences[rows[~vertical], slots[~vertical] - V_SLOTS] = True
+        blocked = blocked_sides(v_fences.reshape(count, BOARD_SIZE, BOARD_SIZE - 1),
+                                h_fences.reshape(count, BOARD_SIZE - 1, BOARD_SIZE))
+        both = reaches_goal(np.concatenate((blocked, blocked)), np.concatenate(self.pawns[games].T),
+                            np.repeat(GOAL_ROWS, count))
+        return both[:count] & both[count:]
+
+    def step(self, actions):
+        """Takes one action per game and plays them all. Returns (rewards, done, illegal): a reward of 1 for the
+        side that just won with its move and 0 otherwise, whether each game is over, and which actions were
+        rejected. Rejected actions leave their game and the turn unchanged. Actions for finished games are
+        ignored. """
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = self._rows
+        live = self.winner == 0
+        rewards = np.zeros(self.batch_size, dtype=np.float32)
+        illegal = np.zeros(self.batch_size, dtype=bool)
+
+        is_pawn = live & (actions >= 0) & (actions < SQUARES)
+        pawn_ok = np.zeros(self.batch_size, dtype=bool)
+        if is_pawn.any():
+            pawn_ok[is_pawn] = self.pawn_mask()[rows[is_pawn], actions[is_pawn]]
+        illegal |= is_pawn & ~pawn_ok
+
+        is_fence = live & (actions >= SQUARES) & (actions < ACTIONS)
+        illegal |= live & ((actions < 0) | (actions >= ACTIONS))
+        fence_ok = np.zeros(self.batch_size, dtype=bool)
+        if is_fence.any():
+            slots = np.where(is_fence, actions - SQUARES, 0)
+            fence_ok = is_fence & self.fence_slots_mask()[rows, slots]
+            if fence_ok.any():
+                fence_games = rows[fence_ok]
+                fence_ok[fence_games] = self.fair_play(fence_games, slots[fence_games])
+        illegal |= is_fence & ~fence_ok
+
+        movers = self.turn.copy()
+        moved = rows[pawn_ok]
+        self.pawns[moved, movers[moved]] = actions[moved]
+        won = np.zeros(self.batch_size, dtype=bool)
+        won[moved] = actions[moved] // BOARD_SIZE == np.take(GOAL_ROWS, movers[moved])
+        self.winner[won] = movers[won] + 1
+        rewards[won] = 1.0
+
+        placed = rows[fence_ok]
+        slots = actions[placed] - SQUARES
+        vertical = slots < V_SLOTS
+        self.v_fences.reshape(self.batch_size, V_SLOTS)[placed[vertical], slots[vertical]] = True
+        self.h_fences.reshape(self.batch_size, H_SLOTS)[placed[~vertical], slots[~vertical] - V_SLOTS] = True
+        self.fences_left[placed, movers[placed]] -= 1
+
+        played = pawn_ok | fence_ok
+        self.turn[played] = 1 - self.turn[played]
+        return rewards, self.winner != 0, illegal
@@ -0,0 +1,276 @@
+# Description: Benchmark suite for the Quoridor engine. Every benchmark runs over a fixed corpus of positions built
+# from seeded random play, so two runs measure the same work and results can be compared across commits. Covers pawn
+# validation (steps, jumps and diagonals), fence validate / place / fair play / remove cycles on an empty, a mid-game
+# and a dense board, fair play on a maze where every check has to search the whole board, game construction and
+# complete random games, on the standard board and on a 19 x 19 board with four players.
+#
+# With pyperf installed the benchmarks run under pyperf, which handles worker processes, warmups and its own JSON:
+#     python QuoridorBenchmark.py --pyperf -o base.json          (then: python -m pyperf compare_to base.json new.json)
+# Without it a plain timer runs them in this process and writes a JSON file that the same script can compare:
+#     python QuoridorBenchmark.py --output base.json
+#     python QuoridorBenchmark.py --output new.json --compare base.json
+# Comparing prints each benchmark's change and exits with status 1 if any got slower than the threshold.
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from Quoridor import BOARD_SIZE, QuoridorGame
+from QuoridorSelfPlay import RandomPolicy
+
+CORPUS_SEED = 20210812
+GAME_SEEDS = tuple(range(8))           # seeds of the random games played by the random_games benchmark
+MAX_PLIES = 400
+MIN_RUN_TIME = 0.1                     # seconds each timed run of the plain timer should last at least
+
+
+def game_from_state(state):
+    """Takes a get_state tuple and returns a new game in that position."""
+    game = QuoridorGame()
+    game.set_state(state)
+    return game
+
+
+def random_position(seed, plies):
+    """Plays seeded random moves from the opening, fences included, and returns the get_state tuple reached after
+    the given number of plies (or earlier if the game ends). """
+    game = QuoridorGame()
+    policy = RandomPolicy(seed, fence_chance=0.4)
+    for _ in range(plies):
+        if game.get_game_state().get_game_state() is not None:
+            break
+        move = policy.choose_move(game)
+        game.push(move)
+        if game.get_game_state().get_game_state() is not None:
+            game.pop()
+            break
+    return game.get_state()
+
+
+def dense_position(seed):
+    """Returns a get_state tuple with pawns in the middle of their halves and as many seeded random fences as fit
+    (well past the usual twenty) while both players keep a path to their goal. """
+    game = QuoridorGame()
+    game.set_state((2 * BOARD_SIZE + 4, 6 * BOARD_SIZE + 4, 0, 0, 10, 10, 1, 0))
+    board = game.get_board()
+    generator = random.Random(seed)
+    slots = [("v", (x_coord, y_coord)) for x_coord in range(1, BOARD_SIZE) for y_coord in range(BOARD_SIZE)]
+    slots += [("h", (x_coord, y_coord)) for x_coord in range(BOARD_SIZE) for y_coord in range(1, BOARD_SIZE)]
+    generator.shuffle(slots)
+    for direction, coord_tuple in slots:
+        board.place_fence(direction, coord_tuple)
+        if not (board.fair_play(game.get_p1()) and board.fair_play(game.get_p2())):
+            board.remove_fence(direction, coord_tuple)
+    state = game.get_state()
+    return state[:4] + (0, 0) + state[6:]
+
+
+def maze_position():
+    """Returns a get_state tuple for a maze: every row boundary is walled off except for one gap, alternating
+    between the left and right ends, so the only way to the far side snakes through all 81 squares. """
+    h_fences = 0
+    for y_coord in range(1, BOARD_SIZE):
+        gap = BOARD_SIZE - 1 if y_coord % 2 else 0
+        for x_coord in range(BOARD_SIZE):
+            if x_coord != gap:
+                h_fences |= 1 << ((y_coord - 1) * BOARD_SIZE + x_coord)
+    return 4, (BOARD_SIZE - 1) * BOARD_SIZE + 4, 0, h_fences, 0, 0, 1, 0
+
+
+def pawn_cases(kind):
+    """Returns a list of (board, player, target) validate_pawn cases of one kind, one per direction: "step" moves
+    into an empty neighbour, "jump" goes straight over the other pawn and "diagonal" side steps around the other
+    pawn when a fence stands behind it. """
+    cases = []
+    centre = 4 * BOARD_SIZE + 4
+    for x_change, y_change in ((-1, 0), (0, -1), (1, 0), (0, 1)):
+        neighbour = (4 + x_change, 4 + y_change)
+        if kind == "step":
+            game = game_from_state((centre, 0, 0, 0, 10, 10, 1, 0))
+            target = neighbour
+        else:
+            game = game_from_state((centre, neighbour[1] * BOARD_SIZE + neighbour[0], 0, 0, 10, 10, 1, 0))
+            target = (4 + 2 * x_change, 4 + 2 * y_change)
+            if kind == "diagonal":
+                behind = (neighbour[0] + max(x_change, 0), neighbour[1] + max(y_change, 0))
+                game.get_board().place_fence("v" if x_change else "h", behind)
+                target = (neighbour[0] + y_change, neighbour[1] + x_change)
+        cases.append((game.get_board(), game.get_p1(), target))
+    return cases
+
+
+def fence_cases(state):
+    """Takes a get_state tuple and returns the game in that position plus the list of every fence slot
+    validate_fence accepts there, the work for one fence cycle pass."""
+    game = game_from_state(state)
+    board = game.get_board()
+    slots = [("v", (x_coord, y_coord)) for y_coord in range(BOARD_SIZE) for x_coord in range(1, BOARD_SIZE)]
+    slots += [("h", (x_coord, y_coord)) for y_coord in range(1, BOARD_SIZE) for x_coord in range(BOARD_SIZE)]
+    return game, [slot for slot in slots if board.validate_fence(*slot)]
+
+
+def make_validate_pawn(kind):
+    """Returns a timing function that validates every case of one pawn move kind per loop."""
+    cases = pawn_cases(kind)
+    assert all(board.validate_pawn(player, target) for board, player, target in cases), kind
+
+    def time_loops(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            for board, player, target in cases:
+                board.validate_pawn(player, target)
+        return time.perf_counter() - start
+    return time_loops, len(cases)
+
+
+def make_fence_cycle(state):
+    """Returns a timing function that, per loop, runs validate_fence, place_fence, fair_play for both players and
+    remove_fence for every open fence slot of the position, the way QuoridorGame.place_fence checks a fence. """
+    game, slots = fence_cases(state)
+    board = game.get_board()
+    players = (game.get_p2(), game.get_p1())
+
+    def time_loops(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            for direction, coord_tuple in slots:
+                if board.validate_fence(direction, coord_tuple):
+                    board.place_fence(direction, coord_tuple)
+                    board.fair_play(players[0]) and board.fair_play(players[1])
+                    board.remove_fence(direction, coord_tuple)
+        return time.perf_counter() - start
+    return time_loops, len(slots)
+
+
+def time_construction(loops):
+    """Times building new games."""
+    start = time.perf_counter()
+    for _ in range(loops):
+        QuoridorGame()
+    return time.perf_counter() - start
+
+
+def make_random_games(size=BOARD_SIZE, players=2):
+    """Returns a timing function that plays the seeded random games to the end (or MAX_PLIES) on a board of the
+    given size and player count, through the validated move_pawn and place_fence."""
+    def time_loops(loops):
+        elapsed = 0.0
+        for _ in range(loops):
+            for seed in GAME_SEEDS:
+                policy = RandomPolicy(seed)
+                start = time.perf_counter()
+                game = QuoridorGame(size, players)
+                state = game.get_game_state()
+                for _ in range(MAX_PLIES):
+                    if state.get_game_state() is not None:
+                        break
+                    player_num = int(state.get_turn()[1])
+                    move = policy.choose_move(game)
+                    if move[0] == "p":
+                        game.move_pawn(player_num, move[1])
+                    else:
+                        game.place_fence(player_num, move[0], move[1])
+                elapsed += time.perf_counter() - start
+        return elapsed
+    return time_loops
+
+
+def build_benchmarks():
+    """Builds the corpus and returns a list of (name, timing function, operations per loop). A timing function
+    takes a loop count and returns the seconds taken, the form pyperf's bench_time_func expects."""
+    benchmarks = [("construction", time_construction, 1)]
+    for kind in ("step", "jump", "diagonal"):
+        time_loops, ops = make_validate_pawn(kind)
+        benchmarks.append(("validate_pawn_" + kind, time_loops, ops))
+    positions = (("empty", QuoridorGame().get_state()), ("midgame", random_position(CORPUS_SEED, 30)),
+                 ("dense", dense_position(CORPUS_SEED)), ("maze", maze_position()))
+    for name, state in positions:
+        time_loops, ops = make_fence_cycle(state)
+        benchmarks.append(("fence_cycle_" + name, time_loops, ops))
+    benchmarks.append(("random_games", make_random_games(), len(GAME_SEEDS)))
+    benchmarks.append(("random_games_19x19_4p", make_random_games(19, 4), len(GAME_SEEDS)))
+    return benchmarks
+
+
+def run_plain(benchmarks, runs, names=None):
+    """Runs each benchmark with the plain timer: the loop count is doubled until one run lasts MIN_RUN_TIME, then
+    runs timed runs are taken. Returns a dictionary of results by name, times in seconds per loop."""
+    results = {}
+    for name, time_loops, ops in benchmarks:
+        if names and name not in names:
+            continue
+        loops = 1
+        while time_loops(loops) < MIN_RUN_TIME:
+            loops *= 2
+        times = [time_loops(loops) / loops for _ in range(runs)]
+        results[name] = {"ops": ops, "loops": loops, "runs": times, "mean": statistics.mean(times),
+                         "stdev": statistics.stdev(times) if runs > 1 else 0.0, "min": min(times)}
+        print("%-24s %10.2f us +- %5.1f%%  (%d ops per loop)" % (name, results[name]["mean"] * 1e6,
+              100 * results[name]["stdev"] / results[name]["mean"], ops), file=sys.stderr)
+    return results
+
+
+def compare(base, new, threshold):
+    """Takes two result files' benchmark dictionaries and prints the change in each benchmark's fastest run, which
+    is steadier than the mean on a busy machine. Returns the names that got slower by more than threshold (a
+    fraction). """
+    slower = []
+    for name in sorted(set(base) & set(new)):
+        ratio = new[name]["min"] / base[name]["min"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  SLOWER"
+            slower.append(name)
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print("%-24s %10.2f us -> %10.2f us  x%.3f%s" % (name, base[name]["min"] * 1e6, new[name]["min"] * 1e6,
+                                                         ratio, flag))
+    return slower
+
+
+def git_commit():
+    """Returns the current git commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    """Command line entry point."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--pyperf"]:
+        import pyperf
+        runner = pyperf.Runner(program_args=(sys.argv[0], "--pyperf"))
+        sys.argv = [sys.argv[0]] + argv[1:]
+        for name, time_loops, ops in build_benchmarks():
+            runner.bench_time_func(name, time_loops, inner_loops=ops)
+        return
+    parser = argparse.ArgumentParser(description="Benchmark the Quoridor engine.")
+    parser.add_argument("--runs", type=int, default=10, help="timed runs per benchmark")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.05, help="fraction slower that counts as a regression")
+    parser.add_argument("--bench", action="append", default=None, help="only run the named benchmark")
+    args = parser.parse_args(argv)
+    results = {"meta": {"commit": git_commit(), "python": platform.python_version(),
+                        "implementation": platform.python_implementation(), "machine": platform.machine(),
+                        "date": time.strftime("%Y-%m-%dT%H:%M:%S")},
+               "benchmarks": run_plain(build_benchmarks(), args.runs, args.bench)}
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=1)
+    if args.compare is not None:
+        with open(args.compare) as base:
+            if compare(json.load(base)["benchmarks"], results["benchmarks"], args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
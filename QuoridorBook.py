@@ -0,0 +1,331 @@
+# Description: Opening book and endgame tables for Quoridor, stored in sorted binary files that are read through
+# mmap. A lookup is a binary search over the mapped file, reading each record where it lies, so nothing is loaded
+# into the heap and every process that opens the same file shares the operating system's one copy of its pages.
+#
+# The opening book holds, for positions seen in the first plies of self-play games, the move whose win rate is best
+# once the number of games behind it is allowed for, and how often it won. The endgame tables hold exact results
+# for positions where neither player has a fence left: with the fences fixed only the two pawns and the turn
+# change, so all 81 x 80 x 2 positions of a fence layout can be solved by retrograde analysis. Build both from
+# QuoridorSelfPlay output:
+#     python QuoridorBook.py opening games.jsonl opening.book --plies 12
+#     python QuoridorBook.py endgame games.jsonl endgame.book
+#
+# File layout (little endian): a 16 byte header of the magic bytes, the kind (0 opening, 1 endgame) and the record
+# count, then 16 byte records sorted by key: the 64 bit canonical position key (symmetric positions share a record),
+# the move code, a signed value and a weight. In the opening book the value is the move's win rate in thousandths
+# and the weight the games it was played in. In the endgame tables the value is the distance to the end in plies,
+# positive if the side to move wins and negative if it loses (0 for a draw), and the weight is unused.
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+from Quoridor import BOARD_SIZE, COORDINATES, QuoridorGame, transform_move
+from QuoridorNotation import parse_record
+
+MAGIC = b"QRDBOOK1"
+OPENING, ENDGAME = 0, 1
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<QHhI")
+ENTRY = struct.Struct("<HhI")               # the record after its key
+SQUARES = BOARD_SIZE * BOARD_SIZE
+V_OFFSET = SQUARES                          # move codes: pawn squares first, then vertical and horizontal fences
+H_OFFSET = V_OFFSET + (BOARD_SIZE - 1) * BOARD_SIZE
+WILSON_Z = 1.96                             # normal quantile of the 95% interval book moves are ranked by
+
+
+def position_key(game):
+    """Takes a QuoridorGame and returns (key, transform): the canonical hash its position is stored under, shared by
+    its symmetric forms, and the transform to the canonical form. Moves are stored as played in the canonical
+    form, so they go through transform_move with this transform on the way in and out of a book. """
+    return game.get_canonical_hash()
+
+
+def encode_move(move):
+    """Takes a (kind, coordinates tuple) move and returns its move code: the square index for a pawn move, or the
+    fence slot index after the squares for a fence."""
+    kind, coord_tuple = move
+    if kind == "p":
+        return coord_tuple[1] * BOARD_SIZE + coord_tuple[0]
+    if kind == "v":
+        return V_OFFSET + coord_tuple[1] * (BOARD_SIZE - 1) + coord_tuple[0] - 1
+    return H_OFFSET + (coord_tuple[1] - 1) * BOARD_SIZE + coord_tuple[0]
+
+
+def decode_move(code):
+    """Takes a move code made by encode_move and returns the (kind, coordinates tuple) move."""
+    if code < V_OFFSET:
+        return "p", COORDINATES[code]
+    if code < H_OFFSET:
+        index = code - V_OFFSET
+        return "v", (index % (BOARD_SIZE - 1) + 1, index // (BOARD_SIZE - 1))
+    index = code - H_OFFSET
+    return "h", (index % BOARD_SIZE, index // BOARD_SIZE + 1)
+
+
+def write_book(path, kind, records):
+    """Takes a file path, the kind of book and an iterable of (key, move code, value, weight) records and writes
+    them sorted by key. The first record for a key wins if there are several. Returns the number written."""
+    entries = {}
+    for record in records:
+        entries.setdefault(record[0], record)
+    with open(path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, kind, len(entries)))
+        for key in sorted(entries):
+            output.write(RECORD.pack(*entries[key]))
+    return len(entries)
+
+
+class QuoridorBook:
+    """An open book file. Lookups binary search the memory mapped records in place."""
+
+    def __init__(self, path):
+        """Opens and maps the file at path, checking its header. Raises ValueError if it is not a book file,
+        including one too short to hold a header (an empty file cannot be mapped at all)."""
+        with open(path, "rb") as source:
+            length = os.fstat(source.fileno()).st_size
+            if length < HEADER.size:
+                raise ValueError("%s is not a Quoridor book file: %d bytes is shorter than the %d byte header"
+                                 % (path, length, HEADER.size))
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._kind, self._count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self._count * RECORD.size:
+            self._map.close()
+            raise ValueError("%s is not a Quoridor book file" % path)
+
+    def get_kind(self):
+        """Get method for the kind of book, OPENING or ENDGAME."""
+        return self._kind
+
+    def __len__(self):
+        """Returns the number of positions in the book."""
+        return self._count
+
+    def close(self):
+        """Unmaps the file."""
+        self._map.close()
+
+    def __enter__(self):
+        """Lets the book be used in a with statement."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Unmaps the file at the end of a with statement."""
+        self.close()
+
+    def lookup(self, key):
+        """Takes a position key and returns its (move code, value, weight) record, or None if it is not in the
+        book."""
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD.size
+            found = struct.unpack_from("<Q", self._map, offset)[0]
+            if found == key:
+                return ENTRY.unpack_from(self._map, offset + 8)
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def probe(self, game):
+        """Takes a QuoridorGame and returns the book's (move, value, weight) for its position, or None if the
+        position is not in the book. The move is a (kind, coordinates tuple) pair and has not been checked for
+        legality. Endgame tables only hold positions where neither player has a fence left (see solve_endgame), so
+        they are not searched for any other position."""
+        if self._kind == ENDGAME and (game.get_p1().get_fences_remaining() or game.get_p2().get_fences_remaining()):
+            return None
+        key, transform = position_key(game)
+        entry = self.lookup(key)
+        if entry is None:
+            return None
+        return transform_move(decode_move(entry[0]), transform), entry[1], entry[2]
+
+
+def win_rate_bound(won, played):
+    """Takes a move's wins and games played and returns the lower bound of the 95% Wilson score interval of its win
+    rate. It is what the win rate can be trusted to be at least, so a move won 2 of 2 times (0.34) ranks below one
+    won 600 of 1000 (0.57)."""
+    rate = won / played
+    spread = WILSON_Z * WILSON_Z / played
+    return ((rate + spread / 2 - WILSON_Z * math.sqrt(rate * (1 - rate) / played + spread / (4 * played))) /
+            (1 + spread))
+
+
+def build_opening_book(games, path, plies=12, min_games=10):
+    """Takes an iterable of (moves, winner) pairs, where winner is 1, 2 or 0 for unfinished, and writes an opening
+    book to path. Every position in the first plies of each game is counted with the move played from it, and a
+    position is kept if one of its moves was played in at least min_games games; of those, the move whose win rate
+    for the side that played it has the best lower confidence bound (win_rate_bound) is recorded, so a few lucky
+    games never outrank a well tried main line. The games are replayed with push, so they must be legal (as
+    self-play output always is). Returns the number of positions written. """
+    counts = {}
+    game = QuoridorGame()
+    for moves, winner in games:
+        game.reset()
+        for move in moves[:plies]:
+            mover = 1 if game.get_game_state().get_turn() == "P1" else 2
+            key, transform = position_key(game)
+            tally = counts.setdefault((key, encode_move(transform_move(move, transform))), [0, 0])
+            tally[0] += 1
+            if winner == mover:
+                tally[1] += 1
+            game.push(move)
+            if game.get_game_state().get_game_state() is not None:
+                break
+    best = {}
+    for (key, code), (played, won) in counts.items():
+        if played < min_games:
+            continue
+        score = (win_rate_bound(won, played), played)
+        if key not in best or score > best[key][0]:
+            best[key] = (score, code, won * 1000 // played, played)
+    return write_book(path, OPENING, ((key, code, value, weight) for key, (_, code, value, weight) in best.items()))
+
+
+def solve_endgame(v_fences, h_fences, fences_left=0):
+    """Takes a fence layout and solves every position on it where neither player has fences left, by retrograde
+    analysis: positions where the player who just moved has reached their goal are losses for the side to move, a
+    position with a move into a loss is a win one ply longer, and a position whose moves all lead to wins is a loss
+    one ply longer than the longest of them. Positions never settled are draws. Returns a list of (key, move code,
+    value, 0) records as stored in the endgame tables.
+
+    The game has no pass, so a position where the side to move has no legal pawn move is left unsolved, as is one
+    whose only unsettled moves lead to such positions; neither is written. Only pawn moves are generated, so the
+    tables cover fences_left = 0 alone, and any other number of fences left raises ValueError. """
+    if fences_left != 0:
+        raise ValueError("endgame tables only cover positions with no fences left, not %r" % (fences_left,))
+    game = QuoridorGame()
+    board = game.get_board()
+    states = {}
+    keys = []
+    children = []
+    for turn in (1, 2):
+        for p1_square in range(SQUARES):
+            for p2_square in range(SQUARES):
+                if p1_square == p2_square:
+                    continue
+                mover_row = (p1_square if turn == 1 else p2_square) // BOARD_SIZE
+                if mover_row == (BOARD_SIZE - 1 if turn == 1 else 0):     # side to move already won, unreachable
+                    continue
+                states[(p1_square, p2_square, turn)] = len(keys)
+                game.set_state((p1_square, p2_square, v_fences, h_fences, 0, 0, turn, 0))
+                keys.append(position_key(game))         # (key, transform) pairs
+                children.append(board.pawn_moves(game.get_p1() if turn == 1 else game.get_p2()))
+    count = len(keys)
+    outcome = [0] * count           # 0 unknown or draw, 1 win and 2 loss for the side to move
+    distance = [0] * count
+    best = [0] * count
+    remaining = [0] * count
+    parents = [[] for _ in range(count)]
+    queue = []
+    for (p1_square, p2_square, turn), index in states.items():
+        if (p2_square if turn == 1 else p1_square) // BOARD_SIZE == (0 if turn == 1 else BOARD_SIZE - 1):
+            outcome[index] = 2                      # the opponent is on their goal row, so the game is over
+            queue.append(index)
+            children[index] = []
+            continue
+        moves = children[index]
+        children[index] = []
+        for coord_tuple in moves:
+            target = coord_tuple[1] * BOARD_SIZE + coord_tuple[0]
+            child = states.get((target, p2_square, 2) if turn == 1 else (p1_square, target, 1))
+            if child is None:
+                continue
+            children[index].append((child, target))
+            parents[child].append(index)
+        remaining[index] = len(children[index])
+    for index in queue:                             # queue grows as positions are settled, in distance order
+        for parent in parents[index]:
+            if outcome[parent]:
+                continue
+            if outcome[index] == 2:
+                outcome[parent] = 1
+            else:
+                remaining[parent] -= 1
+                if remaining[parent]:
+                    continue
+                outcome[parent] = 2
+            distance[parent] = distance[index] + 1
+            queue.append(parent)
+    records = []
+    for index in range(count):
+        choices = children[index]
+        if outcome[index] == 2 and distance[index] == 0 or not choices:
+            continue                                # game already over, or no legal move to solve
+        if outcome[index] == 1:
+            target = next(target for child, target in choices
+                          if outcome[child] == 2 and distance[child] == distance[index] - 1)
+            value = distance[index]
+        elif outcome[index] == 2:
+            target = max(choices, key=lambda choice: distance[choice[0]])[1]
+            value = -distance[index]
+        else:
+            target = next((target for child, target in choices if not outcome[child] and children[child]), None)
+            if target is None:
+                continue                            # stays unsolved rather than a draw
+            value = 0
+        key, transform = keys[index]
+        records.append((key, encode_move(transform_move(("p", COORDINATES[target]), transform)), value, 0))
+    return records
+
+
+def build_endgame_book(games, path, max_layouts=None):
+    """Takes an iterable of (moves, winner) pairs and writes endgame tables to path for every fence layout on which
+    a game reached a position with no fences left on either side, up to max_layouts layouts. Returns the number of
+    positions written. """
+    layouts = []
+    seen = set()
+    game = QuoridorGame()
+    for moves, _ in games:
+        game.reset()
+        for move in moves:
+            if game.get_game_state().get_game_state() is not None:
+                break
+            state = game.get_state()
+            if state[4] == 0 and state[5] == 0:
+                if (state[2], state[3]) not in seen:
+                    seen.add((state[2], state[3]))
+                    layouts.append((state[2], state[3]))
+                break
+            game.push(move)
+        if max_layouts is not None and len(layouts) >= max_layouts:
+            break
+    return write_book(path, ENDGAME, (record for v_fences, h_fences in layouts
+                                      for record in solve_endgame(v_fences, h_fences, fences_left=0)))
+
+
+def read_selfplay(path):
+    """Takes the path of a QuoridorSelfPlay output file and lazily yields (moves, winner) for each game in it."""
+    with open(path) as source:
+        for line in source:
+            if line.strip():
+                record = json.loads(line)
+                yield parse_record(record["moves"]), record["winner"]
+
+
+def main(argv=None):
+    """Command line entry point for building books from self-play output."""
+    parser = argparse.ArgumentParser(description="Build Quoridor opening books and endgame tables.")
+    parser.add_argument("kind", choices=("opening", "endgame"))
+    parser.add_argument("games", help="QuoridorSelfPlay JSONL output to build from")
+    parser.add_argument("output", help="book file to write")
+    parser.add_argument("--plies", type=int, default=12, help="opening book depth")
+    parser.add_argument("--min-games", type=int, default=10, help="games a book move must have been played in")
+    parser.add_argument("--max-layouts", type=int, default=None, help="fence layouts to solve at most")
+    args = parser.parse_args(argv)
+    if args.kind == "opening":
+        written = build_opening_book(read_selfplay(args.games), args.output, args.plies, args.min_games)
+    else:
+        written = build_endgame_book(read_selfplay(args.games), args.output, args.max_layouts)
+    print("wrote %d positions to %s" % (written, args.output), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# Description: Defines a QuoridorMCTS class that picks moves for a QuoridorGame by Monte Carlo Tree Search. Each
+# worker process grows its own UCT tree from the same root position (root parallelization) and the visit counts of
+# the root moves are summed to choose the move. Positions travel to workers as QuoridorGame.get_state() tuples.
+
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Quoridor import BOARD_SIZE, GOAL_ROWS, QuoridorGame
+
+ROLLOUT_PLIES = 150         # rollouts that run this long are scored by shortest path instead
+FENCE_CHANCE = 0.1          # chance a rollout move is a random fence when the player has one
+GREEDY_CHANCE = 0.8         # chance a rollout pawn move is the one that shortens the path most
+
+
+class MCTSNode:
+    """A node of the search tree. Holds the move that led to it, the name of the player who made that move, the
+    moves not yet expanded, the child nodes, and how many rollouts passed through it and how many the player who
+    made the move won."""
+
+    def __init__(self, parent, move, player_name, untried):
+        """Initializes the node's links, its unexpanded moves and its win and visit counts."""
+        self.parent = parent
+        self.move = move
+        self.player_name = player_name
+        self.untried = untried
+        self.children = []
+        self.visits = 0
+        self.wins = 0
+
+    def select_child(self, exploration):
+        """Returns the child with the highest UCT score: its win rate plus an exploration bonus that shrinks as the
+        child is visited more."""
+        log_visits = math.log(self.visits)
+        best_child = None
+        best_score = -1.0
+        for child in self.children:
+            score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best_score = score
+                best_child = child
+        return best_child
+
+
+def tree_moves(game):
+    """Takes a QuoridorGame and returns the moves the tree expands for the side to move: every legal pawn move and
+    the legal fences that cut the opponent's current shortest path, since no other fence can make it longer."""
+    turn = game.get_game_state().get_turn()
+    if turn == "P1":
+        player_num, player, opponent = 1, game.get_p1(), game.get_p2()
+    else:
+        player_num, player, opponent = 2, game.get_p2(), game.get_p1()
+    moves = [("p", coord_tuple) for coord_tuple in game.legal_pawn_moves(player_num)]
+    if player.get_fences_remaining() > 0:
+        board = game.get_board()
+        position = opponent.get_position()
+        path_v, path_h = board.trace_path(board.distance_map(GOAL_ROWS[opponent.get_player_name()]),
+                                          position[1] * BOARD_SIZE + position[0],
+                                          board.get_v_fences(), board.get_h_fences())
+        for direction, coord_tuple in game.legal_fences(player_num):
+            if (path_v if direction == "v" else path_h) >> board.fence_index(direction, coord_tuple) & 1:
+                moves.append((direction, coord_tuple))
+    return moves
+
+
+def rollout(game, generator):
+    """Takes a scratch QuoridorGame and a random generator and plays the game out with cheap moves: usually the
+    pawn move that shortens the mover's path most, sometimes another pawn move, and now and then a random fence.
+    Returns the winner's name. If nobody has won after ROLLOUT_PLIES the shorter path wins, ties to the side to
+    move. """
+    board = game.get_board()
+    state = game.get_game_state()
+    for _ in range(ROLLOUT_PLIES):
+        winner = state.get_game_state()
+        if winner is not None:
+            return winner
+        if state.get_turn() == "P1":
+            player_num, player = 1, game.get_p1()
+        else:
+            player_num, player = 2, game.get_p2()
+        if player.get_fences_remaining() > 0 and generator.random() < FENCE_CHANCE:
+            direction = "v" if generator.random() < 0.5 else "h"
+            coord_tuple = (generator.randrange(BOARD_SIZE), generator.randrange(BOARD_SIZE))
+            if game.place_fence(player_num, direction, coord_tuple) is True:
+                continue
+        moves = board.pawn_moves(player)
+        if not moves:
+            game.change_turn()
+            continue
+        if generator.random() < GREEDY_CHANCE:
+            distances = board.distance_map(GOAL_ROWS[player.get_player_name()])
+            move = min(moves, key=lambda coord_tuple: distances[coord_tuple[1] * BOARD_SIZE + coord_tuple[0]])
+        else:
+            move = moves[generator.randrange(len(moves))]
+        game.move_pawn(player_num, move)
+    winner = state.get_game_state()
+    if winner is not None:
+        return winner
+    distances = []
+    for player in (game.get_p1(), game.get_p2()):
+        position = player.get_position()
+        distances.append(board.distance_map(GOAL_ROWS[player.get_player_name()])[
+            position[1] * BOARD_SIZE + position[0]])
+    if distances[0] == distances[1]:
+        return state.get_turn()
+    return "P1" if distances[0] < distances[1] else "P2"
+
+
+def search_tree(state, time_limit, iterations, seed, exploration):
+    """Grows one UCT tree from the position in state for time_limit seconds or the given number of iterations,
+    whichever comes first (iterations may be None). Returns a dictionary of (visits, wins) by root move. Runs in a
+    worker process, so it only takes and returns plain, small values. """
+    deadline = time.perf_counter() + time_limit
+    generator = random.Random(seed)
+    game = QuoridorGame()
+    game.set_state(state)
+    scratch = QuoridorGame()
+    last_mover = "P2" if game.get_game_state().get_turn() == "P1" else "P1"
+    root = MCTSNode(None, None, last_mover, tree_moves(game))
+    count = 0
+    while (iterations is None or count < iterations) and time.perf_counter() < deadline:
+        count += 1
+        node = root
+        depth = 0
+        while not node.untried and node.children:                           # selection
+            node = node.select_child(exploration)
+            game.push(node.move)
+            depth += 1
+        if node.untried and game.get_game_state().get_game_state() is None:    # expansion
+            move = node.untried.pop(generator.randrange(len(node.untried)))
+            mover = game.get_game_state().get_turn()
+            game.push(move)
+            depth += 1
+            child = MCTSNode(node, move, mover, tree_moves(game) if game.get_game_state().get_game_state() is None
+                             else [])
+            node.children.append(child)
+            node = child
+        scratch.set_state(game.get_state())
+        winner = rollout(scratch, generator)
+        while node is not None:                                             # back propagation
+            node.visits += 1
+            if node.player_name == winner:
+                node.wins += 1
+            node = node.parent
+        for _ in range(depth):
+            game.pop()
+    results = {}
+    for child in root.children:
+        results[child.move] = (child.visits, child.wins)
+    return results
+
+
+class QuoridorMCTS:
+    """Creates a Monte Carlo Tree Search player. With more than one worker, each worker process searches its own
+    tree from the same position with its own random seed and the root statistics are added together, so rollout
+    throughput grows with the number of workers. The process pool is started on first use and kept until close. """
+
+    def __init__(self, workers=None, time_limit=1.0, iterations=None, exploration=1.4, seed=None):
+        """Initializes the number of worker processes (defaults to the CPU count, 1 searches in this process), the
+        time budget per move in seconds, an optional cap on iterations per worker, the UCT exploration constant
+        and the seed for the workers' random generators. """
+        self._workers = workers or os.cpu_count() or 1
+        self._time_limit = time_limit
+        self._iterations = iterations
+        self._exploration = exploration
+        self._generator = random.Random(seed)
+        self._executor = None
+        self._visits = 0
+
+    def get_visits(self):
+        """Get method for the number of rollouts, summed over workers, behind the last move chosen."""
+        return self._visits
+
+    def close(self):
+        """Shuts down the worker processes, if they were started."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        """Lets the player be used in a with statement so its worker processes are always shut down."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Shuts down the worker processes at the end of a with statement."""
+        self.close()
+
+    def play(self, game):
+        """Takes a QuoridorGame, chooses a move for the side to move and plays it through move_pawn or place_fence.
+        Returns the move played, or None if there was nothing to play."""
+        move = self.choose_move(game)
+        if move is None:
+            return None
+        player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+        if move[0] == "p":
+            game.move_pawn(player_num, move[1])
+        else:
+            game.place_fence(player_num, move[0], move[1])
+        return move
+
+    def choose_move(self, game):
+        """Takes a QuoridorGame and returns the most visited root move over all workers' trees, or None if the game
+        is over. The game itself is not changed."""
+        if game.get_game_state().get_game_state() is not None:
+            return None
+        state = game.get_state()
+        seeds = [self._generator.getrandbits(32) for _ in range(self._workers)]
+        if self._workers == 1:
+            results = [search_tree(state, self._time_limit, self._iterations, seeds[0], self._exploration)]
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+            futures = [self._executor.submit(search_tree, state, self._time_limit, self._iterations, seed,
+                                             self._exploration) for seed in seeds]
+            results = [future.result() for future in futures]
+        totals = {}
+        for result in results:
+            for move, (visits, wins) in result.items():
+                totals[move] = totals.get(move, 0) + visits
+        self._visits = sum(totals.values())
+        if not totals:
+            return None
+        return max(totals, key=totals.get)
@@ -0,0 +1,86 @@
+# Description: Reads and writes Quoridor moves in the usual algebraic notation, and whole games as move-list records.
+# Columns are the letters a-i for x = 0-8 and rows are the numbers 1-9 for y = 0-8, so P1 starts on e1 and P2 on e9.
+# A pawn move is the square it moves to ("e2"). A fence is the square it borders followed by its direction: "e3h" is
+# the horizontal fence along the top of e3 (between e2 and e3) and "e3v" the vertical fence along its left side
+# (between d3 and e3). Fences in this game are one square long, so the square names the whole fence.
+#
+# A game record file holds one game per line, the moves in order separated by spaces. Blank lines and lines
+# starting with # are skipped.
+
+from Quoridor import BOARD_SIZE, QuoridorGame
+
+COLUMNS = "abcdefghijklmnopqrs"[:BOARD_SIZE]
+
+
+def move_to_notation(move):
+    """Takes a (kind, coordinates tuple) move as used by QuoridorGame.push and returns its notation."""
+    kind, coord_tuple = move
+    square = COLUMNS[coord_tuple[0]] + str(coord_tuple[1] + 1)
+    if kind == "p":
+        return square
+    return square + kind
+
+
+def notation_to_move(text):
+    """Takes a move in notation and returns it as a (kind, coordinates tuple) move. Raises ValueError if the text
+    is not a square on the board, optionally followed by h or v. Whether the move is legal is not checked."""
+    text = text.strip().lower()
+    kind = "p"
+    if text[-1:] in ("h", "v"):
+        kind = text[-1]
+        text = text[:-1]
+    if len(text) < 2 or text[0] not in COLUMNS or not text[1:].isdigit():
+        raise ValueError("not a Quoridor move: %r" % text)
+    y_coord = int(text[1:]) - 1
+    if not 0 <= y_coord < BOARD_SIZE:
+        raise ValueError("row out of range in Quoridor move: %r" % text)
+    return kind, (COLUMNS.index(text[0]), y_coord)
+
+
+def format_record(moves):
+    """Takes a list of (kind, coordinates tuple) moves and returns them as one record line, without newline."""
+    return " ".join(move_to_notation(move) for move in moves)
+
+
+def parse_record(line):
+    """Takes one record line and returns its list of (kind, coordinates tuple) moves. Raises ValueError if the line
+    is not a string, as when a JSON record holds its moves as some other type."""
+    if not isinstance(line, str):
+        raise ValueError("game record has type %s, not a string of moves" % type(line).__name__)
+    return [notation_to_move(token) for token in line.split()]
+
+
+def read_game_records(source):
+    """Takes an open text file (or any iterable of lines) and lazily yields each game in it as a list of moves.
+    Nothing is read ahead, so files of any size can be streamed."""
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield parse_record(line)
+
+
+def write_game_records(destination, games):
+    """Takes an open text file and an iterable of move lists and writes one record line per game. Returns the
+    number of games written."""
+    count = 0
+    for moves in games:
+        destination.write(format_record(moves) + "\n")
+        count += 1
+    return count
+
+
+def play_record(moves, game=None):
+    """Takes a list of moves and plays them in order through move_pawn and place_fence on the given game (a new
+    one if None), so every move is validated. Returns the game, or raises ValueError naming the first move that was
+    rejected."""
+    if game is None:
+        game = QuoridorGame()
+    for ply, move in enumerate(moves):
+        player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+        if move[0] == "p":
+            accepted = game.move_pawn(player_num, move[1])
+        else:
+            accepted = game.place_fence(player_num, move[0], move[1])
+        if accepted is not True:
+            raise ValueError("illegal move %s at ply %d" % (move_to_notation(move), ply + 1))
+    return game
@@ -0,0 +1,189 @@
+# Description: Bulk replay for auditing archived Quoridor games against the current rules. Game files are streamed a
+# line at a time and handed out in chunks to a pool of worker processes, each of which reuses one QuoridorGame. Every
+# game is fast-forwarded in trusted mode (push, with no move validation) up to a checkpoint ply, then played through
+# the validated move_pawn and place_fence from there on. Only discrepancies are written out, one JSON line each, so
+# auditing a clean archive prints nothing but the summary.
+#     python QuoridorReplay.py archive/*.txt --from-ply 0 --workers 16 --output discrepancies.jsonl
+# Archive files hold one game per line, either a QuoridorNotation record or a QuoridorSelfPlay JSON line (whose
+# recorded winner is checked as well). Blank lines and lines starting with # are skipped.
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from Quoridor import QuoridorGame
+from QuoridorNotation import move_to_notation, parse_record
+
+CHUNK_SIZE = 500            # games per task sent to a worker
+PENDING_PER_WORKER = 4      # chunks queued per worker, which bounds memory however long the archive
+
+_worker = {}                # per process: the reusable game and the checkpoint ply
+
+
+def read_chunks(paths, chunk_size=CHUNK_SIZE):
+    """Takes a list of archive file paths and lazily yields (path, [(line number, line), ...]) chunks of the game
+    lines in them. Only one chunk per file is held at a time."""
+    for path in paths:
+        with open(path) as source:
+            chunk = []
+            for line_number, line in enumerate(source, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                chunk.append((line_number, line))
+                if len(chunk) >= chunk_size:
+                    yield path, chunk
+                    chunk = []
+            if chunk:
+                yield path, chunk
+
+
+def init_worker(from_ply):
+    """Builds the reusable game once per worker process."""
+    _worker["game"] = QuoridorGame()
+    _worker["from_ply"] = from_ply
+
+
+def on_board(tables, move):
+    """Takes the BoardTables of the game being replayed and a move and returns True if the move's square or fence
+    slot is on the board. Trusted moves skip the rules but not this check, since push indexes its tables with
+    them."""
+    kind, coord_tuple = move
+    if kind == "p":
+        return 0 <= coord_tuple[0] < tables.size and 0 <= coord_tuple[1] < tables.size
+    return kind in ("v", "h") and tables.fence_slot(kind, coord_tuple) >= 0
+
+
+def replay(game, moves, from_ply):
+    """Takes a game to reuse, a list of moves and the checkpoint ply and replays the moves from the opening, pushed
+    without validation before the checkpoint and validated after it. Returns None if every move was accepted, or a
+    (ply, move, reason) triple for the first one that was not. Moves after the game was won and moves off the
+    board are always reported, even before the checkpoint, since noticing costs nothing, and so is any error raised
+    while replaying a move. """
+    game.reset()
+    state = game.get_game_state()
+    tables = game.get_tables()
+    for ply, move in enumerate(moves, 1):
+        if state.get_game_state() is not None:
+            return ply, move, "move after the game was won"
+        player_num = 1 if state.get_turn() == "P1" else 2
+        try:
+            if ply <= from_ply:
+                if not on_board(tables, move):
+                    return ply, move, "move off the board"
+                game.push(move)
+                continue
+            if move[0] == "p":
+                if game.move_pawn(player_num, move[1]) is not True:
+                    return ply, move, "illegal pawn move"
+            else:
+                accepted = game.place_fence(player_num, move[0], move[1])
+                if accepted is not True:
+                    return ply, move, accepted if accepted else "illegal fence"
+        except Exception as error:                  # one broken game must not end the whole audit
+            return ply, move, "replay failed: %s: %s" % (type(error).__name__, error)
+    return None
+
+
+def audit_chunk(task):
+    """Replays one chunk of game lines in this worker and returns (games replayed, list of discrepancy records)."""
+    path, lines = task
+    game = _worker["game"]
+    discrepancies = []
+    for line_number, line in lines:
+        record = {"file": path, "line": line_number}
+        winner = None
+        try:
+            if line.startswith("{"):
+                entry = json.loads(line)
+                moves = parse_record(entry["moves"])
+                winner = entry.get("winner")
+                if winner is not None and type(winner) is not int:
+                    raise ValueError("winner is %r, not a player number" % (winner,))
+            else:
+                moves = parse_record(line)
+        except (ValueError, KeyError, TypeError) as error:
+            record["error"] = "unreadable record: %s" % error
+            discrepancies.append(record)
+            continue
+        result = replay(game, moves, _worker["from_ply"])
+        if result is not None:
+            ply, move, reason = result
+            record.update(ply=ply, move=move_to_notation(move), error=reason)
+            discrepancies.append(record)
+            continue
+        if winner is not None:
+            replayed = game.get_game_state().get_game_state()
+            replayed = 0 if replayed is None else int(replayed[1])
+            if replayed != winner and not (entry.get("forfeited") and replayed == 0):
+                record.update(error="recorded winner %d but replay gives %d" % (winner, replayed))
+                discrepancies.append(record)
+    return len(lines), discrepancies
+
+
+def run_audit(paths, output, from_ply=0, workers=1, chunk_size=CHUNK_SIZE):
+    """Replays every game in the archive files and writes each discrepancy to the output file object as one JSON
+    line, in the order chunks finish. Returns (games replayed, discrepancies found). Chunks are read only as
+    workers free up, so memory stays flat for archives of any size."""
+    games = 0
+    found = 0
+    chunks = read_chunks(paths, chunk_size)
+    if workers <= 1:
+        init_worker(from_ply)
+        for chunk in chunks:
+            count, discrepancies = audit_chunk(chunk)
+            games += count
+            found += len(discrepancies)
+            for record in discrepancies:
+                output.write(json.dumps(record) + "\n")
+        return games, found
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(from_ply,)) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(audit_chunk, chunk))
+            if len(pending) < workers * PENDING_PER_WORKER:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                count, discrepancies = future.result()
+                games += count
+                found += len(discrepancies)
+                for record in discrepancies:
+                    output.write(json.dumps(record) + "\n")
+        for future in pending:
+            count, discrepancies = future.result()
+            games += count
+            found += len(discrepancies)
+            for record in discrepancies:
+                output.write(json.dumps(record) + "\n")
+    return games, found
+
+
+def main(argv=None):
+    """Command line entry point for audits."""
+    parser = argparse.ArgumentParser(description="Re-validate archived Quoridor games and report discrepancies.")
+    parser.add_argument("paths", nargs="+", help="archive files, one game per line")
+    parser.add_argument("--from-ply", type=int, default=0,
+                        help="plies to fast-forward without validation before checking every move")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--output", default="-", help="JSONL file for discrepancies, - for standard output")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    if args.output == "-":
+        games, found = run_audit(args.paths, sys.stdout, args.from_ply, args.workers, args.chunk_size)
+    else:
+        with open(args.output, "w") as output:
+            games, found = run_audit(args.paths, output, args.from_ply, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print("replayed %d games, %d discrepancies in %.1f s (%.0f games/s)"
+          % (games, found, elapsed, games / elapsed if elapsed else 0), file=sys.stderr)
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
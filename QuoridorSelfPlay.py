@@ -0,0 +1,188 @@
+# Description: Headless self-play harness. Plays N complete games between pluggable policies, shards the games
+# across worker processes that each reuse one QuoridorGame, and streams one JSON line per finished game (winner,
+# ply count, fences used, per-move timings and the moves in QuoridorNotation) to an output file. Run as a script:
+#     python QuoridorSelfPlay.py --games 1000 --p1 greedy --p2 random --workers 8 --output games.jsonl
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from Quoridor import FENCES_PER_PLAYER, QuoridorGame
+from QuoridorAI import QuoridorAI
+from QuoridorMCTS import QuoridorMCTS
+from QuoridorNotation import format_record
+
+
+class RandomPolicy:
+    """Plays a random legal pawn move, or now and then a random legal fence while it has fences."""
+
+    def __init__(self, seed=None, fence_chance=0.2):
+        """Initializes the random generator and the chance of placing a fence instead of moving."""
+        self._generator = random.Random(seed)
+        self._fence_chance = fence_chance
+
+    def choose_move(self, game):
+        """Takes a QuoridorGame of any size or player count and returns a random legal (kind, coordinates tuple) move
+        for the side to move."""
+        player_num = int(game.get_game_state().get_turn()[1])
+        if self._generator.random() < self._fence_chance:
+            fences = game.legal_fences(player_num)
+            if fences:
+                return fences[self._generator.randrange(len(fences))]
+        moves = game.legal_pawn_moves(player_num)
+        if not moves:
+            return None
+        return "p", moves[self._generator.randrange(len(moves))]
+
+
+class GreedyPolicy:
+    """Always moves the pawn one step along a shortest path to its goal row and never places fences. Ties between
+    equally good moves are broken at random."""
+
+    def __init__(self, seed=None):
+        """Initializes the random generator used to break ties."""
+        self._generator = random.Random(seed)
+
+    def choose_move(self, game):
+        """Takes a QuoridorGame of any size or player count and returns the pawn move that leaves the side to move
+        closest to its goal side."""
+        player_num = int(game.get_game_state().get_turn()[1])
+        player = game.get_player(player_num)
+        moves = game.legal_pawn_moves(player_num)
+        if not moves:
+            return None
+        board = game.get_board()
+        size = board.get_tables().size
+        distances = board.distance_map(board.get_goal(player))
+        best = min(distances[y_coord * size + x_coord] for x_coord, y_coord in moves)
+        moves = [coord_tuple for coord_tuple in moves if distances[coord_tuple[1] * size + coord_tuple[0]] == best]
+        return "p", moves[self._generator.randrange(len(moves))]
+
+
+# Policies are named on the command line and built inside each worker, so only names and seeds cross processes.
+POLICIES = {
+    "random": lambda seed, time_limit: RandomPolicy(seed),
+    "greedy": lambda seed, time_limit: GreedyPolicy(seed),
+    "alphabeta": lambda seed, time_limit: QuoridorAI(time_limit=time_limit),
+    "mcts": lambda seed, time_limit: QuoridorMCTS(workers=1, time_limit=time_limit, seed=seed),
+}
+
+_worker = {}        # per process: the reusable game, the policy names and the match settings
+
+
+def game_seed(seed, game_index):
+    """Takes the run's seed and a game's index and returns the seed for that game's policies. It depends on nothing
+    else, so every game is different and replays the same however the games are split over workers."""
+    return random.Random("%d:%d" % (seed, game_index)).getrandbits(32)
+
+
+def init_worker(p1_policy, p2_policy, seed, time_limit, max_plies):
+    """Builds the reusable game once per worker process and keeps the settings each game's policies are made
+    from."""
+    _worker["game"] = QuoridorGame()
+    _worker["policy_names"] = (p1_policy, p2_policy)
+    _worker["seed"] = seed
+    _worker["time_limit"] = time_limit
+    _worker["max_plies"] = max_plies
+
+
+def play_game(game_index):
+    """Plays one game in this worker with its reusable game object and returns the result record. Both policies
+    are built afresh for the game, seeded from the run's seed and the game index (see game_seed). A policy that
+    returns no move or an illegal one loses the game, which is marked as forfeited."""
+    game = _worker["game"]
+    seed = game_seed(_worker["seed"], game_index)
+    policies = tuple(POLICIES[name](seed + index, _worker["time_limit"])
+                     for index, name in enumerate(_worker["policy_names"]))
+    game.reset()
+    state = game.get_game_state()
+    moves = []
+    move_times = []
+    forfeited = False
+    while state.get_game_state() is None and len(moves) < _worker["max_plies"]:
+        player_num = 1 if state.get_turn() == "P1" else 2
+        start = time.perf_counter()
+        move = policies[player_num - 1].choose_move(game)
+        move_times.append(round((time.perf_counter() - start) * 1000, 3))
+        if move is None:
+            accepted = False
+        elif move[0] == "p":
+            accepted = game.move_pawn(player_num, move[1])
+        else:
+            accepted = game.place_fence(player_num, move[0], move[1])
+        if accepted is not True:
+            forfeited = True
+            winner = game.get_player(2 if player_num == 1 else 1)
+            state.set_game_state(winner.get_player_name())        # as move_pawn marks a win
+            winner.set_winning()
+            break
+        moves.append(move)
+    winner = state.get_game_state()
+    return {
+        "game": game_index,
+        "winner": 0 if winner is None else int(winner[1]),
+        "plies": len(moves),
+        "fences_used": [FENCES_PER_PLAYER - game.get_p1().get_fences_remaining(),
+                        FENCES_PER_PLAYER - game.get_p2().get_fences_remaining()],
+        "forfeited": forfeited,
+        "move_ms": move_times,
+        "moves": format_record(moves),
+    }
+
+
+def run_selfplay(games, output, p1_policy="greedy", p2_policy="random", workers=1, seed=0, time_limit=0.05,
+                 max_plies=400):
+    """Plays the given number of games between the two named policies and appends one JSON line per game to the
+    output file object as soon as each game finishes (in finishing order, not game order). Returns a dictionary of
+    wins by player number, 0 counting games stopped at max_plies."""
+    totals = {0: 0, 1: 0, 2: 0}
+    arguments = (p1_policy, p2_policy, seed, time_limit, max_plies)
+    if workers <= 1:
+        init_worker(*arguments)
+        results = map(play_game, range(games))
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=arguments)
+        results = pool.imap_unordered(play_game, range(games), chunksize=max(1, min(64, games // (workers * 8))))
+    try:
+        for result in results:
+            output.write(json.dumps(result, separators=(",", ":")) + "\n")
+            totals[result["winner"]] += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    output.flush()
+    return totals
+
+
+def main(argv=None):
+    """Command line entry point for self-play runs."""
+    parser = argparse.ArgumentParser(description="Play Quoridor games between two policies without a display.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--p1", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--p2", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--time-limit", type=float, default=0.05, help="seconds per move for search policies")
+    parser.add_argument("--max-plies", type=int, default=400)
+    parser.add_argument("--output", default="-", help="JSONL file to append to, - for standard output")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    if args.output == "-":
+        totals = run_selfplay(args.games, sys.stdout, args.p1, args.p2, args.workers, args.seed, args.time_limit,
+                              args.max_plies)
+    else:
+        with open(args.output, "a") as output:
+            totals = run_selfplay(args.games, output, args.p1, args.p2, args.workers, args.seed, args.time_limit,
+                                  args.max_plies)
+    elapsed = time.perf_counter() - start
+    print("P1 wins %d, P2 wins %d, unfinished %d in %.1f s (%.1f games/s)"
+          % (totals[1], totals[2], totals[0], elapsed, args.games / elapsed), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
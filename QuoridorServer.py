@@ -0,0 +1,495 @@
+# Description: Asyncio match server hosting many QuoridorGame sessions in one process, plus a local load generator.
+# Clients talk line-delimited JSON over TCP or a Unix socket. Every request is an object with an "op" and an
+# optional "id" that is echoed back, and every reply has "ok" plus either results or an error "code":
+#     {"id": 1, "op": "new"}                                   -> {"id": 1, "ok": true, "game": "g1", ...}
+#     {"id": 2, "op": "move", "game": "g1", "player": 1, "move": "e2"}     pawn move or fence ("e3h") in notation
+#     {"id": 3, "op": "state", "game": "g1"}                   {"id": 4, "op": "legal", "game": "g1", "player": 1}
+#     {"id": 5, "op": "ai", "game": "g1", "time_limit": 0.2}   {"id": 6, "op": "close", "game": "g1"}
+#     {"id": 7, "op": "watch", "game": "g1"}                   {"id": 8, "op": "unwatch", "game": "g1"}
+# A watching connection is sent one small line per change to the game instead of whole positions, such as
+#     {"game":"g1","event":"pawn","player":1,"from":"e1","to":"e2"}   {"game":"g1","event":"turn","player":2}
+#     {"game":"g1","event":"fence","player":2,"move":"e3h","left":9}  {"game":"g1","event":"won","player":1}
+# Each line is encoded once per event and written to every watcher, so spectators cost a write each.
+# Run "python QuoridorServer.py serve" to host games and "python QuoridorServer.py load --rate 500" to measure
+# latency, with games arriving open loop at the given rate and their moves worked out beforehand. With
+# "--store DIR" every game and move is logged to a QuoridorStore there, and a restarted server picks up every game
+# where it was left, each rebuilt from its stored state when it is next used.
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from Quoridor import FencePlaced, GameWon, PawnMoved, QuoridorGame, TurnChanged
+from QuoridorAI import QuoridorAI
+from QuoridorNotation import move_to_notation, notation_to_move
+from QuoridorSelfPlay import RandomPolicy
+from QuoridorStore import QuoridorStore
+
+# Error codes returned in the "code" field of a failed reply.
+BAD_REQUEST = "bad_request"
+UNKNOWN_OP = "unknown_op"
+UNKNOWN_GAME = "unknown_game"
+GAME_OVER = "game_over"
+NOT_YOUR_TURN = "not_your_turn"
+NO_FENCES = "no_fences"
+ILLEGAL_MOVE = "illegal_move"
+ILLEGAL_FENCE = "illegal_fence"
+FAIR_PLAY = "fair_play"
+INTERNAL_ERROR = "internal_error"           # a bug in the server, logged with its traceback
+
+IDLE_SECONDS = 30.0         # a game untouched this long gives back the memory of its path caches
+
+log = logging.getLogger(__name__)
+
+
+class RequestError(Exception):
+    """Raised while handling a request to send back a failed reply with an error code."""
+
+    def __init__(self, code, message):
+        """Initializes the error code and a human readable message."""
+        super().__init__(message)
+        self.code = code
+
+
+class GameSession:
+    """One hosted game: the QuoridorGame itself, the lock that keeps its moves in order (and orders close and watch
+    after them), the number of requests waiting on or holding that lock, when it was last used, whether it has been
+    closed, and the connections watching it with the event stream that feeds them."""
+
+    def __init__(self, game=None):
+        """Initializes the game (a new one if None), its lock, the pending request count and the time of last use
+        (None once the game's caches have been cleared for being idle). Watching is set up on the first watch."""
+        self.game = QuoridorGame() if game is None else game
+        self.lock = asyncio.Lock()
+        self.pending = 0
+        self.last_used = None
+        self.closed = False
+        self.watchers = None
+        self.events = None
+
+
+class EventStream:
+    """Async iterator over the events of a QuoridorGame (see QuoridorGame.add_listener), for use on an event loop:
+        async for event in EventStream(game): ...
+    Events are queued as the game reports them, from whichever thread made the move, and handed out on the loop
+    in order. The iteration ends once close is called."""
+
+    def __init__(self, game):
+        """Takes a QuoridorGame and starts listening to it. Must be called on the running event loop."""
+        self._game = game
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        game.add_listener(self.put)
+
+    def put(self, event):
+        """Listener given to the game. Queues the event from any thread."""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def close(self):
+        """Stops listening to the game and ends the iteration after the events already queued."""
+        self._game.remove_listener(self.put)
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+
+    def __aiter__(self):
+        """Returns the stream itself."""
+        return self
+
+    async def __anext__(self):
+        """Waits for the next event."""
+        event = await self._queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+def encode_event(game_id, event):
+    """Takes a game id and a game event and returns the line sent to watchers, as bytes."""
+    if isinstance(event, PawnMoved):
+        fields = {"game": game_id, "event": "pawn", "player": event.player,
+                  "from": move_to_notation(("p", event.start)), "to": move_to_notation(("p", event.end))}
+    elif isinstance(event, FencePlaced):
+        fields = {"game": game_id, "event": "fence", "player": event.player,
+                  "move": move_to_notation((event.direction, event.position)), "left": event.fences_remaining}
+    elif isinstance(event, TurnChanged):
+        fields = {"game": game_id, "event": "turn", "player": event.player}
+    elif isinstance(event, GameWon):
+        fields = {"game": game_id, "event": "won", "player": event.player}
+    else:
+        raise ValueError("unknown game event %r" % (event,))
+    return json.dumps(fields, separators=(",", ":")).encode() + b"\n"
+
+
+class QuoridorServer:
+    """Hosts QuoridorGame sessions for any number of connections. Pawn moves are quick and run on the event loop.
+    Fences (which run the fair play check) and AI moves run on a thread pool while the session's lock is held, so
+    the event loop never waits on them and moves to one game are always applied one at a time. """
+
+    def __init__(self, workers=4, ai_time_limit=0.2, store=None):
+        """Initializes the session table, the thread pool for slow work, the default AI time budget and the
+        QuoridorStore games are logged to, if any. Games in the store are recovered here."""
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._ai_time_limit = ai_time_limit
+        self._store = store
+        self._recovered = {}                # stored states of recovered games not used since the restart
+        if store is not None:
+            self._recovered = store.recover()
+            numbers = [int(game_id[1:]) for game_id in self._recovered if game_id[1:].isdigit()]
+            self._ids = itertools.count(max(numbers, default=0) + 1)
+
+    def get_session_count(self):
+        """Get method for the number of games being hosted."""
+        return len(self._sessions) + len(self._recovered)
+
+    def get_session(self, game_id):
+        """Returns the GameSession for a game id, rebuilding it from its stored state if it was recovered and has
+        not been used since, or None if there is no such game."""
+        session = self._sessions.get(game_id)
+        if session is None and game_id in self._recovered:
+            session = GameSession(QuoridorGame.from_bytes(self._recovered.pop(game_id)))
+            self._store.attach(game_id, session.game)
+            self._sessions[game_id] = session
+        return session
+
+    async def serve(self, host="127.0.0.1", port=7878, path=None):
+        """Starts listening on a Unix socket if a path is given, otherwise on TCP, and serves until cancelled."""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path=path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        sweeper = asyncio.ensure_future(self.sweep_idle())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+
+    async def sweep_idle(self, interval=IDLE_SECONDS):
+        """Every interval seconds, clears the path caches of the games that have not been used for that long, so
+        idle games only hold their positions while games being played keep their caches warm between moves."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            cutoff = loop.time() - interval
+            for session in list(self._sessions.values()):
+                if session.last_used is not None and session.last_used < cutoff and not session.pending:
+                    session.game.clear_caches()
+                    session.last_used = None
+
+    async def handle_connection(self, reader, writer):
+        """Reads request lines from one connection until it closes. Each request runs as its own task so slow
+        requests on one game do not hold up other games on the same connection."""
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.ensure_future(self.handle_line(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def handle_line(self, line, writer):
+        """Decodes one request line, runs it and writes back the reply line."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError(BAD_REQUEST, "request must be a JSON object")
+            request_id = request.get("id")
+            reply = await self.handle_request(request, writer)
+            reply["ok"] = True
+        except RequestError as error:
+            reply = {"ok": False, "code": error.code, "message": str(error)}
+        except ValueError as error:
+            reply = {"ok": False, "code": BAD_REQUEST, "message": str(error)}
+        except Exception as error:                  # keep the connection and its other games alive
+            log.exception("request %r failed", line)
+            reply = {"ok": False, "code": INTERNAL_ERROR, "message": "%s: %s" % (type(error).__name__, error)}
+        if request_id is not None:
+            reply["id"] = request_id
+        if not writer.is_closing():
+            writer.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+
+    async def handle_request(self, request, writer=None):
+        """Runs one decoded request from the connection with the given writer and returns the reply fields, or
+        raises RequestError."""
+        op = request.get("op")
+        if op == "new":
+            game_id = "g%d" % next(self._ids)
+            session = self._sessions[game_id] = GameSession()
+            if self._store is not None:
+                self._store.log_new(game_id)
+                self._store.attach(game_id, session.game)
+            return {"game": game_id, "turn": 1}
+        session = self.get_session(request.get("game")) if isinstance(request.get("game"), str) else None
+        if op not in ("move", "state", "legal", "ai", "close", "watch", "unwatch"):
+            raise RequestError(UNKNOWN_OP, "unknown op %r" % op)
+        if session is None:
+            raise RequestError(UNKNOWN_GAME, "no game %r" % request.get("game"))
+        if op == "unwatch":
+            if session.watchers is not None:
+                session.watchers.discard(writer)
+            return {}
+        session.pending += 1
+        async with session.lock:
+            try:
+                if session.closed:                  # closed while this request waited for the lock
+                    raise RequestError(UNKNOWN_GAME, "no game %r" % request["game"])
+                if op == "close":
+                    session.closed = True
+                    del self._sessions[request["game"]]
+                    if self._store is not None:
+                        self._store.log_close(request["game"])
+                    if session.events is not None:
+                        session.events.close()
+                    return {}
+                if op == "watch":
+                    self.watch(request["game"], session, writer)
+                elif op == "move":
+                    move = request.get("move")
+                    if not isinstance(move, str):
+                        raise RequestError(BAD_REQUEST, "move must be a string in notation")
+                    await self.play_move(session.game, request.get("player"), notation_to_move(move))
+                elif op == "ai":
+                    time_limit = request.get("time_limit", self._ai_time_limit)
+                    if type(time_limit) not in (int, float) or not 0 < time_limit < math.inf:
+                        raise RequestError(BAD_REQUEST, "time_limit must be a positive number of seconds")
+                    await self.play_ai(session.game, time_limit)
+                elif op == "legal":
+                    return self.legal_moves(session.game, request.get("player"))
+                return self.describe(session.game)
+            finally:
+                session.pending -= 1
+                session.last_used = asyncio.get_running_loop().time()
+
+    def watch(self, game_id, session, writer):
+        """Adds a connection's writer to a game's watchers, starting the game's event stream for the first one."""
+        if writer is None:
+            raise RequestError(BAD_REQUEST, "only a connection can watch a game")
+        if session.watchers is None:
+            session.watchers = set()
+        session.watchers.add(writer)
+        if session.events is None:
+            session.events = EventStream(session.game)
+            asyncio.ensure_future(self.broadcast(game_id, session))
+
+    async def broadcast(self, game_id, session):
+        """Encodes each event of a watched game once and writes it to every watcher, dropping closed connections,
+        until the game is closed."""
+        async for event in session.events:
+            line = encode_event(game_id, event)
+            for writer in list(session.watchers):
+                if writer.is_closing():
+                    session.watchers.discard(writer)
+                else:
+                    writer.write(line)
+
+    async def play_move(self, game, player_num, move):
+        """Plays a move for player_num, raising RequestError with the reason if it is refused. The reasons are
+        worked out up front so the game's own True / False / "breaks the fair play rule" results never reach the
+        client."""
+        if type(player_num) is not int or player_num not in (1, 2):
+            raise RequestError(BAD_REQUEST, "player must be 1 or 2")
+        if game.get_game_state().get_game_state() is not None:
+            raise RequestError(GAME_OVER, "the game has already been won")
+        if game.get_game_state().get_turn() != "P%d" % player_num:
+            raise RequestError(NOT_YOUR_TURN, "it is not P%d's turn" % player_num)
+        kind, coord_tuple = move
+        if kind == "p":
+            if game.move_pawn(player_num, coord_tuple) is not True:
+                raise RequestError(ILLEGAL_MOVE, "P%d cannot move to %s" % (player_num, move_to_notation(move)))
+            return
+        player = game.get_p1() if player_num == 1 else game.get_p2()
+        if player.get_fences_remaining() <= 0:
+            raise RequestError(NO_FENCES, "P%d has no fences left" % player_num)
+        if game.get_board().validate_fence(kind, coord_tuple) is not True:
+            raise RequestError(ILLEGAL_FENCE, "no room for a fence at %s" % move_to_notation(move))
+        result = await asyncio.get_running_loop().run_in_executor(self._executor, game.place_fence, player_num,
+                                                                  kind, coord_tuple)
+        if result is not True:
+            raise RequestError(FAIR_PLAY, "a fence at %s would cut a player off" % move_to_notation(move))
+
+    async def play_ai(self, game, time_limit):
+        """Lets the built-in AI play the side to move, on the thread pool."""
+        if game.get_game_state().get_game_state() is not None:
+            raise RequestError(GAME_OVER, "the game has already been won")
+        await asyncio.get_running_loop().run_in_executor(self._executor, QuoridorAI(time_limit, table_size=1 << 12)
+                                                         .play, game)
+
+    def legal_moves(self, game, player_num):
+        """Returns every legal move for player_num in notation."""
+        if type(player_num) is not int or player_num not in (1, 2):
+            raise RequestError(BAD_REQUEST, "player must be 1 or 2")
+        moves = [move_to_notation(("p", coord_tuple)) for coord_tuple in game.legal_pawn_moves(player_num)]
+        moves.extend(move_to_notation(fence) for fence in game.legal_fences(player_num))
+        return {"moves": moves}
+
+    def describe(self, game):
+        """Returns the reply fields describing a game's position."""
+        winner = game.get_game_state().get_game_state()
+        return {"turn": 1 if game.get_game_state().get_turn() == "P1" else 2,
+                "winner": 0 if winner is None else int(winner[1]),
+                "state": game.to_bytes().hex()}
+
+
+class LoadClient:
+    """One load generator connection. Requests carry ids so many games can share the connection, and a reader
+    task hands each reply to the coroutine waiting on it."""
+
+    def __init__(self, reader, writer):
+        """Initializes the stream pair, the reply futures by request id and the request counter."""
+        self._reader = reader
+        self._writer = writer
+        self._waiting = {}
+        self._ids = itertools.count(1)
+        self._reading = asyncio.ensure_future(self.read_replies())
+
+    async def read_replies(self):
+        """Hands each reply line to the future waiting on its id."""
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self._waiting.pop(reply.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+
+    async def request(self, **fields):
+        """Sends a request and waits for its reply."""
+        fields["id"] = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[fields["id"]] = future
+        self._writer.write(json.dumps(fields, separators=(",", ":")).encode() + b"\n")
+        return await future
+
+    async def close(self):
+        """Closes the connection."""
+        self._reading.cancel()
+        self._writer.close()
+
+
+def plan_game(seed, max_plies=200):
+    """Plays one random game locally and returns its moves as (player number, move in notation) pairs, for the
+    load generator to send as they are."""
+    game = QuoridorGame()
+    policy = RandomPolicy(seed, fence_chance=0.1)
+    plan = []
+    for _ in range(max_plies):
+        if game.get_game_state().get_game_state() is not None:
+            break
+        player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+        move = policy.choose_move(game)
+        plan.append((player_num, move_to_notation(move)))
+        if move[0] == "p":
+            game.move_pawn(player_num, move[1])
+        else:
+            game.place_fence(player_num, move[0], move[1])
+    return plan
+
+
+async def load_game(client, plan, latencies, think=0.0, delay=0.0):
+    """Waits delay seconds, then plays one planned game through the server, pausing think seconds before each move,
+    and records the latency of every move request in milliseconds."""
+    if delay:
+        await asyncio.sleep(delay)
+    game_id = (await client.request(op="new"))["game"]
+    for player_num, move in plan:
+        if think:
+            await asyncio.sleep(think)
+        start = time.perf_counter()
+        reply = await client.request(op="move", game=game_id, player=player_num, move=move)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not reply["ok"]:
+            raise RuntimeError("server refused %s: %s" % (move, reply))
+    await client.request(op="close", game=game_id)
+
+
+async def run_load(games, connections=16, host="127.0.0.1", port=7878, path=None, max_plies=200, seed=0, rate=None,
+                   think=0.0, workers=None):
+    """Plays games random games against a running server over the given number of connections and returns a
+    dictionary of move latency percentiles in milliseconds and moves per second. The games are worked out in
+    advance on a pool of worker processes, so the event loop that times the requests does nothing but send them.
+    With a rate, games start open loop at that many per second on average (exponential gaps), and not all at once;
+    think is the pause before each move."""
+    generator = random.Random(seed)
+    seeds = [generator.getrandbits(32) for _ in range(games)]
+    with ProcessPoolExecutor(workers) as executor:
+        plans = list(executor.map(plan_game, seeds, [max_plies] * games, chunksize=max(1, games // 64)))
+    clients = []
+    for _ in range(connections):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=1 << 20)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        clients.append(LoadClient(reader, writer))
+    latencies = []
+    delays = []
+    delay = 0.0
+    for _ in range(games):
+        delays.append(delay)
+        if rate:
+            delay += generator.expovariate(rate)
+    start = time.perf_counter()
+    await asyncio.gather(*(load_game(clients[index % connections], plans[index], latencies, think, delays[index])
+                           for index in range(games)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+    latencies.sort()
+    return {"games": games, "moves": len(latencies), "moves_per_s": round(len(latencies) / elapsed),
+            "p50_ms": round(latencies[len(latencies) // 2], 3),
+            "p99_ms": round(latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)], 3),
+            "max_ms": round(latencies[-1], 3)}
+
+
+def main(argv=None):
+    """Command line entry point: "serve" hosts games, "load" drives a running server and prints the latencies."""
+    parser = argparse.ArgumentParser(description="Quoridor match server and load generator.")
+    parser.add_argument("mode", choices=("serve", "load"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", default=None, help="Unix socket path to use instead of TCP")
+    parser.add_argument("--workers", type=int, default=4, help="threads for fences and AI moves")
+    parser.add_argument("--store", default=None, help="directory to keep games in across restarts")
+    parser.add_argument("--games", type=int, default=10000, help="games to play in load mode")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=None,
+                        help="games started per second in load mode (default: all at once)")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds of think time before each load move")
+    args = parser.parse_args(argv)
+    if args.mode == "serve":
+        logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+        store = None if args.store is None else QuoridorStore(args.store)
+        try:
+            asyncio.run(QuoridorServer(args.workers, store=store).serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if store is not None:
+                store.close()
+    else:
+        result = asyncio.run(run_load(args.games, args.connections, args.host, args.port, args.unix,
+                                      rate=args.rate, think=args.think))
+        print(json.dumps(result), file=sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Description: Opt-in instrumentation for the Quoridor engine. Set the QUORIDOR_STATS environment variable to 1 (or
+# call enable()) before Quoridor is imported and the hot methods are wrapped to count calls and record latency
+# histograms, and the fair play search counts how it was answered and how many squares it looked at. Otherwise the
+# timed decorator hands the method back unchanged and the counters sit behind one module flag test, so there is no
+# cost at all. Read the numbers with stats(), or export them in Prometheus text format with to_prometheus(),
+# write_prometheus(path) or serve_prometheus(port). The HTTP server modules are only imported by serve_prometheus,
+# since they would otherwise make up most of the engine's import time.
+
+import bisect
+import functools
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("QUORIDOR_STATS", "") not in ("", "0")
+
+# Upper bounds of the latency histogram buckets in seconds. The last bucket catches everything slower.
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 1e-1,
+           float("inf"))
+
+_timings = {}           # histogram by method name
+_counters = {}          # running total by event name
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Latency histogram for one method: a call count per bucket, plus the total count and total time."""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        """Initializes empty bucket counts and totals."""
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        """Adds one call that took the given number of seconds."""
+        with _lock:
+            self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def clear(self):
+        """Sets the bucket counts and totals back to zero. Callers hold _lock. The histogram is cleared in place
+        because each timed method keeps a reference to its own."""
+        self.counts[:] = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+
+def enable():
+    """Turns instrumentation on for methods decorated after this call, so it must run before Quoridor is imported.
+    Setting QUORIDOR_STATS=1 in the environment does the same."""
+    global ENABLED
+    ENABLED = True
+
+
+def timed(name):
+    """Decorator that records a latency histogram under name for each call of the method when instrumentation is
+    enabled, and otherwise returns the method itself untouched."""
+    def decorate(function):
+        if not ENABLED:
+            return function
+        histogram = _timings.setdefault(name, Histogram())
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name, amount=1):
+    """Adds amount to the named counter. Callers check ENABLED first so that nothing is paid when it is off."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def reset():
+    """Sets every histogram and counter back to zero."""
+    with _lock:
+        for histogram in _timings.values():
+            histogram.clear()
+        _counters.clear()
+
+
+def stats():
+    """Returns a snapshot of everything recorded so far as plain dictionaries: for each timed method its call count,
+    total seconds and cumulative count per bucket bound, and the value of each counter. """
+    with _lock:
+        timings = {}
+        for name, histogram in _timings.items():
+            cumulative = 0
+            buckets = {}
+            for bound, bucket_count in zip(BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                buckets[bound] = cumulative
+            timings[name] = {"count": histogram.count, "sum": histogram.sum, "buckets": buckets}
+        return {"enabled": ENABLED, "timings": timings, "counters": dict(_counters)}
+
+
+def to_prometheus():
+    """Returns the snapshot in the Prometheus text exposition format."""
+    snapshot = stats()
+    lines = ["# HELP quoridor_call_seconds Time spent in instrumented Quoridor engine methods.",
+             "# TYPE quoridor_call_seconds histogram"]
+    for name, timing in sorted(snapshot["timings"].items()):
+        for bound, bucket_count in timing["buckets"].items():
+            lines.append('quoridor_call_seconds_bucket{method="%s",le="%s"} %d'
+                         % (name, "+Inf" if bound == float("inf") else repr(bound), bucket_count))
+        lines.append('quoridor_call_seconds_sum{method="%s"} %r' % (name, timing["sum"]))
+        lines.append('quoridor_call_seconds_count{method="%s"} %d' % (name, timing["count"]))
+    lines.append("# HELP quoridor_events_total Quoridor engine event counters.")
+    lines.append("# TYPE quoridor_events_total counter")
+    for name, value in sorted(snapshot["counters"].items()):
+        lines.append('quoridor_events_total{event="%s"} %d' % (name, value))
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Writes the Prometheus text to a file, replacing it in one step so a collector never reads half a file (the
+    node exporter's textfile collector expects this)."""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as output:
+        output.write(to_prometheus())
+    os.replace(temporary, path)
+
+
+def serve_prometheus(port=9464, host="127.0.0.1"):
+    """Starts an HTTP endpoint for Prometheus to scrape on a background thread and returns the server, whose
+    shutdown method stops it."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Answers every GET with the Prometheus text."""
+
+        def do_GET(self):
+            """Sends the current metrics."""
+            body = to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Keeps scrapes out of the server's standard error."""
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
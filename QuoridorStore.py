@@ -0,0 +1,439 @@
+# Description: Durable store for live Quoridor sessions, so a server restart loses no games. Sessions are spread over
+# shards by game id, and every accepted move is appended to its shard's write-ahead log. Appends only add a record
+# to an in-memory batch; a committer thread writes each shard's batch and fsyncs it every few milliseconds (group
+# commit), so logging costs a move a few microseconds and one fsync covers every move of the interval. A crash loses
+# at most the moves of the last interval, and wait_durable blocks until everything appended so far is on disk.
+#
+# Each shard's log is a series of numbered segment files. Once a segment is full a new one is started and the old
+# ones are folded into the shard's snapshot on a background thread: the previous snapshot is loaded and the moves of
+# the segments are replayed onto it. The snapshot holds each live game's 21 byte QuoridorGame.to_bytes state, and
+# replay applies the moves straight to those packed fields, trusted and unvalidated since they were validated when
+# played, so no game objects or hashes are kept up to date (QuoridorGame.push would cost several times as much).
+# Since a snapshot is built from the log alone, never from games still being played, it is consistent with it.
+# Recovery does the same fold for every shard and hands back the states, from which sessions can be rebuilt as
+# they are first used. Segments are kept short so the tail left to replay at startup stays small.
+#     python QuoridorStore.py bench sessions/ --sessions 1000000
+#
+# Log record (little endian): the CRC-32 of the rest of the record, the op (new game, move or close), the game id's
+# length, the move code (QuoridorBook.encode_move) and the game id. Reading a log stops at the first torn or
+# corrupt record, which can only be the tail of the segment being written at a crash. Snapshot file: a header of
+# the magic bytes, the last segment folded in and the game count, then for each game the id's length, the id and
+# its state. Snapshots are written to a temporary file, fsynced and renamed into place, and the directory is fsynced
+# after each rename and each new segment so neither can be lost in a power cut.
+
+import argparse
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from Quoridor import BOARD_SIZE, FENCE_MASK_BYTES, GOAL_ROWS, STATE_BYTES, FencePlaced, PawnMoved, QuoridorGame
+from QuoridorBook import H_OFFSET, V_OFFSET, encode_move
+
+NEW, MOVE, CLOSE = 0, 1, 2
+RECORD = struct.Struct("<IBBH")             # CRC-32 of what follows, op, game id length, move code
+SNAPSHOT_MAGIC = b"QRDSNAP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQI")    # magic, last segment folded in, game count
+COMMIT_INTERVAL = 0.002                     # seconds between group commits
+SEGMENT_RECORDS = 1 << 16                   # records per log segment before it is folded into the snapshot
+MAX_ID_BYTES = 255                          # the id length is kept in one byte of each record
+OPENING = QuoridorGame().to_bytes()
+_GOAL_ROWS = (GOAL_ROWS["P1"], GOAL_ROWS["P2"])
+
+
+def read_log(path):
+    """Takes the path of a log segment and yields its (op, game id, move code) records in order, stopping at the
+    first torn or corrupt record."""
+    with open(path, "rb") as source:
+        data = source.read()
+    offset = 0
+    end = len(data)
+    while offset + RECORD.size <= end:
+        crc, op, id_length, code = RECORD.unpack_from(data, offset)
+        stop = offset + RECORD.size + id_length
+        if stop > end or zlib.crc32(data[offset + 4:stop]) != crc:
+            return
+        yield op, data[offset + RECORD.size:stop].decode(), code
+        offset = stop
+
+
+def read_snapshot(path):
+    """Takes the path of a shard snapshot and returns (last segment folded in, dictionary of states by game id), or
+    (0, {}) if there is no snapshot yet. Raises ValueError if the file is not a snapshot."""
+    if not os.path.exists(path):
+        return 0, {}
+    with open(path, "rb") as source:
+        data = source.read()
+    magic, segment, count = SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("%s is not a Quoridor session snapshot" % path)
+    states = {}
+    offset = SNAPSHOT_HEADER.size
+    for _ in range(count):
+        id_length = data[offset]
+        start = offset + 1 + id_length
+        states[data[offset + 1:start].decode()] = data[start:start + STATE_BYTES]
+        offset = start + STATE_BYTES
+    return segment, states
+
+
+def fsync_directory(directory):
+    """Fsyncs a directory, so that files created or renamed in it are still there after a power loss and not only
+    their data. Windows has no such call and does nothing."""
+    if os.name == "nt":
+        return
+    descriptor = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def write_snapshot(path, segment, states):
+    """Writes the states by game id to path as the snapshot of everything up to the given segment, replacing any
+    older snapshot in one step."""
+    parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, segment, len(states))]
+    for game_id, state in states.items():
+        encoded = game_id.encode()
+        parts.append(bytes((len(encoded),)) + encoded + state)
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as output:
+        output.write(b"".join(parts))
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary, path)
+    fsync_directory(os.path.dirname(path))
+
+
+def replay_state(state, codes):
+    """Takes a QuoridorGame.to_bytes state and a list of move codes and returns the state after those moves,
+    applied to the packed fields as QuoridorGame.push would play them: a pawn move sets the mover's square and wins
+    on their goal row, a fence sets its bit and spends one of the mover's fences, and the turn passes either way."""
+    turn = state[0] >> 7
+    squares = [state[0] & 0x7F, state[1] & 0x7F]
+    won = state[1] >> 7
+    v_fences = int.from_bytes(state[2:2 + FENCE_MASK_BYTES], "little")
+    h_fences = int.from_bytes(state[2 + FENCE_MASK_BYTES:2 + 2 * FENCE_MASK_BYTES], "little")
+    fences = [state[-1] & 0x0F, state[-1] >> 4]
+    for code in codes:
+        if code < V_OFFSET:
+            squares[turn] = code
+            if code // BOARD_SIZE == _GOAL_ROWS[turn]:
+                won = 1
+        elif code < H_OFFSET:
+            v_fences |= 1 << (code - V_OFFSET)
+            fences[turn] -= 1
+        else:
+            h_fences |= 1 << (code - H_OFFSET)
+            fences[turn] -= 1
+        turn ^= 1
+    return (bytes((squares[0] | turn << 7, squares[1] | won << 7)) +
+            v_fences.to_bytes(FENCE_MASK_BYTES, "little") + h_fences.to_bytes(FENCE_MASK_BYTES, "little") +
+            bytes((fences[0] | fences[1] << 4,)))
+
+
+def replay(states, records):
+    """Takes a dictionary of states by game id and an iterable of log records and brings the states up to date,
+    trusting every move. Each game's moves are gathered first and then applied in one go. A game id is added by a
+    new game record and removed by a close. Returns the states. """
+    moves = {}
+    for op, game_id, code in records:
+        if op == MOVE:
+            moves.setdefault(game_id, []).append(code)
+        elif op == NEW:
+            states[game_id] = OPENING
+            moves[game_id] = []
+        else:
+            states.pop(game_id, None)
+            moves.pop(game_id, None)
+    for game_id, codes in moves.items():
+        if codes and game_id in states:
+            states[game_id] = replay_state(states[game_id], codes)
+    return states
+
+
+class LogShard:
+    """One shard of the store: its pending batch of encoded records and the segment file being appended to."""
+
+    def __init__(self, directory, index):
+        """Initializes the shard's file names, an empty batch and no open segment."""
+        self.prefix = os.path.join(directory, "shard-%03d" % index)
+        self.snapshot_path = self.prefix + ".snap"
+        self.batch = []
+        self.segment = 0
+        self.records = 0
+        self.output = None
+
+    def segment_path(self, segment):
+        """Returns the file name of the numbered log segment."""
+        return "%s.%08d.log" % (self.prefix, segment)
+
+    def segments(self):
+        """Returns the numbers of the shard's log segments on disk, in order."""
+        directory, name = os.path.split(self.prefix)
+        numbers = []
+        for file_name in os.listdir(directory):
+            if file_name.startswith(name + ".") and file_name.endswith(".log"):
+                numbers.append(int(file_name[len(name) + 1:-4]))
+        return sorted(numbers)
+
+    def fold(self, last_segment):
+        """Folds every segment up to last_segment into the snapshot and deletes them. Returns the states."""
+        segment, states = read_snapshot(self.snapshot_path)
+        folded = [number for number in self.segments() if number <= last_segment]
+        for number in folded:
+            if number > segment:
+                replay(states, read_log(self.segment_path(number)))
+        if folded and folded[-1] > segment:
+            write_snapshot(self.snapshot_path, folded[-1], states)
+        for number in folded:
+            os.remove(self.segment_path(number))
+        return states
+
+    def start_segment(self, segment):
+        """Closes the segment being appended to, if any, and opens the numbered one, fsyncing the directory so the
+        new file's entry is as durable as the records later fsynced into it."""
+        if self.output is not None:
+            self.output.close()
+        self.segment = segment
+        self.records = 0
+        self.output = open(self.segment_path(segment), "ab")
+        fsync_directory(os.path.dirname(self.prefix))
+
+
+class QuoridorStore:
+    """Write-ahead log and snapshots for the games of one server, kept in a directory. Call recover once at startup
+    before logging anything; it returns the state of every live game and starts the committer thread. Then log each
+    game's creation, moves and closing, or attach the game to have its moves logged as they are played. """
+
+    def __init__(self, directory, shards=16, commit_interval=COMMIT_INTERVAL, segment_records=SEGMENT_RECORDS):
+        """Initializes the store in the directory, creating it if need be, with the given number of shards, time
+        between group commits and records per log segment."""
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._shards = [LogShard(directory, index) for index in range(shards)]
+        self._commit_interval = commit_interval
+        self._segment_records = segment_records
+        self._lock = threading.Lock()               # guards the batches and the appended count
+        self._committed = threading.Condition()
+        self._appended = 0
+        self._durable = 0
+        self._folding = []                          # (shard, last segment) waiting to be folded into snapshots
+        self._folder = None
+        self._committer = None
+        self._closed = False
+        self._error = None                          # what stopped the committer, if a write or fsync failed
+
+    def get_directory(self):
+        """Get method for the store's directory."""
+        return self._directory
+
+    def shard_of(self, game_id):
+        """Returns the LogShard a game id belongs to."""
+        return self._shards[zlib.crc32(game_id.encode()) % len(self._shards)]
+
+    def recover(self):
+        """Rebuilds the state of every live game from the snapshots and logs, folding all logs into the snapshots,
+        and starts logging to fresh segments. Returns a dictionary of QuoridorGame.to_bytes states by game id;
+        QuoridorGame.from_bytes turns one back into a game. """
+        states = {}
+        for shard in self._shards:
+            segments = shard.segments()
+            last = segments[-1] if segments else 0
+            states.update(shard.fold(last))
+            shard.start_segment(max(last, read_snapshot(shard.snapshot_path)[0]) + 1)
+        self._committer = threading.Thread(target=self.commit_loop, daemon=True)
+        self._committer.start()
+        self._folder = threading.Thread(target=self.fold_loop, daemon=True)
+        self._folder.start()
+        return states
+
+    def append(self, op, game_id, code=0):
+        """Adds one record to its shard's batch and returns its sequence number, which wait_durable takes. The
+        record reaches the disk at the next group commit. Once a commit has failed the store takes no more records
+        and this raises the commit's error."""
+        encoded = game_id.encode()
+        body = struct.pack("<BBH", op, len(encoded), code) + encoded
+        record = struct.pack("<I", zlib.crc32(body)) + body
+        shard = self.shard_of(game_id)
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+            shard.batch.append(record)
+            self._appended += 1
+            return self._appended
+
+    def log_new(self, game_id):
+        """Logs a new game starting from the opening position. Raises ValueError if the game id is longer than
+        MAX_ID_BYTES once encoded as UTF-8, since no record could hold it."""
+        if len(game_id.encode()) > MAX_ID_BYTES:
+            raise ValueError("game id %r is longer than %d bytes" % (game_id, MAX_ID_BYTES))
+        return self.append(NEW, game_id)
+
+    def log_move(self, game_id, move):
+        """Logs a (kind, coordinates tuple) move already accepted by the game."""
+        return self.append(MOVE, game_id, encode_move(move))
+
+    def log_close(self, game_id):
+        """Logs that a game is over and no longer needs to be kept."""
+        return self.append(CLOSE, game_id)
+
+    def attach(self, game_id, game):
+        """Takes a game id and its QuoridorGame and logs every move the game accepts from now on, through a game
+        listener. Returns the listener, which QuoridorGame.remove_listener takes to stop logging."""
+        def listener(event):
+            if isinstance(event, PawnMoved):
+                self.append(MOVE, game_id, encode_move(("p", event.end)))
+            elif isinstance(event, FencePlaced):
+                self.append(MOVE, game_id, encode_move((event.direction, event.position)))
+        game.add_listener(listener)
+        return listener
+
+    def wait_durable(self, sequence=None):
+        """Blocks until the record with the given sequence number, or everything appended so far if None, has been
+        written and fsynced. Raises the commit's error if a commit failed before that record was durable."""
+        if sequence is None:
+            sequence = self._appended
+        with self._committed:
+            while self._durable < sequence and not self._closed and self._error is None:
+                self._committed.wait()
+            if self._durable < sequence and self._error is not None:
+                raise self._error
+
+    def commit(self):
+        """Writes and fsyncs every shard's pending batch, starting a new segment for any that has filled its
+        current one and handing the old ones to the fold thread. Returns the number of records committed."""
+        with self._lock:
+            batches = [(shard, shard.batch) for shard in self._shards if shard.batch]
+            for shard, _ in batches:
+                shard.batch = []
+            appended = self._appended
+        for shard, batch in batches:
+            shard.output.write(b"".join(batch))
+            shard.output.flush()
+            os.fsync(shard.output.fileno())
+            shard.records += len(batch)
+            if shard.records >= self._segment_records:
+                shard.start_segment(shard.segment + 1)
+                with self._committed:
+                    self._folding.append((shard, shard.segment - 1))
+                    self._committed.notify_all()
+        with self._committed:
+            self._durable = appended
+            self._committed.notify_all()
+        return sum(len(batch) for _, batch in batches)
+
+    def commit_loop(self):
+        """Runs on the committer thread: a group commit every commit interval until the store is closed or a commit
+        fails. A failed commit's error is kept for append and wait_durable to raise, and its waiters are woken."""
+        while not self._closed:
+            time.sleep(self._commit_interval)
+            try:
+                self.commit()
+            except Exception as error:
+                with self._lock, self._committed:
+                    self._error = error
+                    self._committed.notify_all()
+                return
+
+    def fold_loop(self):
+        """Runs on the fold thread: folds full segments into their shard's snapshot as the committer hands them
+        over."""
+        while True:
+            with self._committed:
+                while not self._folding and not self._closed:
+                    self._committed.wait()
+                if not self._folding:
+                    return
+                shard, last_segment = self._folding.pop(0)
+            shard.fold(last_segment)
+
+    def close(self):
+        """Commits what is pending, stops the committer and fold threads and closes the segment files. Raises the
+        committer's error, after closing everything, if a commit failed."""
+        if self._committer is None:
+            return
+        self._closed = True
+        self._committer.join()
+        if self._error is None:
+            self.commit()
+        with self._committed:
+            self._committed.notify_all()
+        self._folder.join()
+        for shard in self._shards:
+            shard.output.close()
+        self._committer = None
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        """Lets the store be used in a with statement."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Closes the store at the end of a with statement."""
+        self.close()
+
+
+def bench(directory, sessions, moves_per_session, shards, seed=0):
+    """Logs the given number of sessions with random legal pawn moves, then recovers them, and returns a dictionary
+    of append latency percentiles in microseconds and the recovery time in seconds."""
+    generator = random.Random(seed)
+    game = QuoridorGame()
+    store = QuoridorStore(directory, shards)
+    store.recover()
+    latencies = []
+    perf_counter = time.perf_counter
+    for session in range(sessions):
+        game_id = "g%d" % session
+        game.reset()
+        start = perf_counter()
+        store.log_new(game_id)
+        latencies.append(perf_counter() - start)
+        for _ in range(moves_per_session):
+            turn = 1 if game.get_game_state().get_turn() == "P1" else 2
+            moves = game.legal_pawn_moves(turn)
+            if not moves:
+                break
+            move = ("p", moves[generator.randrange(len(moves))])
+            game.push(move)
+            start = perf_counter()
+            store.log_move(game_id, move)
+            latencies.append(perf_counter() - start)
+    store.close()
+    start = perf_counter()
+    store = QuoridorStore(directory, shards)
+    recovered = len(store.recover())
+    elapsed = perf_counter() - start
+    store.close()
+    latencies.sort()
+    return {"sessions": recovered, "records": len(latencies),
+            "append_p50_us": round(latencies[len(latencies) // 2] * 1e6, 2),
+            "append_p99_us": round(latencies[len(latencies) * 99 // 100] * 1e6, 2),
+            "recover_s": round(elapsed, 2)}
+
+
+def main(argv=None):
+    """Command line entry point: "recover" reports what a store directory holds, "bench" measures logging and
+    recovery in a scratch directory."""
+    parser = argparse.ArgumentParser(description="Quoridor session store tools.")
+    parser.add_argument("mode", choices=("recover", "bench"))
+    parser.add_argument("directory")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=100000, help="sessions to log in bench mode")
+    parser.add_argument("--moves", type=int, default=10, help="moves per session in bench mode")
+    args = parser.parse_args(argv)
+    if args.mode == "bench":
+        print(bench(args.directory, args.sessions, args.moves, args.shards))
+        return
+    start = time.perf_counter()
+    with QuoridorStore(args.directory, args.shards) as store:
+        states = store.recover()
+    print("recovered %d sessions in %.2f s" % (len(states), time.perf_counter() - start), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# Description: Engine tournament runner for accepting engine changes. Two engines play pairs of games from the same
+# random opening with colours swapped, so neither side's luck with the opening or the first move counts. Pairs are
+# played across a pool of worker processes, each reusing one QuoridorGame, and every finished pair is fed to a
+# sequential probability ratio test (SPRT) that stops the match as soon as it is settled whether the first engine is
+# elo1 stronger than the second or no better than elo0. Run as a script:
+#     python QuoridorTournament.py alphabeta:0.1 alphabeta:0.05 --elo0 0 --elo1 30 --workers 8
+# It reports the Elo difference with a 95% error bar, the SPRT verdict and, per engine, nodes per second (for
+# engines that count nodes) and move time percentiles.
+#
+# The test treats each pair's score (0, 0.5, ..., 2 points out of 2, as 0 to 1) as one sample and uses the normal
+# approximation of the generalized SPRT, as chess engine testing frameworks do: LLR = N (s1 - s0) (2 m - s0 - s1) /
+# (2 v), where m and v are the mean and variance of the pair scores and s0, s1 the expected scores at elo0 and
+# elo1. Pair scores have a smaller variance than single games, so settling takes fewer games. The variance is taken
+# as if one lost and one won pair had been played as well, so that a match one engine wins every pair of still
+# settles.
+
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+import time
+
+from Quoridor import QuoridorGame
+from QuoridorSelfPlay import POLICIES, RandomPolicy
+
+OPENING_PLIES = 4           # random plies played before the engines take over, the same for both games of a pair
+DRAW_SCORE = 0.5            # score of a game stopped at max_plies
+
+_worker = {}                # per process: the reusable game, both engines and the match settings
+
+
+def elo_to_score(elo):
+    """Takes an Elo difference and returns the expected score of the stronger side, between 0 and 1."""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def score_to_elo(score):
+    """Takes a score between 0 and 1 and returns the Elo difference it implies, infinite at either end."""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def parse_engine(spec):
+    """Takes an engine as given on the command line, a policy name from QuoridorSelfPlay.POLICIES with an optional
+    ":seconds" time limit per move, and returns (name, time limit). Raises ValueError for an unknown policy."""
+    name, _, time_limit = spec.partition(":")
+    if name not in POLICIES:
+        raise ValueError("unknown engine %r, expected one of %s" % (name, ", ".join(sorted(POLICIES))))
+    return name, float(time_limit) if time_limit else 0.05
+
+
+class SPRT:
+    """Sequential probability ratio test between two hypotheses about the Elo difference, elo0 (H0) and elo1 (H1),
+    with false positive rate alpha and false negative rate beta. Pair scores are added one at a time and get_result
+    says once either hypothesis is accepted."""
+
+    def __init__(self, elo0=0.0, elo1=20.0, alpha=0.05, beta=0.05):
+        """Initializes the hypotheses, the log likelihood ratio bounds and empty score sums."""
+        self._score0 = elo_to_score(elo0)
+        self._score1 = elo_to_score(elo1)
+        self._lower = math.log(beta / (1 - alpha))
+        self._upper = math.log((1 - beta) / alpha)
+        self._count = 0
+        self._total = 0.0
+        self._squares = 0.0
+
+    def add(self, score):
+        """Adds one pair's score, from 0 to 1."""
+        self._count += 1
+        self._total += score
+        self._squares += score * score
+
+    def get_count(self):
+        """Get method for the number of pair scores added."""
+        return self._count
+
+    def get_bounds(self):
+        """Returns the (lower, upper) log likelihood ratio bounds: H0 is accepted below the first and H1 above the
+        second."""
+        return self._lower, self._upper
+
+    def get_mean(self):
+        """Returns the mean pair score, 0.5 before any are added."""
+        return self._total / self._count if self._count else 0.5
+
+    def get_variance(self):
+        """Returns the variance of the pair scores, counting one extra pair scoring 0 and one scoring 1 so that it
+        is never 0."""
+        mean = (self._total + 1) / (self._count + 2)
+        return max((self._squares + 1) / (self._count + 2) - mean * mean, 0.0)
+
+    def get_llr(self):
+        """Returns the log likelihood ratio of H1 against H0 so far."""
+        variance = self.get_variance()
+        return (self._count * (self._score1 - self._score0) * (2 * self.get_mean() - self._score0 - self._score1) /
+                (2 * variance))
+
+    def get_result(self):
+        """Returns "H1" if elo1 is accepted, "H0" if elo0 is, or None while the test goes on."""
+        llr = self.get_llr()
+        if llr >= self._upper:
+            return "H1"
+        if llr <= self._lower:
+            return "H0"
+        return None
+
+    def get_elo(self):
+        """Returns (Elo difference, low, high): the Elo the mean score implies and the bounds of its 95% confidence
+        interval, from the standard error of the pair scores."""
+        mean = self.get_mean()
+        margin = 1.96 * math.sqrt(self.get_variance() / self._count) if self._count else 0.0
+        return score_to_elo(mean), score_to_elo(mean - margin), score_to_elo(mean + margin)
+
+
+class EngineStats:
+    """Running totals for one engine: moves played, nodes searched, seconds spent choosing and each move's time in
+    milliseconds."""
+
+    def __init__(self):
+        """Initializes empty totals."""
+        self._moves = 0
+        self._nodes = 0
+        self._seconds = 0.0
+        self._move_ms = []
+
+    def add(self, moves, nodes, seconds, move_ms):
+        """Adds the totals and move times of one or more games."""
+        self._moves += moves
+        self._nodes += nodes
+        self._seconds += seconds
+        self._move_ms.extend(move_ms)
+
+    def summary(self):
+        """Returns a dictionary of the engine's moves, nodes per second (None for engines that do not count nodes)
+        and mean, median, 95th percentile and slowest move times in milliseconds."""
+        times = sorted(self._move_ms)
+        if not times:
+            return {"moves": 0}
+        return {"moves": self._moves,
+                "nps": round(self._nodes / self._seconds) if self._nodes and self._seconds else None,
+                "mean_ms": round(sum(times) / len(times), 3),
+                "p50_ms": round(times[len(times) // 2], 3),
+                "p95_ms": round(times[min(len(times) - 1, len(times) * 95 // 100)], 3),
+                "max_ms": round(times[-1], 3)}
+
+
+def init_worker(engines, seed, max_plies, opening_plies):
+    """Builds the reusable game and both engines once per worker process. engines is a pair of (name, time limit)
+    pairs."""
+    _worker["game"] = QuoridorGame()
+    _worker["engines"] = tuple(POLICIES[name](seed + index, time_limit)
+                               for index, (name, time_limit) in enumerate(engines))
+    _worker["seed"] = seed
+    _worker["max_plies"] = max_plies
+    _worker["opening_plies"] = opening_plies
+
+
+def play_game(opening, engines):
+    """Plays one game in this worker from the opening moves with engines[0] as P1 and engines[1] as P2. Returns
+    P1's score (1, 0 or DRAW_SCORE for a game stopped at max_plies) and, per engine, [moves, nodes, seconds, move
+    times in milliseconds]. An engine that returns no move or an illegal one loses. """
+    game = _worker["game"]
+    game.reset()
+    for move in opening:
+        game.push(move)
+    state = game.get_game_state()
+    stats = [[0, 0, 0.0, []], [0, 0, 0.0, []]]
+    plies = len(opening)
+    while state.get_game_state() is None and plies < _worker["max_plies"]:
+        player_num = 1 if state.get_turn() == "P1" else 2
+        engine = engines[player_num - 1]
+        start = time.perf_counter()
+        move = engine.choose_move(game)
+        elapsed = time.perf_counter() - start
+        engine_stats = stats[player_num - 1]
+        engine_stats[0] += 1
+        engine_stats[1] += engine.get_nodes() if hasattr(engine, "get_nodes") else 0
+        engine_stats[2] += elapsed
+        engine_stats[3].append(round(elapsed * 1000, 3))
+        if move is None:
+            accepted = False
+        elif move[0] == "p":
+            accepted = game.move_pawn(player_num, move[1])
+        else:
+            accepted = game.place_fence(player_num, move[0], move[1])
+        if accepted is not True:
+            return (0.0 if player_num == 1 else 1.0), stats
+        plies += 1
+    winner = state.get_game_state()
+    if winner is None:
+        return DRAW_SCORE, stats
+    return (1.0 if winner == "P1" else 0.0), stats
+
+
+def play_pair(pair_index):
+    """Plays one pair of games in this worker from the same random opening, the first engine taking P1 in the first
+    game and P2 in the second. Returns the pair index, the first engine's score out of 1 over both games and each
+    engine's [moves, nodes, seconds, move times] over both."""
+    generator = RandomPolicy(_worker["seed"] * 1000003 + pair_index, fence_chance=0.0)
+    game = _worker["game"]
+    game.reset()
+    opening = []
+    for _ in range(_worker["opening_plies"]):
+        if game.get_game_state().get_game_state() is not None:
+            break
+        move = generator.choose_move(game)
+        if move is None:
+            break
+        game.push(move)
+        opening.append(move)
+    first, second = _worker["engines"]
+    score_a, stats_a = play_game(opening, (first, second))
+    score_b, stats_b = play_game(opening, (second, first))
+    totals = []
+    for mine, swapped in ((stats_a[0], stats_b[1]), (stats_a[1], stats_b[0])):
+        totals.append([mine[0] + swapped[0], mine[1] + swapped[1], mine[2] + swapped[2], mine[3] + swapped[3]])
+    return pair_index, (score_a + 1.0 - score_b) / 2, totals
+
+
+def run_tournament(engine1, engine2, max_pairs=5000, workers=1, seed=0, elo0=0.0, elo1=20.0, alpha=0.05,
+                   beta=0.05, max_plies=300, opening_plies=OPENING_PLIES, output=None, progress=None):
+    """Plays pairs of games between two engines, each a (name, time limit) pair, until the SPRT settles or
+    max_pairs pairs have been played, and returns a summary dictionary: pairs and games played, the first engine's
+    wins, draws and losses, its Elo over the second with a 95% interval, the SPRT verdict and log likelihood ratio,
+    and the stats of both engines. Each finished pair is written to the output file object as one JSON line if one
+    is given, and progress is called with the SPRT after each pair if given. Pairs still running when the test
+    settles are abandoned. """
+    sprt = SPRT(elo0, elo1, alpha, beta)
+    stats = (EngineStats(), EngineStats())
+    points = {0.0: 0, 0.25: 0, 0.5: 0, 0.75: 0, 1.0: 0}       # pairs by the first engine's score
+    arguments = ((engine1, engine2), seed, max_plies, opening_plies)
+    if workers <= 1:
+        init_worker(*arguments)
+        results = map(play_pair, range(max_pairs))
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=arguments)
+        results = pool.imap_unordered(play_pair, range(max_pairs))
+    result = None
+    try:
+        for pair_index, score, totals in results:
+            sprt.add(score)
+            points[score] = points.get(score, 0) + 1
+            for engine_stats, total in zip(stats, totals):
+                engine_stats.add(*total)
+            if output is not None:
+                output.write(json.dumps({"pair": pair_index, "score": score}, separators=(",", ":")) + "\n")
+            if progress is not None:
+                progress(sprt)
+            result = sprt.get_result()
+            if result is not None:
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    elo, low, high = sprt.get_elo()
+    return {"engines": ["%s:%g" % engine1, "%s:%g" % engine2],
+            "pairs": sprt.get_count(),
+            "games": 2 * sprt.get_count(),
+            "pentanomial": [points[key] for key in sorted(points)],
+            "score": round(sprt.get_mean(), 4),
+            "elo": round(elo, 1), "elo_low": round(low, 1), "elo_high": round(high, 1),
+            "sprt": {"result": result, "llr": round(sprt.get_llr(), 3),
+                     "bounds": [round(bound, 3) for bound in sprt.get_bounds()], "elo0": elo0, "elo1": elo1},
+            "stats": [stats[0].summary(), stats[1].summary()]}
+
+
+def main(argv=None):
+    """Command line entry point for engine matches."""
+    parser = argparse.ArgumentParser(description="Play an SPRT match between two Quoridor engines.")
+    parser.add_argument("engine1", type=parse_engine, help="engine under test, e.g. alphabeta:0.1")
+    parser.add_argument("engine2", type=parse_engine, help="baseline engine, e.g. alphabeta:0.05")
+    parser.add_argument("--elo0", type=float, default=0.0, help="Elo gain of H0")
+    parser.add_argument("--elo1", type=float, default=20.0, help="Elo gain of H1")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--max-pairs", type=int, default=5000, help="pairs to play at most if the SPRT never settles")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-plies", type=int, default=300)
+    parser.add_argument("--opening-plies", type=int, default=OPENING_PLIES)
+    parser.add_argument("--output", default=None, help="JSONL file for each pair's score")
+    args = parser.parse_args(argv)
+
+    def progress(sprt):
+        if sprt.get_count() % 50 == 0:
+            print("%d pairs, LLR %.2f (%.2f, %.2f)" % ((sprt.get_count(), sprt.get_llr()) + sprt.get_bounds()),
+                  file=sys.stderr)
+
+    start = time.perf_counter()
+    arguments = (args.engine1, args.engine2, args.max_pairs, args.workers, args.seed, args.elo0, args.elo1,
+                 args.alpha, args.beta, args.max_plies, args.opening_plies)
+    if args.output is None:
+        summary = run_tournament(*arguments, progress=progress)
+    else:
+        with open(args.output, "w") as output:
+            summary = run_tournament(*arguments, output=output, progress=progress)
+    summary["seconds"] = round(time.perf_counter() - start, 1)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
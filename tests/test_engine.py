@@ -0,0 +1,315 @@
+# Description: Tests of the QuoridorGame engine rules against hand-built positions: pawn moves (occupied targets,
+# jumps, diagonal side steps, fences and the board edge), fence slots, fair play, wins, push / pop with the Zobrist
+# hashes, the packed to_bytes form, symmetric positions, four player games and Position snapshots. Squares are
+# written as (x, y) with P1 starting at (4, 0) and racing to row 8. Run with python -m unittest or pytest from the
+# repository root.
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Quoridor import QuoridorGame, transform_state  # noqa: E402
+
+
+def square(coord_tuple, size=9):
+    """Returns the square index of an (x, y) point."""
+    return coord_tuple[1] * size + coord_tuple[0]
+
+
+def fence_masks(game, fences):
+    """Takes a game and a list of (direction, (x, y)) fences and returns their (vertical, horizontal) masks."""
+    tables = game.get_tables()
+    masks = {"v": 0, "h": 0}
+    for direction, coord_tuple in fences:
+        masks[direction] |= 1 << tables.fence_slot(direction, coord_tuple)
+    return masks["v"], masks["h"]
+
+
+def two_player_game(p1, p2, fences=(), turn=1, fences_left=(10, 10)):
+    """Returns a standard game with P1 and P2 on the given points, the given fences placed and turn to move. The
+    fence counts default to a full hand each, whatever is on the board."""
+    game = QuoridorGame()
+    v_fences, h_fences = fence_masks(game, fences)
+    game.set_state((square(p1), square(p2), v_fences, h_fences) + tuple(fences_left) + (turn, 0))
+    return game
+
+
+def pawn_targets(game, player_num):
+    """Returns the set of points validate_pawn accepts for a player, trying every square on the board and a ring
+    of points off it."""
+    board = game.get_board()
+    player = game.get_player(player_num)
+    return {(x_coord, y_coord) for x_coord in range(-2, 11) for y_coord in range(-2, 11)
+            if board.validate_pawn(player, (x_coord, y_coord))}
+
+
+class PawnMoveTest(unittest.TestCase):
+    """validate_pawn and legal_pawn_moves on hand-built positions."""
+
+    def assertTargets(self, game, player_num, expected):
+        """Checks validate_pawn and legal_pawn_moves both give exactly the expected points."""
+        self.assertEqual(pawn_targets(game, player_num), set(expected))
+        self.assertEqual(set(game.legal_pawn_moves(player_num)), set(expected))
+
+    def test_opening(self):
+        """From the opening P1 may step left, right or forward, and not off the board or diagonally."""
+        game = QuoridorGame()
+        self.assertTargets(game, 1, {(3, 0), (5, 0), (4, 1)})
+        self.assertIs(game.get_board().validate_pawn(game.get_p1(), (5, 1)), False)
+        self.assertIs(game.get_board().validate_pawn(game.get_p1(), (4, -1)), False)
+
+    def test_fence_blocks_step(self):
+        """A horizontal fence along the top of (4, 1) stops P1 stepping up from (4, 0)."""
+        game = two_player_game((4, 0), (4, 8), [("h", (4, 1))])
+        self.assertTargets(game, 1, {(3, 0), (5, 0)})
+
+    def test_jump_over_adjacent_pawn(self):
+        """A pawn facing another may not move onto it but jumps straight over it, and may not side step."""
+        game = two_player_game((4, 4), (4, 5))
+        self.assertTargets(game, 1, {(3, 4), (5, 4), (4, 3), (4, 6)})
+
+    def test_side_step_when_fence_behind(self):
+        """With a fence behind the faced pawn the jump is closed and both diagonal side steps open."""
+        game = two_player_game((4, 4), (4, 5), [("h", (4, 6))])
+        self.assertTargets(game, 1, {(3, 4), (5, 4), (4, 3), (3, 5), (5, 5)})
+
+    def test_side_step_when_edge_behind(self):
+        """The board edge behind the faced pawn closes the jump like a fence."""
+        game = two_player_game((4, 0), (4, 1), turn=2)
+        self.assertTargets(game, 2, {(3, 1), (5, 1), (4, 2), (3, 0), (5, 0)})
+
+    def test_side_step_blocked_by_fence_beside(self):
+        """A fence beside the faced pawn closes the side step on that side only."""
+        game = two_player_game((4, 4), (4, 5), [("h", (4, 6)), ("v", (4, 5))])
+        self.assertTargets(game, 1, {(3, 4), (5, 4), (4, 3), (5, 5)})
+
+    def test_no_jump_through_fence(self):
+        """A fence between the two pawns stops both the step and the jump."""
+        game = two_player_game((4, 4), (4, 5), [("h", (4, 5))])
+        self.assertTargets(game, 1, {(3, 4), (5, 4), (4, 3)})
+
+    def test_move_pawn_and_win(self):
+        """move_pawn refuses an illegal move and the wrong player, and reaching the goal row wins."""
+        game = two_player_game((4, 7), (0, 0))
+        self.assertFalse(game.move_pawn(1, (4, 5)))
+        self.assertFalse(game.move_pawn(2, (1, 0)))
+        self.assertIs(game.move_pawn(1, (4, 8)), True)
+        self.assertEqual(game.get_game_state().get_game_state(), "P1")
+        self.assertTrue(game.is_winner(1))
+        self.assertFalse(game.move_pawn(2, (1, 0)))
+
+
+class FenceTest(unittest.TestCase):
+    """validate_fence, place_fence, remove_fence and fair play."""
+
+    def test_slots(self):
+        """Fences must lie inside the board: no vertical fence on the left edge and no horizontal one on the top."""
+        board = QuoridorGame().get_board()
+        for direction, coord_tuple in (("v", (0, 3)), ("v", (9, 3)), ("h", (3, 0)), ("h", (3, 9)), ("v", (4, -1))):
+            self.assertIs(board.validate_fence(direction, coord_tuple), False, (direction, coord_tuple))
+        for direction, coord_tuple in (("v", (1, 0)), ("v", (8, 8)), ("h", (0, 1)), ("h", (8, 8))):
+            self.assertIs(board.validate_fence(direction, coord_tuple), True, (direction, coord_tuple))
+
+    def test_place_and_remove(self):
+        """A placed fence takes its slot, leaves every other slot open and is undone exactly by remove_fence."""
+        game = QuoridorGame()
+        board = game.get_board()
+        before = (board.get_v_fences(), board.get_h_fences(), board.get_blocked())
+        board.place_fence("v", (4, 4))
+        self.assertIs(board.validate_fence("v", (4, 4)), False)
+        self.assertIs(board.validate_fence("h", (4, 4)), True)              # slots along other edges stay open
+        self.assertIs(board.validate_fence("v", (4, 5)), True)
+        self.assertIs(board.validate_fence("v", (5, 4)), True)
+        board.remove_fence("v", (4, 4))
+        self.assertEqual((board.get_v_fences(), board.get_h_fences(), board.get_blocked()), before)
+
+    def test_place_fence_counts_and_turns(self):
+        """place_fence spends one of the player's fences, passes the turn and refuses a taken slot."""
+        game = QuoridorGame()
+        self.assertIs(game.place_fence(1, "h", (4, 4)), True)
+        self.assertEqual(game.get_p1().get_fences_remaining(), 9)
+        self.assertEqual(game.get_game_state().get_turn(), "P2")
+        self.assertFalse(game.place_fence(2, "h", (4, 4)))
+        self.assertFalse(game.place_fence(1, "h", (5, 4)))                 # not P1's turn
+
+    def test_fair_play(self):
+        """A fence that would shut a pawn in is refused and leaves the game as it was."""
+        game = two_player_game((0, 0), (4, 8), [("v", (1, 0))])
+        board = game.get_board()
+        self.assertIs(board.fair_play(game.get_p1()), True)
+        state = game.get_state()
+        self.assertEqual(game.place_fence(1, "h", (0, 1)), "breaks the fair play rule")
+        self.assertEqual(game.get_state(), state)
+        board.place_fence("h", (0, 1))
+        self.assertIs(board.fair_play(game.get_p1()), False)
+        self.assertIs(board.fair_play(game.get_p2()), True)
+        board.remove_fence("h", (0, 1))
+        self.assertIs(board.fair_play(game.get_p1()), True)
+        self.assertNotIn(("h", (0, 1)), game.legal_fences(1))
+
+    def test_fair_play_after_cached_path(self):
+        """Fair play stays right when fences land on and off the path it cached for a pawn."""
+        game = two_player_game((4, 0), (4, 8), [("h", (x_coord, 4)) for x_coord in range(8)])
+        board = game.get_board()
+        self.assertIs(board.fair_play(game.get_p1()), True)                 # the only gap is at (8, 4)
+        board.place_fence("h", (0, 2))
+        self.assertIs(board.fair_play(game.get_p1()), True)
+        board.place_fence("h", (8, 4))
+        self.assertIs(board.fair_play(game.get_p1()), False)
+        board.remove_fence("h", (8, 4))
+        self.assertIs(board.fair_play(game.get_p1()), True)
+
+
+class PushPopTest(unittest.TestCase):
+    """The push / pop move stack and the Zobrist hashes it keeps."""
+
+    def test_push_pop_restores(self):
+        """Pushing random legal moves keeps the hash equal to one computed from scratch, and popping them all
+        restores the position and hash."""
+        generator = random.Random(5)
+        game = QuoridorGame()
+        start = (game.get_state(), game.get_hash(), game.get_canonical_hash())
+        pushed = 0
+        while pushed < 60 and game.get_game_state().get_game_state() is None:
+            player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+            moves = [("p", coord_tuple) for coord_tuple in game.legal_pawn_moves(player_num)]
+            moves.extend(game.legal_fences(player_num)[:20])
+            game.push(generator.choice(moves))
+            pushed += 1
+            self.assertEqual(game.get_hash(), game.compute_hash())
+        for _ in range(pushed):
+            game.pop()
+        self.assertEqual((game.get_state(), game.get_hash(), game.get_canonical_hash()), start)
+
+    def test_push_matches_validated_moves(self):
+        """push reaches the same position and hash as move_pawn and place_fence, including a win."""
+        pushed = two_player_game((4, 6), (4, 2))
+        played = two_player_game((4, 6), (4, 2))
+        for move in (("h", (4, 3)), ("v", (5, 6)), ("p", (4, 7)), ("p", (3, 2)), ("p", (4, 8))):
+            pushed.push(move)
+            player_num = 1 if played.get_game_state().get_turn() == "P1" else 2
+            if move[0] == "p":
+                self.assertIs(played.move_pawn(player_num, move[1]), True)
+            else:
+                self.assertIs(played.place_fence(player_num, move[0], move[1]), True)
+            self.assertEqual(pushed.get_state(), played.get_state())
+            self.assertEqual(pushed.get_hash(), played.get_hash())
+        self.assertTrue(pushed.is_winner(1))
+
+
+class EncodingTest(unittest.TestCase):
+    """to_bytes and from_bytes."""
+
+    def test_round_trip(self):
+        """Hand-built positions, including a won one, survive to_bytes and from_bytes with their hashes."""
+        games = [QuoridorGame(),
+                 two_player_game((4, 4), (4, 5), [("h", (4, 6)), ("v", (1, 1))], turn=2, fences_left=(9, 9)),
+                 two_player_game((0, 8), (8, 1), [("v", (8, 8))], turn=2, fences_left=(10, 9))]
+        games[-1].set_state(games[-1].get_state()[:-1] + (1,))
+        for game in games:
+            data = game.to_bytes()
+            self.assertEqual(len(data), 21)
+            copy = QuoridorGame.from_bytes(data)
+            self.assertEqual(copy.get_state(), game.get_state())
+            self.assertEqual(copy.get_hash(), game.get_hash())
+            self.assertEqual(copy.to_bytes(), data)
+
+    def test_rejects_bad_data(self):
+        """Data of the wrong length, or that no game could reach, raises ValueError, and so does packing a game
+        that is not the standard one."""
+        data = bytearray(QuoridorGame().to_bytes())
+        for bad in (bytes(data[:-1]), bytes(data) + b"\0", bytes((81,)) + bytes(data[1:]),
+                    bytes((data[1] & 0x7F,)) + bytes(data[1:])):
+            with self.assertRaises(ValueError):
+                QuoridorGame.from_bytes(bad)
+        with self.assertRaises(ValueError):
+            QuoridorGame(size=7).to_bytes()
+
+
+class SymmetryTest(unittest.TestCase):
+    """Canonical hashes of symmetric positions."""
+
+    def test_mirror_shares_canonical_hash(self):
+        """A position and its mirror image have different hashes but the same canonical hash, and the mirrored
+        state is the one transform_state gives."""
+        game = two_player_game((2, 3), (5, 6), [("v", (3, 4)), ("h", (1, 2))])
+        mirror = QuoridorGame()
+        for transform in range(1, 4):
+            mirror.set_state(transform_state(game.get_state(), transform))
+            self.assertEqual(mirror.get_canonical_hash()[0], game.get_canonical_hash()[0])
+        mirror.set_state(transform_state(game.get_state(), 1))
+        self.assertEqual(mirror.get_state()[:2], (square((6, 3)), square((3, 6))))
+        self.assertNotEqual(mirror.get_hash(), game.get_hash())
+
+
+class FourPlayerTest(unittest.TestCase):
+    """Board sizes and four player games."""
+
+    def test_four_player_opening(self):
+        """Four pawns start on the middle of each side, turns go round all four and P3 wins on the far column."""
+        game = QuoridorGame(players=4)
+        positions = [game.get_player(number).get_position() for number in range(1, 5)]
+        self.assertEqual(positions, [(4, 0), (4, 8), (0, 4), (8, 4)])
+        self.assertEqual(game.get_p1().get_fences_remaining(), 5)
+        for number, target in ((1, (4, 1)), (2, (4, 7)), (3, (1, 4)), (4, (7, 4))):
+            self.assertEqual(game.get_game_state().get_turn(), "P%d" % number)
+            self.assertIs(game.move_pawn(number, target), True)
+        self.assertEqual(game.get_game_state().get_turn(), "P1")
+        game.set_state((square((4, 1)), square((4, 7)), square((7, 2)), square((1, 6)), 0, 0, 5, 5, 5, 5, 3, 0))
+        self.assertIs(game.move_pawn(3, (8, 2)), True)
+        self.assertTrue(game.is_winner(3))
+
+    def test_side_step_around_third_pawn(self):
+        """When the jump square holds a third pawn the jump is closed and the side steps open."""
+        game = QuoridorGame(players=4)
+        game.set_state((square((4, 4)), square((4, 5)), square((4, 6)), square((8, 8)), 0, 0, 5, 5, 5, 5, 1, 0))
+        self.assertEqual(pawn_targets(game, 1), {(3, 4), (5, 4), (4, 3), (3, 5), (5, 5)})
+        self.assertEqual(set(game.legal_pawn_moves(1)), pawn_targets(game, 1))
+
+    def test_even_board(self):
+        """An 8 x 8 board starts its pawns on the middle right of the two end rows and P1 wins on row 7."""
+        game = QuoridorGame(size=8)
+        self.assertEqual(game.get_p1().get_position(), (4, 0))
+        self.assertEqual(game.get_p2().get_position(), (4, 7))
+        game.set_state((square((4, 6), 8), square((0, 0), 8), 0, 0, 9, 9, 1, 0))
+        self.assertIs(game.move_pawn(1, (4, 7)), True)
+        self.assertTrue(game.is_winner(1))
+
+
+class PositionTest(unittest.TestCase):
+    """Position snapshots against the game they were taken from."""
+
+    def test_apply_matches_game(self):
+        """Applying moves to a snapshot gives the same states and hashes as playing them on the game, leaves the
+        earlier snapshots as they were, and refuses illegal moves."""
+        generator = random.Random(9)
+        game = QuoridorGame()
+        position = game.snapshot()
+        history = [(position, game.get_state())]
+        for _ in range(40):
+            if game.get_game_state().get_game_state() is not None:
+                break
+            player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+            moves = position.legal_moves()
+            self.assertEqual(set(moves), {("p", coord_tuple) for coord_tuple in game.legal_pawn_moves(player_num)} |
+                             set(game.legal_fences(player_num)))
+            move = generator.choice(moves)
+            position = position.apply(move)
+            if move[0] == "p":
+                game.move_pawn(player_num, move[1])
+            else:
+                game.place_fence(player_num, move[0], move[1])
+            self.assertEqual(position.get_state(), game.get_state())
+            self.assertEqual(position.get_hash(), game.get_hash())
+            history.append((position, game.get_state()))
+        for snapshot, state in history:
+            self.assertEqual(snapshot.get_state(), state)
+        with self.assertRaises(ValueError):
+            QuoridorGame().snapshot().apply(("p", (4, 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
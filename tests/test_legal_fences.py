@@ -0,0 +1,103 @@
+# Description: Checks the batch fence generation of QuoridorGame.legal_fences and Position.legal_fences, which settle
+# fair play for every open slot at once from the bridges of each pawn's path graph, against probing one slot at a
+# time on random dense boards of odd and even sizes with two and four players. Run with python -m unittest or
+# pytest from the repository root.
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Quoridor import QuoridorGame  # noqa: E402
+
+BOARDS = ((9, 2), (8, 2), (5, 2), (9, 4), (6, 4))     # (size, players)
+
+
+def dense_games(size, players, seed, count, fence_chance=0.85):
+    """Takes a board size, player count and seed and yields count games with more and more fences on the board,
+    built from random legal moves. A player who runs out of fences gets a full set again, so the boards get far
+    denser than a real game's."""
+    generator = random.Random(seed)
+    game = QuoridorGame(size, players)
+    tables = game.get_tables()
+    for _ in range(count):
+        for _ in range(3):
+            state = list(game.get_state())
+            turn = state[2 * players + 2] - 1
+            if state[players + 2 + turn] == 0:
+                state[players + 2 + turn] = tables.fences_per_player
+                game.set_state(tuple(state))
+            position = game.snapshot()
+            fences = position.legal_fences()
+            pawn_moves = [coord_tuple for coord_tuple in position.legal_pawn_moves()
+                          if position.apply(("p", coord_tuple), validate=False).get_state()[-1] == 0]
+            if fences and (generator.random() < fence_chance or not pawn_moves):
+                move = generator.choice(fences)
+            elif pawn_moves:
+                move = ("p", generator.choice(pawn_moves))
+            else:
+                break
+            game.set_state(position.apply(move).get_state())
+        yield game
+
+
+def probe_position(position, size):
+    """Returns the set of fences Position.is_legal accepts, trying every slot on the board one at a time."""
+    return {(direction, (x_coord, y_coord)) for direction in "vh" for x_coord in range(-1, size + 1)
+            for y_coord in range(-1, size + 1) if position.is_legal((direction, (x_coord, y_coord)))}
+
+
+def probe_board(game, size):
+    """Returns the set of fences that pass validate_fence and then fair play for every player when placed on the
+    game's board, one slot at a time, as place_fence checks them."""
+    board = game.get_board()
+    accepted = set()
+    for direction in "vh":
+        for x_coord in range(-1, size + 1):
+            for y_coord in range(-1, size + 1):
+                coord_tuple = (x_coord, y_coord)
+                if board.validate_fence(direction, coord_tuple) is not True:
+                    continue
+                board.place_fence(direction, coord_tuple)
+                if all(board.fair_play(player) for player in game.get_players()):
+                    accepted.add((direction, coord_tuple))
+                board.remove_fence(direction, coord_tuple)
+    return accepted
+
+
+class LegalFencesTest(unittest.TestCase):
+    """Batch fence generation against the per-slot probes."""
+
+    def test_position_matches_is_legal(self):
+        """Position.legal_fences lists exactly the fences is_legal accepts, with no repeats."""
+        for size, players in BOARDS:
+            for seed in range(6):
+                for game in dense_games(size, players, seed, 12):
+                    position = game.snapshot()
+                    fences = position.legal_fences()
+                    self.assertEqual(len(fences), len(set(fences)))
+                    expected = probe_position(position, size) if position.get_state()[-1] == 0 else set()
+                    self.assertEqual(set(fences), expected, (size, players, seed, position.get_state()))
+
+    def test_game_matches_place_and_fair_play(self):
+        """QuoridorGame.legal_fences lists exactly the fences that pass validate_fence and fair play for every
+        player, and agrees with the Position of the same game."""
+        for size, players in BOARDS:
+            for seed in range(6, 10):
+                for game in dense_games(size, players, seed, 12):
+                    state = game.get_state()
+                    if state[-1]:
+                        continue
+                    turn = state[2 * players + 2]
+                    fences = game.legal_fences(turn)
+                    self.assertEqual(len(fences), len(set(fences)))
+                    expected = probe_board(game, size) if state[players + 2 + turn - 1] else set()
+                    self.assertEqual(set(fences), expected, (size, players, seed, state))
+                    self.assertEqual(set(fences), set(game.snapshot().legal_fences()))
+                    self.assertEqual(game.get_state(), state)
+
+
+if __name__ == "__main__":
+    unittest.main()
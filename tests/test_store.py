@@ -0,0 +1,147 @@
+# Description: Tests for QuoridorStore: games logged through the write-ahead log come back with the states they were
+# left in, across folds into snapshots, closes logged right after moves and a torn or corrupt record at the tail of
+# the log. Game ids too long for a record are refused, and a failed commit is raised rather than lost. Run with
+# python -m unittest or pytest from the repository root.
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Quoridor import QuoridorGame  # noqa: E402
+from QuoridorStore import MAX_ID_BYTES, RECORD, QuoridorStore  # noqa: E402
+
+
+def play_random_move(game, generator):
+    """Plays one random legal move on the game through move_pawn or place_fence. Returns False if the game is
+    over."""
+    if game.get_game_state().get_game_state() is not None:
+        return False
+    player_num = 1 if game.get_game_state().get_turn() == "P1" else 2
+    fences = game.legal_fences(player_num)
+    if fences and generator.random() < 0.3:
+        direction, coord_tuple = generator.choice(fences)
+        return game.place_fence(player_num, direction, coord_tuple) is True
+    return game.move_pawn(player_num, generator.choice(game.legal_pawn_moves(player_num))) is True
+
+
+class StoreRecoveryTest(unittest.TestCase):
+    """Logging games and recovering them from a store directory."""
+
+    def setUp(self):
+        """Makes a scratch directory for the store."""
+        self._scratch = tempfile.TemporaryDirectory()
+        self.directory = self._scratch.name
+
+    def tearDown(self):
+        """Removes the scratch directory."""
+        self._scratch.cleanup()
+
+    def recover(self, shards):
+        """Opens the store directory again and returns the recovered states."""
+        with QuoridorStore(self.directory, shards) as store:
+            return store.recover()
+
+    def test_recover_after_folding(self):
+        """Games played through attached listeners come back as they were, closed games do not, and the logs are
+        folded into snapshots along the way."""
+        generator = random.Random(1)
+        games = {}
+        with QuoridorStore(self.directory, shards=3, segment_records=40) as store:
+            self.assertEqual(store.recover(), {})
+            for number in range(12):
+                game_id = "g%d" % number
+                games[game_id] = QuoridorGame()
+                store.log_new(game_id)
+                store.attach(game_id, games[game_id])
+            for _ in range(40):
+                for game_id, game in games.items():
+                    play_random_move(game, generator)
+            for game_id in ("g3", "g7"):
+                play_random_move(games[game_id], generator)
+                store.log_close(game_id)                    # logged in the same batch as the move before it
+                del games[game_id]
+        self.assertTrue(any(name.endswith(".snap") for name in os.listdir(self.directory)))
+        expected = {game_id: game.to_bytes() for game_id, game in games.items()}
+        self.assertEqual(self.recover(3), expected)
+        self.assertEqual(self.recover(3), expected)         # and again from the snapshots alone
+        for game_id, state in self.recover(3).items():
+            self.assertEqual(QuoridorGame.from_bytes(state).get_state(), games[game_id].get_state())
+
+    def log_one_game(self, moves):
+        """Logs a new game g1 and the given number of random moves to a one shard store, then returns the path of
+        the log segment, its contents and the game's state before the last move."""
+        generator = random.Random(2)
+        game = QuoridorGame()
+        with QuoridorStore(self.directory, shards=1) as store:
+            store.recover()
+            store.log_new("g1")
+            store.attach("g1", game)
+            for _ in range(moves):
+                before = game.to_bytes()
+                self.assertTrue(play_random_move(game, generator))
+        log_name = [name for name in os.listdir(self.directory) if name.endswith(".log")][-1]
+        log_path = os.path.join(self.directory, log_name)
+        with open(log_path, "rb") as source:
+            data = source.read()
+        self.assertEqual(len(data), (moves + 1) * (RECORD.size + len("g1")))
+        return log_path, data, before
+
+    def test_torn_tail(self):
+        """A record cut short at the end of the log is dropped, and every record before it is recovered."""
+        log_path, data, before = self.log_one_game(10)
+        with open(log_path, "wb") as output:
+            output.write(data[:-3])
+        self.assertEqual(self.recover(1), {"g1": before})
+
+    def test_corrupt_tail(self):
+        """A record whose checksum does not match at the end of the log is dropped like a torn one."""
+        log_path, data, before = self.log_one_game(10)
+        with open(log_path, "wb") as output:
+            output.write(data[:-1] + bytes((data[-1] ^ 0x01,)))
+        self.assertEqual(self.recover(1), {"g1": before})
+
+
+class StoreErrorTest(unittest.TestCase):
+    """Game ids too long to log and a committer that cannot write."""
+
+    def setUp(self):
+        """Makes a scratch directory and opens a one shard store in it."""
+        self._scratch = tempfile.TemporaryDirectory()
+        self.store = QuoridorStore(self._scratch.name, shards=1)
+        self.store.recover()
+
+    def tearDown(self):
+        """Closes the store if a test left it open and removes the scratch directory."""
+        try:
+            self.store.close()
+        except OSError:
+            pass
+        self._scratch.cleanup()
+
+    def test_long_game_id(self):
+        """A game id longer than a record can hold is refused when the game is logged."""
+        self.store.log_new("g" * MAX_ID_BYTES)
+        with self.assertRaises(ValueError):
+            self.store.log_new("g" * (MAX_ID_BYTES + 1))
+        with self.assertRaises(ValueError):
+            self.store.log_new("\u00e9" * 128)                  # 128 characters but 256 bytes
+
+    def test_failed_commit(self):
+        """When an fsync fails, a waiter is woken with the error, and later appends and the close raise it."""
+        sequence = self.store.log_new("g1")
+        with mock.patch("QuoridorStore.os.fsync", side_effect=OSError(5, "Input/output error")):
+            with self.assertRaises(OSError):
+                self.store.wait_durable(sequence)
+        with self.assertRaises(OSError):
+            self.store.log_move("g1", ("p", (4, 1)))
+        with self.assertRaises(OSError):
+            self.store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# Description: Regression tests for the sequential probability ratio test of QuoridorTournament: the log likelihood
+# ratio of a fixed run of pair scores, the stopping bounds and the pair at which clear-cut runs stop. Run with
+# python -m unittest or pytest from the repository root.
+
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from QuoridorTournament import SPRT, elo_to_score, score_to_elo  # noqa: E402
+
+
+def run_until_settled(scores, limit=10000):
+    """Feeds the pair scores to a fresh SPRT(0, 20) over and over until it settles and returns (pairs, result)."""
+    sprt = SPRT(0.0, 20.0)
+    pairs = 0
+    while sprt.get_result() is None and pairs < limit:
+        sprt.add(scores[pairs % len(scores)])
+        pairs += 1
+    return pairs, sprt.get_result()
+
+
+class SPRTTest(unittest.TestCase):
+    """The pentanomial SPRT on fixed pair scores."""
+
+    def test_llr_of_fixed_scores(self):
+        """Pair scores 1, 1, 0.5 and 0.75 have mean 0.8125. Counting one virtual pair scoring 0 and one scoring 1,
+        the variance is 3.8125 / 6 - (4.25 / 6) ** 2. With s0 = 0.5 and s1 = elo_to_score(20), the LLR is
+        4 (s1 - s0) (2 * 0.8125 - s0 - s1) / (2 * variance)."""
+        sprt = SPRT(0.0, 20.0)
+        for score in (1.0, 1.0, 0.5, 0.75):
+            sprt.add(score)
+        self.assertEqual(sprt.get_count(), 4)
+        self.assertAlmostEqual(sprt.get_mean(), 0.8125)
+        self.assertAlmostEqual(sprt.get_variance(), 3.8125 / 6 - (4.25 / 6) ** 2)
+        self.assertAlmostEqual(elo_to_score(20.0), 0.5287505638922686, places=12)
+        self.assertAlmostEqual(sprt.get_llr(), 0.25646972272523666, places=12)
+        self.assertIsNone(sprt.get_result())
+
+    def test_bounds(self):
+        """The bounds are log(beta / (1 - alpha)) and log((1 - beta) / alpha)."""
+        lower, upper = SPRT(0.0, 20.0, alpha=0.05, beta=0.05).get_bounds()
+        self.assertAlmostEqual(lower, -2.9444389791664403, places=12)
+        self.assertAlmostEqual(upper, 2.9444389791664403, places=12)
+        lower, upper = SPRT(0.0, 20.0, alpha=0.01, beta=0.1).get_bounds()
+        self.assertAlmostEqual(lower, math.log(0.1 / 0.99))
+        self.assertAlmostEqual(upper, math.log(0.9 / 0.01))
+
+    def test_stops(self):
+        """A run of won pairs accepts H1, and runs of lost, drawn or evenly split pairs accept H0, each at a known
+        pair."""
+        self.assertEqual(run_until_settled([1.0]), (14, "H1"))
+        self.assertEqual(run_until_settled([0.5]), (59, "H0"))
+        self.assertEqual(run_until_settled([0.75, 0.25]), (452, "H0"))
+        self.assertEqual(run_until_settled([0.0]), (13, "H0"))
+
+    def test_elo(self):
+        """Scores and Elo differences convert both ways, and an even score is exactly 0 Elo."""
+        for elo in (-400.0, -35.5, 0.0, 20.0, 300.0):
+            self.assertAlmostEqual(score_to_elo(elo_to_score(elo)), elo)
+        self.assertEqual(math.copysign(1.0, score_to_elo(0.5)), 1.0)
+        self.assertEqual(score_to_elo(1.0), math.inf)
+        self.assertEqual(score_to_elo(0.0), -math.inf)
+
+
+if __name__ == "__main__":
+    unittest.main()